@@ -6,27 +6,29 @@
 # Port: 5000
 # ============================================
 
-from flask import Flask, request, jsonify
+import os
+import sys
+
+# Modules shared by both backends live in ../stock_common
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stock_common.startup import LazyModule, Deferred, DeferredDict, module_available, timed_import, mark_ready, startup_report
+from flask import Flask, request, jsonify, Response, stream_with_context
 from flask_cors import CORS
-import yfinance as yf
 import numpy as np
-import pandas as pd
-from sklearn.svm import SVR
-from sklearn.tree import DecisionTreeRegressor
-from sklearn.ensemble import RandomForestRegressor
-from sklearn.preprocessing import MinMaxScaler
-
-# LSTM imports - will use simple implementation without TensorFlow for portability
-try:
-    from tensorflow.keras.models import Sequential
-    from tensorflow.keras.layers import LSTM, Dense, Dropout
-    LSTM_AVAILABLE = True
-    print("✅ TensorFlow LSTM available")
-except ImportError:
-    LSTM_AVAILABLE = False
+
+# pandas, scikit-learn and TensorFlow load on first use, not at startup
+pd = LazyModule('pandas')
+
+# LSTM needs TensorFlow; probe for it without importing it
+LSTM_AVAILABLE = module_available('tensorflow')
+if LSTM_AVAILABLE:
+    print("✅ TensorFlow LSTM available (loaded on first use)")
+else:
     print("⚠️ TensorFlow not installed - LSTM will use fallback model")
 from datetime import datetime, timedelta
-import os
+import threading
+import time
 from dotenv import load_dotenv
 from pymongo import MongoClient, ASCENDING, DESCENDING
 from bson import ObjectId
@@ -35,6 +37,22 @@ import hashlib
 import secrets
 import jwt
 import requests
+import click
+from stock_common.stock_cache import OHLCVCache, MetadataCache, SingleFlight
+from symbol_resolver import SymbolResolver
+from serialization import serialize_history, OHLCV_COLUMNS
+from stock_common.local_bars import LocalBarStore, PERIOD_BARS, PERIOD_DAYS
+from stock_common.market_data import create_provider, ReplayProvider
+from stock_common.model_registry import ModelRegistry, FittedModel
+from stock_common.datasets import stack_series
+from training import MODEL_HYPERPARAMS, TrainingPool, TrainingQueueFull, SharedArrays, create_model, fit_series
+from stock_common.lstm_store import LSTMStore
+from online_models import OnlineModelStore
+from stock_common.tree_export import FlatForest, TreeModelStore
+from forecasting import FORECAST_METHODS, decode_path, encode_path, forecast_path, resolve_method
+from indicators import DEFAULT_SERIES, OHLCV_FIELDS, IndicatorCache, IndicatorSet
+from backtest import BacktestCache, aggregate_folds, evaluate_fold, walk_forward_folds
+from jobs import JobQueue, JobLimitExceeded
 
 # Load environment variables
 load_dotenv()
@@ -48,6 +66,65 @@ JWT_SECRET = os.getenv('JWT_SECRET', 'your-super-secret-jwt-key-change-in-produc
 JWT_EXPIRY_HOURS = 24
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY', '')
 MONGODB_URI = os.getenv('MONGODB_URI', 'mongodb://localhost:27017/stockDB')
+OHLCV_CACHE_MAX_ENTRIES = int(os.getenv('OHLCV_CACHE_MAX_ENTRIES', '512'))
+OHLCV_CACHE_MAX_MB = int(os.getenv('OHLCV_CACHE_MAX_MB', '64'))
+SYMBOL_NEGATIVE_TTL_HOURS = float(os.getenv('SYMBOL_NEGATIVE_TTL_HOURS', '6'))
+SYMBOL_EMPTY_TTL_MINUTES = float(os.getenv('SYMBOL_EMPTY_TTL_MINUTES', '15'))
+METADATA_TTL_HOURS = float(os.getenv('METADATA_TTL_HOURS', '24'))
+# Directory of memory-mapped per-symbol bar files (disabled when empty)
+LOCAL_BAR_STORE_DIR = os.getenv('LOCAL_BAR_STORE_DIR', '')
+# Serve daily bars only from the local bar store, never from Yahoo Finance
+MARKET_DATA_OFFLINE = os.getenv('MARKET_DATA_OFFLINE', 'false').lower() in ('1', 'true', 'yes')
+# Market data backend: 'yahoo' (live) or 'replay' (recorded/synthetic files on disk)
+MARKET_DATA_PROVIDER = os.getenv('MARKET_DATA_PROVIDER', 'yahoo')
+MARKET_DATA_REPLAY_DIR = os.getenv('MARKET_DATA_REPLAY_DIR', '')
+MARKET_DATA_REPLAY_LATENCY_MS = float(os.getenv('MARKET_DATA_REPLAY_LATENCY_MS', '0'))
+MARKET_DATA_REPLAY_JITTER_MS = float(os.getenv('MARKET_DATA_REPLAY_JITTER_MS', '0'))
+MARKET_DATA_REPLAY_SYNTHETIC = os.getenv('MARKET_DATA_REPLAY_SYNTHETIC', 'true').lower() in ('1', 'true', 'yes')
+# Fitted prediction models kept in memory for reuse
+MODEL_REGISTRY_MAX_MODELS = int(os.getenv('MODEL_REGISTRY_MAX_MODELS', '64'))
+MODEL_REGISTRY_MAX_MB = int(os.getenv('MODEL_REGISTRY_MAX_MB', '512'))
+# Per-symbol LSTM weights on disk, fine-tuned as new bars arrive
+LSTM_MODEL_DIR = os.getenv('LSTM_MODEL_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models', 'lstm'))
+LSTM_FINETUNE_EPOCHS = int(os.getenv('LSTM_FINETUNE_EPOCHS', '5'))
+LSTM_TRAIN_BUDGET_SECONDS = float(os.getenv('LSTM_TRAIN_BUDGET_SECONDS', '60'))
+LSTM_FINETUNE_BUDGET_SECONDS = float(os.getenv('LSTM_FINETUNE_BUDGET_SECONDS', '10'))
+LSTM_DRIFT_FACTOR = float(os.getenv('LSTM_DRIFT_FACTOR', '3'))
+# Per-symbol state of the incrementally trained 'Online' model type
+ONLINE_MODEL_DIR = os.getenv('ONLINE_MODEL_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models', 'online'))
+ONLINE_MODEL_MAX_SYMBOLS = int(os.getenv('ONLINE_MODEL_MAX_SYMBOLS', '256'))
+# Flattened RandomForest/DecisionTree models shared through memory-mapped
+# files (empty = keep them in process memory only)
+TREE_MODEL_DIR = os.getenv('TREE_MODEL_DIR', '')
+# Model training runs on a dedicated pool: CPU cores it may use (defaults
+# to all but one), worker processes (defaults to min(4, cores)), concurrent
+# LSTM trainings, and how many tasks may wait and for how long
+TRAINING_CORES = int(os.getenv('TRAINING_CORES', '0')) or None
+TRAINING_WORKERS = int(os.getenv('TRAINING_WORKERS', '0')) or None
+TRAINING_LSTM_CONCURRENCY = int(os.getenv('TRAINING_LSTM_CONCURRENCY', '1'))
+TRAINING_QUEUE_SIZE = int(os.getenv('TRAINING_QUEUE_SIZE', '32'))
+TRAINING_QUEUE_TIMEOUT_SECONDS = float(os.getenv('TRAINING_QUEUE_TIMEOUT_SECONDS', '10'))
+# Symbols whose indicator series are kept and extended bar by bar
+INDICATOR_CACHE_SIZE = int(os.getenv('INDICATOR_CACHE_SIZE', '256'))
+# Longest forecast path (days) a prediction may request with `horizon`
+FORECAST_MAX_HORIZON = int(os.getenv('FORECAST_MAX_HORIZON', '30'))
+# Per-model time budget in /api/compare_models (seconds)
+COMPARE_MODEL_TIMEOUT_SECONDS = float(os.getenv('COMPARE_MODEL_TIMEOUT_SECONDS', '120'))
+# Walk-forward backtest in /api/compare_models: default fold count, and
+# fold results cached until the next bar
+BACKTEST_FOLDS = int(os.getenv('BACKTEST_FOLDS', '5'))
+BACKTEST_CACHE_SIZE = int(os.getenv('BACKTEST_CACHE_SIZE', '2048'))
+# Asynchronous prediction jobs (/api/predict/jobs)
+PREDICTION_JOB_WORKERS = int(os.getenv('PREDICTION_JOB_WORKERS', '2'))
+PREDICTION_JOBS_PER_USER = int(os.getenv('PREDICTION_JOBS_PER_USER', '3'))
+PREDICTION_JOB_QUEUE_SIZE = int(os.getenv('PREDICTION_JOB_QUEUE_SIZE', '100'))
+PREDICTION_JOB_RETENTION_MINUTES = int(os.getenv('PREDICTION_JOB_RETENTION_MINUTES', '60'))
+PREDICTION_JOB_HEARTBEAT_SECONDS = 15
+# Largest symbol list accepted by /api/predict/batch
+PREDICTION_BATCH_MAX_SYMBOLS = int(os.getenv('PREDICTION_BATCH_MAX_SYMBOLS', '50'))
+# Load the ML libraries and set up MongoDB in the background once the app
+# has loaded, so the first request does not pay for them
+PRELOAD_ON_START = os.getenv('PRELOAD_ON_START', 'false').lower() in ('1', 'true', 'yes')
 
 # ============================================
 # MONGODB CONNECTION & AUTO-SETUP
@@ -80,16 +157,33 @@ def create_index_safe(collection, keys, **kwargs):
         else:
             print(f"  ⚠ Index warning: {str(e)[:100]}")
 
+def create_bar_collection(db, name):
+    """
+    Create the per-bar collection as a MongoDB time-series collection
+    (timeField 'date', metaField 'symbol'). Servers without time-series
+    support get a regular collection; the (symbol, date) index works for both.
+    """
+    if name in db.list_collection_names():
+        return db[name]
+    try:
+        db.create_collection(name, timeseries={
+            'timeField': 'date',
+            'metaField': 'symbol',
+            'granularity': 'hours'
+        })
+        print(f"  ✚ Created time-series collection: {name}")
+    except Exception as e:
+        print(f"  ⚠ Time-series collections unavailable, using a regular collection: {str(e)[:100]}")
+    return db[name]
+
 def setup_database():
     """
-    Connect to MongoDB and automatically create collections with indexes.
-    Collections are created automatically when first document is inserted.
+    Create the collections that need options and all indexes on the first
+    database access. Other collections are created automatically when their
+    first document is inserted.
     """
     try:
-        client = MongoClient(MONGODB_URI)
-        db = client.get_database()
-        
-        print(f"✅ Connected to MongoDB: {db.name}")
+        print(f"✅ Connecting to MongoDB: {db.name}")
         
         # Define collections
         collections = {
@@ -97,8 +191,10 @@ def setup_database():
             'profiles': db.profiles,
             'watchlist': db.watchlist,
             'stock_data': db.stock_data,
+            'stock_bars': create_bar_collection(db, 'stock_bars'),
             'stock_predictions': db.stock_predictions,
-            'chat_messages': db.chat_messages
+            'chat_messages': db.chat_messages,
+            'symbol_resolution': db.symbol_resolution
         }
         
         # Create indexes for better query performance (safely handles existing indexes)
@@ -109,22 +205,28 @@ def setup_database():
         create_index_safe(collections['watchlist'], 'user_id')
         create_index_safe(collections['stock_data'], [('symbol', ASCENDING), ('date', DESCENDING)])
         create_index_safe(collections['stock_data'], 'symbol')
+        create_index_safe(collections['stock_bars'], [('symbol', ASCENDING), ('date', ASCENDING)])
         create_index_safe(collections['stock_predictions'], [('user_id', ASCENDING), ('created_at', DESCENDING)])
         create_index_safe(collections['stock_predictions'], 'symbol')
         create_index_safe(collections['chat_messages'], [('user_id', ASCENDING), ('created_at', ASCENDING)])
+        create_index_safe(collections['symbol_resolution'], 'symbol', unique=True)
         
         print("✅ Database setup complete!")
         print(f"📦 Available collections: {db.list_collection_names()}")
         
-        return client, db, collections
+        return collections
         
     except Exception as e:
         print(f"❌ MongoDB connection failed: {str(e)}")
         print("💡 Make sure MongoDB is running: mongod --dbpath /path/to/data")
         raise e
 
-# Initialize database connection
-client, db, collections = setup_database()
+# The client connects on its first operation; collections and indexes are
+# set up on the first access to `collections` instead of at import time
+client = MongoClient(MONGODB_URI, connect=False)
+db = client.get_database()
+database_setup = Deferred('mongodb_setup', setup_database)
+collections = DeferredDict(database_setup)
 
 # ============================================
 # AUTHENTICATION HELPERS
@@ -456,42 +558,318 @@ def search_symbols(query):
 # STOCK DATA HELPERS
 # ============================================
 
-def fetch_stock_data_safe(symbol, period="1y"):
+# Every upstream market data call goes through this provider
+market_data = create_provider(
+    MARKET_DATA_PROVIDER,
+    replay_dir=MARKET_DATA_REPLAY_DIR,
+    replay_latency=MARKET_DATA_REPLAY_LATENCY_MS / 1000,
+    replay_jitter=MARKET_DATA_REPLAY_JITTER_MS / 1000,
+    replay_synthetic=MARKET_DATA_REPLAY_SYNTHETIC
+)
+
+# Shared history cache, keyed by (resolved symbol, period, interval)
+ohlcv_cache = OHLCVCache(
+    max_entries=OHLCV_CACHE_MAX_ENTRIES,
+    max_bytes=OHLCV_CACHE_MAX_MB * 1024 * 1024
+)
+
+# Concurrent requests for the same (symbol, period, interval) share one upstream fetch
+history_flight = SingleFlight()
+
+# Company metadata (stock.info) changes rarely, so it is cached for a day
+metadata_cache = MetadataCache(ttl=METADATA_TTL_HOURS * 3600)
+
+def load_company_info(symbol):
+    """Fetch company metadata from the market data provider (a separate, slow upstream call)"""
+    if MARKET_DATA_OFFLINE:
+        return {}
+    return market_data.metadata(symbol)
+
+# Local memory-mapped bar files, shared by serving and training
+bar_store = LocalBarStore(LOCAL_BAR_STORE_DIR) if LOCAL_BAR_STORE_DIR else None
+
+def read_local_bars(symbol):
+    """
+    Memory-mapped bars for one exact symbol variant, or None.
+    Online, the local file is only used while it is up to date; offline it
+    is the only source.
     """
-    Safely fetch stock data from Yahoo Finance.
-    yfinance is a Python library that scrapes Yahoo Finance - no API key needed!
+    if bar_store is None:
+        return None
+    bars = bar_store.read(symbol)
+    if bars is None or bars.size == 0:
+        return None
+    if MARKET_DATA_OFFLINE or bar_store.is_fresh(bars):
+        return bars
+    return None
+
+# Remembers which exchange suffix works (and which don't) for each ticker
+# (a plain collection handle: no database round trip at import time)
+symbol_resolver = SymbolResolver(
+    db.symbol_resolution,
+    negative_ttl=SYMBOL_NEGATIVE_TTL_HOURS * 3600,
+    empty_ttl=SYMBOL_EMPTY_TTL_MINUTES * 60
+)
+
+# Calendar days covered by each yfinance period that is served incrementally
+INCREMENTAL_PERIOD_DAYS = {
+    '1mo': 31,
+    '3mo': 92,
+    '6mo': 183,
+    '1y': 366,
+    '2y': 731,
+    '5y': 1827,
+    '10y': 3653,
+}
+
+def period_start(period):
+    """First calendar date covered by a period, or None for the full history ('max')"""
+    today = pd.Timestamp(datetime.now().date())
+    if period == 'max':
+        return None
+    if period == 'ytd':
+        return pd.Timestamp(year=today.year, month=1, day=1)
+    return today - pd.Timedelta(days=INCREMENTAL_PERIOD_DAYS[period])
+
+def normalize_history(hist):
+    """Reduce a history frame to OHLCV columns on a tz-naive daily date index"""
+    index = hist.index
+    if getattr(index, 'tz', None) is not None:
+        index = index.tz_localize(None)
+    frame = hist[OHLCV_COLUMNS].copy()
+    frame.index = pd.DatetimeIndex(index.normalize(), name='Date')
+    return frame
+
+# stock_data holds one summary document per symbol ({'schema': 'bars'});
+# the bars themselves live in the stock_bars time-series collection, one
+# document per completed daily bar.
+BARS_SCHEMA = 'bars'
+
+def frame_to_bar_docs(symbol, frame):
+    """Convert a normalized history frame to stock_bars documents"""
+    dates = frame.index.to_pydatetime()
+    columns = [frame[c].to_numpy().tolist() for c in OHLCV_COLUMNS]
+    return [
+        {'symbol': symbol, 'date': d, 'open': o, 'high': h, 'low': l, 'close': c, 'volume': int(v)}
+        for d, o, h, l, c, v in zip(dates, *columns)
+    ]
+
+def bar_docs_to_frame(docs):
+    """
+    Convert stock_bars documents (sorted by date) to a normalized history
+    frame. A time-series collection cannot enforce a unique (symbol, date)
+    index, so concurrent ingestion may have stored a bar twice; the last
+    copy of each date is kept.
+    """
+    frame = pd.DataFrame(docs, columns=['date', 'open', 'high', 'low', 'close', 'volume'])
+    frame.columns = ['Date'] + OHLCV_COLUMNS
+    frame.index = pd.DatetimeIndex(pd.to_datetime(frame.pop('Date')), name='Date')
+    return frame[~frame.index.duplicated(keep='last')]
+
+def load_bar_summary(symbol):
+    return collections['stock_data'].find_one({'symbol': symbol, 'schema': BARS_SCHEMA})
+
+def load_stored_bars(symbol, start=None, end=None):
+    """Range query on stock_bars: only bars with start <= date <= end are read"""
+    query = {'symbol': symbol}
+    date_range = {}
+    if start is not None:
+        date_range['$gte'] = pd.Timestamp(start).to_pydatetime()
+    if end is not None:
+        date_range['$lte'] = pd.Timestamp(end).to_pydatetime()
+    if date_range:
+        query['date'] = date_range
+    
+    docs = collections['stock_bars'].find(
+        query,
+        {'_id': 0, 'date': 1, 'open': 1, 'high': 1, 'low': 1, 'close': 1, 'volume': 1}
+    ).sort('date', ASCENDING)
+    return bar_docs_to_frame(list(docs))
+
+def save_stored_bars(symbol, frame, covers_from, summary=None, replace=False):
+    """
+    Insert the completed bars of `frame` that are not stored yet and update
+    the symbol's summary document. Today's bar is still changing and is
+    never stored. With replace=True all stored bars for the symbol are
+    dropped first (after a split/dividend re-based the series).
+    """
+    today = pd.Timestamp(datetime.now().date())
+    completed = frame[frame.index < today]
+    
+    if replace:
+        collections['stock_bars'].delete_many({'symbol': symbol})
+        summary = None
+    
+    if summary:
+        first, last = pd.Timestamp(summary['first_date']), pd.Timestamp(summary['last_date'])
+        new_bars = completed[(completed.index < first) | (completed.index > last)]
+    else:
+        new_bars = completed
+    
+    if new_bars.empty:
+        return 0
+    
+    collections['stock_bars'].insert_many(frame_to_bar_docs(symbol, new_bars), ordered=False)
+    
+    first_date = new_bars.index[0].to_pydatetime()
+    last_date = new_bars.index[-1].to_pydatetime()
+    if summary:
+        first_date = min(first_date, summary['first_date'])
+        last_date = max(last_date, summary['last_date'])
+    
+    fields = {
+        'symbol': symbol,
+        'schema': BARS_SCHEMA,
+        'covers_from': covers_from,
+        'first_date': first_date,
+        'last_date': last_date,
+        'current_price': float(frame['Close'].iloc[-1]),
+        'updated_at': datetime.now()
+    }
+    update = {'$set': fields}
+    if summary:
+        update['$inc'] = {'bar_count': len(new_bars)}
+    else:
+        fields['bar_count'] = len(new_bars)
+    
+    collections['stock_data'].update_one({'symbol': symbol, 'schema': BARS_SCHEMA}, update, upsert=True)
+    return len(new_bars)
+
+def stored_history_covers(covers_from, start):
+    if covers_from == 'max':
+        return True
+    return start is not None and pd.Timestamp(covers_from) <= start
+
+def fetch_history_incremental(symbol, period):
+    """
+    Serve daily bars from MongoDB, downloading only the bars after the last
+    stored one. Only completed bars are stored, so the delta download starts
+    at the last stored bar: if its (adjusted) close no longer matches, a split
+    or dividend re-based the series and the full period is downloaded again.
+    """
+    start = period_start(period)
+    summary = load_bar_summary(symbol)
+    rebased = False
+    
+    if summary and stored_history_covers(summary['covers_from'], start):
+        stored = load_stored_bars(symbol, start)
+        if len(stored) >= 2:
+            check_date = stored.index[-1]
+            try:
+                delta = market_data.history(symbol, interval='1d', start=check_date.strftime('%Y-%m-%d'))
+            except Exception as e:
+                print(f"⚠️ Incremental fetch failed for {symbol}, serving stored bars: {str(e)}")
+                delta = pd.DataFrame()
+            
+            if delta.empty:
+                return stored
+            
+            delta = normalize_history(delta)
+            if check_date in delta.index:
+                stored_close = stored.at[check_date, 'Close']
+                fetched_close = delta.at[check_date, 'Close']
+                if abs(fetched_close - stored_close) <= 1e-4 * max(abs(stored_close), 1.0):
+                    merged = pd.concat([stored[stored.index < delta.index[0]], delta])
+                    added = save_stored_bars(symbol, merged, summary['covers_from'], summary)
+                    if added:
+                        print(f"📥 {symbol}: {added} new bar(s) stored")
+                    return merged
+            
+            print(f"↻ {symbol}: stored bars were re-based upstream, refetching {period}")
+            rebased = True
+    
+    hist = market_data.history(symbol, period=period, interval='1d')
+    if hist.empty:
+        return hist
+    
+    merged = normalize_history(hist)
+    covers_from = 'max' if start is None else start.strftime('%Y-%m-%d')
+    
+    if rebased or (summary and pd.Timestamp(summary['last_date']) < merged.index[0]):
+        # Re-based upstream, or stored bars too old to join up: start over from this download
+        save_stored_bars(symbol, merged, covers_from, replace=True)
+    else:
+        # Keep the older coverage of stored bars that join up with the new download
+        if summary and start is not None and stored_history_covers(summary['covers_from'], start):
+            covers_from = summary['covers_from']
+        save_stored_bars(symbol, merged, covers_from, summary)
+    return merged if start is None else merged[merged.index >= start]
+
+def fetch_history(symbol, period="1y", interval="1d"):
+    """
+    Download history for one exact symbol variant.
+    Daily bars come from the local bar store when it has them; otherwise
+    periods of a month or longer go through the stored-bar path so only new
+    bars are requested upstream.
+    """
+    if interval == '1d':
+        bars = read_local_bars(symbol)
+        if bars is not None:
+            return bars.tail(period).to_frame()
+    if MARKET_DATA_OFFLINE:
+        return pd.DataFrame()
+    if interval == '1d' and (period in INCREMENTAL_PERIOD_DAYS or period in ('ytd', 'max')):
+        return fetch_history_incremental(symbol, period)
+    return market_data.history(symbol, period=period, interval=interval)
+
+def fetch_history_shared(symbol, period="1y", interval="1d"):
+    """
+    fetch_history for one exact symbol variant, with concurrent identical
+    calls coalesced into a single fetch whose result is cached and shared.
+    """
+    def load():
+        hist = fetch_history(symbol, period, interval)
+        ohlcv_cache.put(symbol, period, hist, interval=interval)
+        return hist
+    
+    return history_flight.do((symbol, period, interval), load)
+
+def fetch_stock_data_safe(symbol, period="1y", interval="1d", data_format="records", include_info=True):
+    """
+    Safely fetch stock data from the market data provider (Yahoo Finance
+    through yfinance by default - no API key needed!).
     
     Automatically tries multiple symbol formats for international stocks.
+    The symbol resolver puts the known-good variant first and skips variants
+    that recently returned no data.
+    History frames are served from the in-process OHLCV cache when fresh.
+    
+    data_format='records' returns 'data' as a list of bar dicts;
+    data_format='columnar' returns it as parallel Date/Open/High/Low/Close/Volume arrays;
+    data_format='frame' returns the history frame itself (for in-process use).
+    
+    Company metadata (name, sector, market cap, PE) comes from the daily
+    metadata cache and is only loaded when include_info is set; otherwise
+    those fields fall back to the symbol and history-derived values.
     """
     original_symbol = symbol.upper().strip()
     
-    # List of symbol variations to try
-    symbols_to_try = [original_symbol]
-    
-    # If it doesn't already have an exchange suffix, try common ones
-    if '.' not in original_symbol:
-        # Add common exchange suffixes
-        symbols_to_try.extend([
-            f"{original_symbol}.NS",  # NSE India
-            f"{original_symbol}.BO",  # BSE India
-        ])
+    # Symbol variations worth trying (e.g. AAPL, AAPL.NS, AAPL.BO)
+    symbols_to_try = symbol_resolver.candidates(original_symbol)
     
     working_symbol = None
-    stock = None
     hist = None
     
     for sym in symbols_to_try:
+        cached_hist = ohlcv_cache.get(sym, period, interval)
+        if cached_hist is not None:
+            working_symbol = sym
+            hist = cached_hist
+            break
+        
         try:
             print(f"🔍 Trying symbol: {sym}")
-            temp_stock = yf.Ticker(sym)
-            temp_hist = temp_stock.history(period=period)
+            temp_hist = fetch_history_shared(sym, period, interval)
             
             if not temp_hist.empty and len(temp_hist) > 0:
+                symbol_resolver.record_hit(original_symbol, sym)
                 print(f"✅ Found data for: {sym}")
                 working_symbol = sym
-                stock = temp_stock
                 hist = temp_hist
                 break
+            
+            if not MARKET_DATA_OFFLINE:
+                symbol_resolver.record_miss(original_symbol, sym)
         except Exception as e:
             print(f"⚠️ Error with {sym}: {str(e)}")
             continue
@@ -501,18 +879,9 @@ def fetch_stock_data_safe(symbol, period="1y"):
         return None, f"No data found for symbol '{original_symbol}'. Try: {original_symbol}.NS (NSE India), {original_symbol}.BO (BSE India), or verify the symbol is correct."
     
     try:
-        info = stock.info if hasattr(stock, 'info') else {}
-        
-        data = []
-        for index, row in hist.iterrows():
-            data.append({
-                'Date': index.strftime('%Y-%m-%d'),
-                'Open': float(row['Open']),
-                'High': float(row['High']),
-                'Low': float(row['Low']),
-                'Close': float(row['Close']),
-                'Volume': int(row['Volume'])
-            })
+        info = metadata_cache.get_or_load(working_symbol, load_company_info) if include_info else {}
+        
+        data = hist if data_format == 'frame' else serialize_history(hist, data_format)
         
         return {
             'symbol': working_symbol,
@@ -528,6 +897,102 @@ def fetch_stock_data_safe(symbol, period="1y"):
     except Exception as e:
         return None, str(e)
 
+def load_close_prices(symbol, period="1y"):
+    """
+    Closing prices for model training: (resolved_symbol, closes, last_date, error).
+    Reads a zero-copy float32 view from the local bar store when it has the
+    symbol, otherwise goes through fetch_stock_data_safe. last_date is the
+    YYYY-MM-DD date of the latest bar.
+    """
+    for sym in SymbolResolver.variants(symbol):
+        bars = read_local_bars(sym)
+        if bars is not None:
+            bars = bars.tail(period)
+            if bars.size:
+                return sym, bars.close, str(bars.dates()[-1]), None
+    
+    stock_data, error = fetch_stock_data_safe(symbol, period, data_format='columnar', include_info=False)
+    if error or not stock_data:
+        return None, None, None, error or 'Stock symbol not found'
+    columns = stock_data['data']
+    return stock_data['symbol'], np.asarray(columns['Close'], dtype=np.float64), columns['Date'][-1], None
+
+def load_ohlcv(symbol, period="1y"):
+    """
+    Daily bars for indicators: (resolved_symbol, day numbers, {'open', 'high',
+    'low', 'close', 'volume'} float64 arrays, error). Day numbers count days
+    since 1970-01-01. Reads the local bar store when it has the symbol,
+    otherwise the cached history frame.
+    """
+    for sym in SymbolResolver.variants(symbol):
+        bars = read_local_bars(sym)
+        if bars is not None:
+            bars = bars.tail(period)
+            if bars.size:
+                columns = {field: np.asarray(getattr(bars, field), dtype=np.float64) for field in OHLCV_FIELDS}
+                return sym, np.asarray(bars.day), columns, None
+    
+    stock_data, error = fetch_stock_data_safe(symbol, period, data_format='frame', include_info=False)
+    if error or not stock_data:
+        return None, None, None, error or 'Stock symbol not found'
+    hist = stock_data['data']
+    index = hist.index.tz_localize(None) if hist.index.tz is not None else hist.index
+    days = index.values.astype('datetime64[D]').astype(np.int64)
+    columns = {field: hist[field.capitalize()].to_numpy(dtype=np.float64) for field in OHLCV_FIELDS}
+    return stock_data['symbol'], days, columns, None
+
+def closes_from_history(hist):
+    """(closes, last_date) from a history frame"""
+    return hist['Close'].to_numpy(dtype=np.float64), hist.index[-1].strftime('%Y-%m-%d')
+
+def load_close_prices_bulk(symbols, period="1y"):
+    """
+    load_close_prices for many symbols: {symbol: (resolved_symbol, closes, last_date, error)}.
+    Local bars and cached histories are used first, the best known variant
+    of every remaining symbol is requested in one provider batch call, and
+    only symbols that call could not serve fall back to per-symbol probing.
+    """
+    loaded = {}
+    wanted = {}  # variant -> requested symbol
+    for symbol in symbols:
+        for sym in SymbolResolver.variants(symbol):
+            bars = read_local_bars(sym)
+            if bars is not None and bars.tail(period).size:
+                bars = bars.tail(period)
+                loaded[symbol] = (sym, bars.close, str(bars.dates()[-1]), None)
+                break
+        if symbol in loaded:
+            continue
+        
+        candidates = symbol_resolver.candidates(symbol)
+        if not candidates:
+            continue
+        hist = ohlcv_cache.get(candidates[0], period, '1d')
+        if hist is not None and not hist.empty:
+            loaded[symbol] = (candidates[0], *closes_from_history(hist), None)
+        else:
+            wanted[candidates[0]] = symbol
+    
+    if wanted and not MARKET_DATA_OFFLINE:
+        try:
+            fetched = market_data.batch_history(list(wanted), period=period, interval='1d')
+        except Exception as e:
+            print(f"⚠️ Batch history fetch failed, fetching one by one: {str(e)}")
+            fetched = {}
+        for sym, hist in fetched.items():
+            symbol = wanted.get(sym)
+            if symbol is None or hist.empty:
+                continue
+            hist = normalize_history(hist)
+            ohlcv_cache.put(sym, period, hist)
+            symbol_resolver.record_hit(symbol, sym)
+            loaded[symbol] = (sym, *closes_from_history(hist), None)
+    
+    for symbol in symbols:
+        if symbol not in loaded:
+            loaded[symbol] = load_close_prices(symbol, period)
+    return loaded
+
 # ============================================
 # STOCK DATA API ENDPOINTS
 # ============================================
@@ -559,32 +1024,99 @@ def get_sectors():
 
 @app.route('/api/get_stock_data/<symbol>', methods=['GET'])
 def get_stock_data(symbol):
-    """Fetch stock data from Yahoo Finance and save to MongoDB"""
+    """Fetch stock data (stored in MongoDB by the fetch layer, only new bars are downloaded)"""
     try:
         period = request.args.get('period', '1y')
+        data_format = request.args.get('format', 'records')  # records | columnar
         
-        stock_data, error = fetch_stock_data_safe(symbol, period)
+        if data_format not in ('records', 'columnar'):
+            return jsonify({'error': "format must be 'records' or 'columnar'"}), 400
+        
+        stock_data, error = fetch_stock_data_safe(symbol, period, data_format=data_format)
         
         if error:
             return jsonify({'error': error}), 404
         
-        # Save to MongoDB
-        collections['stock_data'].update_one(
-            {'symbol': symbol, 'date': datetime.now().strftime('%Y-%m-%d')},
-            {
-                '$set': {
-                    'symbol': symbol,
-                    'data': stock_data['data'],
-                    'current_price': stock_data['current_price'],
-                    'fetched_at': datetime.now()
-                }
-            },
-            upsert=True
-        )
+        return jsonify(stock_data), 200
         
-        print(f"📊 Saved stock data for {symbol} to MongoDB")
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/stock_bars/<symbol>', methods=['GET'])
+def get_stock_bars(symbol):
+    """Read stored daily bars for a date range straight from MongoDB (no upstream call)"""
+    try:
+        start = request.args.get('start')  # YYYY-MM-DD, inclusive
+        end = request.args.get('end')      # YYYY-MM-DD, inclusive
+        data_format = request.args.get('format', 'records')
         
-        return jsonify(stock_data), 200
+        if data_format not in ('records', 'columnar'):
+            return jsonify({'error': "format must be 'records' or 'columnar'"}), 400
+        try:
+            start = pd.Timestamp(start) if start else None
+            end = pd.Timestamp(end) if end else None
+        except ValueError:
+            return jsonify({'error': 'start and end must be dates in YYYY-MM-DD format'}), 400
+        
+        for sym in SymbolResolver.variants(symbol):
+            if load_bar_summary(sym):
+                bars = load_stored_bars(sym, start, end)
+                return jsonify({
+                    'symbol': sym,
+                    'count': len(bars),
+                    'data': serialize_history(bars, data_format)
+                }), 200
+        
+        return jsonify({'error': f"No stored bars for '{symbol.upper()}'. Fetch it via /api/get_stock_data first."}), 404
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# Indicator series of recently requested symbols, extended as new bars arrive
+indicator_cache = IndicatorCache(max_entries=INDICATOR_CACHE_SIZE)
+
+@app.route('/api/indicators/<symbol>', methods=['GET'])
+def get_indicators(symbol):
+    """
+    Technical indicator series for a symbol (see indicators.py), e.g.
+    ?series=sma_20,rsi_14,macd&start=2024-01-01&end=2024-06-30&period=2y.
+    Indicators are computed over the whole `period` of history, so values
+    at `start` are already warmed up; only the requested range is returned.
+    """
+    try:
+        names = [name.strip().lower() for name in request.args.get('series', '').split(',') if name.strip()]
+        names = list(dict.fromkeys(names)) or DEFAULT_SERIES
+        period = request.args.get('period', '1y')
+        start = request.args.get('start')  # YYYY-MM-DD, inclusive
+        end = request.args.get('end')      # YYYY-MM-DD, inclusive
+        
+        try:
+            outputs = IndicatorSet(names).outputs
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        if period not in PERIOD_DAYS and period not in PERIOD_BARS and period not in ('ytd', 'max'):
+            return jsonify({'error': f"Unsupported period '{period}'"}), 400
+        try:
+            first_day = int(np.datetime64(start, 'D').astype(np.int64)) if start else None
+            last_day = int(np.datetime64(end, 'D').astype(np.int64)) if end else None
+        except ValueError:
+            return jsonify({'error': 'start and end must be dates in YYYY-MM-DD format'}), 400
+        
+        resolved_symbol, days, bars, error = load_ohlcv(symbol, period)
+        if error:
+            return jsonify({'error': error}), 404
+        
+        days, series = indicator_cache.get(resolved_symbol, names, days, bars, first_day, last_day, period=period)
+        return jsonify({
+            'symbol': resolved_symbol,
+            'count': len(days),
+            'Date': np.array(days, dtype='datetime64[D]').astype(str).tolist(),
+            # NaN (not enough bars yet) is not valid JSON
+            'series': {
+                output: [value if value == value else None for value in series[output]]
+                for output in outputs
+            },
+        }), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -597,12 +1129,11 @@ def search_stocks(query):
     enriched = []
     for stock in results[:5]:
         try:
-            data, _ = fetch_stock_data_safe(stock['symbol'], '5d')
+            data, _ = fetch_stock_data_safe(stock['symbol'], '5d', include_info=False)
             if data:
                 enriched.append({
                     **stock,
-                    'current_price': data['current_price'],
-                    'name': data['name']
+                    'current_price': data['current_price']
                 })
             else:
                 enriched.append(stock)
@@ -615,39 +1146,249 @@ def search_stocks(query):
 # PREDICTION API ENDPOINTS
 # ============================================
 
-def build_lstm_model(X_train, y_train, look_back=60):
-    """Build and train LSTM model"""
-    if not LSTM_AVAILABLE:
-        # Fallback to RandomForest if TensorFlow not available
-        print("⚠️ LSTM fallback: Using RandomForest instead")
-        return None, None
-    
+# Fitted models are reused until a newer bar arrives for the symbol
+model_registry = ModelRegistry(
+    max_entries=MODEL_REGISTRY_MAX_MODELS,
+    max_bytes=MODEL_REGISTRY_MAX_MB * 1024 * 1024
+)
+
+# Bounded worker processes (scikit-learn) and threads (LSTM) for model
+# training, so fitting never runs on (or starves) the request threads
+training_pool = TrainingPool(
+    max_workers=TRAINING_WORKERS,
+    max_threads=TRAINING_LSTM_CONCURRENCY,
+    cores=TRAINING_CORES,
+    max_queue=TRAINING_QUEUE_SIZE,
+    queue_timeout=TRAINING_QUEUE_TIMEOUT_SECONDS
+)
+
+# LSTMs are warm-started from the weights stored for the symbol
+lstm_store = LSTMStore(
+    LSTM_MODEL_DIR,
+    build_model=lambda look_back: create_model('LSTM', look_back),
+    params=MODEL_HYPERPARAMS['LSTM'],
+    epochs=MODEL_HYPERPARAMS['LSTM']['epochs'],
+    batch_size=MODEL_HYPERPARAMS['LSTM']['batch_size'],
+    finetune_epochs=LSTM_FINETUNE_EPOCHS,
+    train_budget=LSTM_TRAIN_BUDGET_SECONDS,
+    finetune_budget=LSTM_FINETUNE_BUDGET_SECONDS,
+    drift_factor=LSTM_DRIFT_FACTOR
+)
+
+# 'Online' models are updated with every new bar instead of being refitted
+online_models = OnlineModelStore(
+    ONLINE_MODEL_DIR,
+    build_model=lambda: create_model('Online'),
+    params=MODEL_HYPERPARAMS['Online'],
+    max_symbols=ONLINE_MODEL_MAX_SYMBOLS
+)
+
+# Flattened tree models written to disk are memory-mapped, so every worker
+# process and later runs share one copy instead of training their own
+tree_models = TreeModelStore(TREE_MODEL_DIR) if TREE_MODEL_DIR else None
+
+def stored_tree_model(key):
+    """Registry fields of a tree model another process already trained for key, or None"""
+    if tree_models is None or key[1] not in ('RandomForest', 'DecisionTree'):
+        return None
+    return tree_models.load(key)
+
+def keep_tree_model(key, fit):
+    """Persist a freshly flattened tree model and return its memory-mapped fields"""
+    if tree_models is None or fit['model_type'] != key[1] or not isinstance(fit['model'], FlatForest):
+        return fit
     try:
-        # Reshape for LSTM [samples, time steps, features]
-        X_train_lstm = X_train.reshape((X_train.shape[0], X_train.shape[1], 1))
-        
-        model = Sequential([
-            LSTM(50, return_sequences=True, input_shape=(X_train_lstm.shape[1], 1)),
-            Dropout(0.2),
-            LSTM(50, return_sequences=False),
-            Dropout(0.2),
-            Dense(25),
-            Dense(1)
-        ])
-        
-        model.compile(optimizer='adam', loss='mean_squared_error')
-        model.fit(X_train_lstm, y_train, epochs=10, batch_size=32, verbose=0)
-        
-        return model, X_train_lstm.shape
+        return tree_models.save(key, fit)
+    except OSError as e:
+        print(f"⚠️ Could not store tree model for {key[0]}: {str(e)}")
+        return fit
+
+def online_price_model(resolved_symbol, closes, look_back):
+    """Bring the symbol's online model up to date with closes; returns a FittedModel"""
+    fit = online_models.update(resolved_symbol, closes, look_back)
+    return FittedModel(fitted_at=time.time(), nbytes=0, **fit)
+
+def fit_lstm_model(model_type, closes, look_back, symbol):
+    """
+    Training-thread task: warm-start the symbol's stored LSTM (see
+    stock_common/lstm_store.py), falling back to RandomForest if it cannot be trained.
+    """
+    try:
+        return lstm_store.fit(symbol, closes, look_back)
     except Exception as e:
-        print(f"⚠️ LSTM build error: {str(e)}")
-        return None, None
+        print(f"⚠️ LSTM error, falling back to RandomForest: {str(e)}")
+    
+    from sklearn.preprocessing import MinMaxScaler
+    scaler = MinMaxScaler(feature_range=(0, 1))
+    scaled_prices = scaler.fit_transform(closes.reshape(-1, 1))
+    return {'scaler': scaler, 'look_back': look_back,
+            **fit_series('RandomForest', (scaled_prices.T, 0, len(closes)), look_back)}
+
+def fit_price_model(model_type, closes, look_back, symbol=None, horizon=1):
+    """
+    Train a next-close model on min-max scaled closing prices on the
+    training pool and wait for it; with a horizon > 1, a direct model of the
+    next `horizon` closes (training.DIRECT_MODEL_TYPES). Returns the fields
+    stored in the model registry. With a symbol, an LSTM is fine-tuned from
+    its stored weights when possible. Raises TrainingQueueFull when the pool
+    is at capacity.
+    """
+    if model_type == 'LSTM' and not LSTM_AVAILABLE:
+        print("⚠️ TensorFlow not available, using RandomForest instead")
+        model_type = 'RandomForest'
+    
+    if model_type == 'LSTM' and symbol:
+        return training_pool.run('LSTM', fit_lstm_model, (), (closes, look_back, symbol))
+    
+    from sklearn.preprocessing import MinMaxScaler
+    scaler = MinMaxScaler(feature_range=(0, 1))
+    scaled_prices = scaler.fit_transform(closes.reshape(-1, 1))
+    
+    # One-row matrix in the (matrix, row, length) form fit_series takes
+    series = (scaled_prices.T, 0, len(closes))
+    fit = training_pool.run(model_type, fit_series, (series, look_back, horizon), (series, look_back, horizon))
+    return {'model': fit['model'], 'scaler': scaler, 'look_back': look_back,
+            'model_type': fit['model_type'], 'metrics': fit['metrics']}
+
+def prediction_model_key(resolved_symbol, model_type, look_back, last_date, direct_horizon=1):
+    """
+    Model registry key for a prediction model trained on bars up to
+    last_date; direct multi-output models are keyed by their horizon too
+    """
+    params = {**MODEL_HYPERPARAMS[model_type], 'look_back': look_back}
+    if direct_horizon > 1:
+        params['horizon'] = direct_horizon
+    return model_registry.make_key(resolved_symbol, model_type, params, last_date)
+
+def forecast_options(data):
+    """(horizon, forecast_method) from a prediction request body; raises PredictionError"""
+    try:
+        horizon = int(data.get('horizon', 1))
+    except (TypeError, ValueError):
+        raise PredictionError('horizon must be an integer')
+    if not 1 <= horizon <= FORECAST_MAX_HORIZON:
+        raise PredictionError(f'horizon must be between 1 and {FORECAST_MAX_HORIZON}')
+    method = data.get('forecast_method') or 'auto'
+    if method not in FORECAST_METHODS:
+        raise PredictionError(f"forecast_method must be one of: {', '.join(FORECAST_METHODS)}")
+    return horizon, method
+
+def build_prediction(user_id, resolved_symbol, fitted, closes, horizon=1, method='recursive'):
+    """
+    Forecast the next `horizon` closes with a fitted model: (response dict,
+    stock_predictions document). predicted_price is the next close; a
+    multi-day path is returned as `forecast` and stored packed as float32.
+    """
+    model_type = fitted.model_type
+    confidence = fitted.metrics['confidence']
+    path = forecast_path(fitted, closes, horizon)
+    predicted_price = float(path[0])
+    
+    current_price = float(closes[-1])
+    price_change = ((predicted_price - current_price) / current_price) * 100
+    
+    if price_change > 2:
+        recommendation = 'BUY'
+    elif price_change < -2:
+        recommendation = 'SELL'
+    else:
+        recommendation = 'HOLD'
+    
+    result = {
+        'symbol': resolved_symbol,  # Use the working symbol (may have exchange suffix)
+        'predicted_price': round(predicted_price, 2),
+        'current_price': round(current_price, 2),
+        'price_change_percent': round(price_change, 2),
+        'confidence': round(confidence * 100, 1),
+        'model_type': model_type,
+        'recommendation': recommendation,
+        'prediction_date': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    }
+    doc = {
+        'user_id': user_id,
+        'symbol': resolved_symbol,
+        'predicted_price': predicted_price,
+        'current_price': current_price,
+        'confidence': confidence,
+        'model_type': model_type,
+        'recommendation': recommendation,
+        'created_at': datetime.now()
+    }
+    if horizon > 1:
+        result.update({
+            'horizon': horizon,
+            'forecast_method': method,
+            'forecast': [round(float(price), 2) for price in path],
+        })
+        doc['forecast'] = {'horizon': horizon, 'method': method, 'prices': encode_path(path)}
+    return result, doc
 
+class PredictionError(Exception):
+    """A prediction request that cannot be served, with the HTTP status to report"""
+    
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+def run_prediction(user_id, symbol, model_type='RandomForest', progress=None, horizon=1, forecast_method='auto'):
+    """
+    Fetch, train (or reuse a registered model), predict and save one
+    prediction of the next `horizon` closes. Returns the response dict;
+    raises PredictionError for requests that cannot be served.
+    progress(stage) is called as the prediction moves through its stages.
+    """
+    report = progress or (lambda stage: None)
+    print(f"🔮 Predicting {symbol} with {model_type}...")
+    
+    # Fetch closing prices (handles international symbols and the local bar store)
+    report('fetching')
+    resolved_symbol, closes, last_date, error = load_close_prices(symbol, "1y")
+    
+    if error:
+        raise PredictionError(error, 404)
+    
+    if len(closes) < 30:
+        raise PredictionError('Not enough historical data for prediction')
+    
+    look_back = min(60, len(closes) - 10)  # Use 60 days or less if not enough data
+    if len(closes) - look_back < 10:
+        raise PredictionError('Not enough data points for prediction')
+    
+    if model_type not in MODEL_HYPERPARAMS:
+        model_type = 'RandomForest'
+    
+    method = resolve_method(model_type, horizon, forecast_method)
+    direct_horizon = horizon if method == 'direct' else 1
+    if len(closes) - look_back - direct_horizon + 1 < 10:
+        raise PredictionError(f'Not enough data points for a direct {horizon}-day forecast')
+    
+    # Reuse the model fitted on the same bars, or train and register it;
+    # an online model learns only the bars it has not seen yet
+    report('training')
+    if model_type == 'Online':
+        fitted = online_price_model(resolved_symbol, closes, look_back)
+    else:
+        key = prediction_model_key(resolved_symbol, model_type, look_back, last_date, direct_horizon)
+        try:
+            fitted = model_registry.get_or_fit(key, lambda: stored_tree_model(key) or keep_tree_model(
+                key, fit_price_model(model_type, closes, look_back, resolved_symbol, direct_horizon)))
+        except TrainingQueueFull as e:
+            raise PredictionError(str(e), 503)
+    
+    report('predicting')
+    result, doc = build_prediction(user_id, resolved_symbol, fitted, closes, horizon, method)
+    
+    # Save prediction to MongoDB
+    report('saving')
+    collections['stock_predictions'].insert_one(doc)
+    
+    print(f"✅ Prediction saved: {resolved_symbol} -> ${doc['predicted_price']:.2f} ({doc['recommendation']})")
+    return result
 
 @app.route('/api/predict', methods=['POST'])
 @require_auth
 def predict():
-    """Predict stock price using ML models (SVM, DecisionTree, RandomForest, LSTM)"""
+    """Predict stock price using ML models (SVM, DecisionTree, RandomForest, LSTM, Online)"""
     try:
         user = request.current_user
         data = request.get_json()
@@ -656,280 +1397,496 @@ def predict():
         
         if not symbol:
             return jsonify({'error': 'Symbol is required'}), 400
+        horizon, forecast_method = forecast_options(data)
         
-        print(f"🔮 Predicting {symbol} with {model_type}...")
-        
-        # Fetch historical data using safe method (handles international symbols)
-        stock_data, error = fetch_stock_data_safe(symbol, "1y")
+        return jsonify(run_prediction(user['user_id'], symbol, model_type,
+                                      horizon=horizon, forecast_method=forecast_method)), 200
         
-        if error or not stock_data:
-            return jsonify({'error': error or 'Stock symbol not found'}), 404
+    except PredictionError as e:
+        return jsonify({'error': str(e)}), e.status
+    except Exception as e:
+        print(f"❌ Prediction error: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+# Background prediction jobs: bounded workers, per-user limits, deduplication
+prediction_jobs = JobQueue(
+    max_workers=PREDICTION_JOB_WORKERS,
+    max_unfinished=PREDICTION_JOB_QUEUE_SIZE,
+    per_user_limit=PREDICTION_JOBS_PER_USER,
+    retention=PREDICTION_JOB_RETENTION_MINUTES * 60
+)
+
+def job_urls(job):
+    return {
+        'status_url': f"/api/predict/jobs/{job.id}",
+        'events_url': f"/api/predict/jobs/{job.id}/events",
+    }
+
+@app.route('/api/predict/jobs', methods=['POST'])
+@require_auth
+def create_prediction_job():
+    """Queue a prediction and return its job id right away"""
+    try:
+        user = request.current_user
+        data = request.get_json() or {}
+        symbol = (data.get('symbol') or '').upper().strip()
+        model_type = data.get('model_type', 'RandomForest')
         
-        # Convert to DataFrame
-        hist_data = stock_data['data']
-        if len(hist_data) < 30:
-            return jsonify({'error': 'Not enough historical data for prediction'}), 400
+        if not symbol:
+            return jsonify({'error': 'Symbol is required'}), 400
+        horizon, forecast_method = forecast_options(data)
         
-        df = pd.DataFrame(hist_data)
-        df['Close'] = df['Close'].astype(float)
+        user_id = user['user_id']
+        job, created = prediction_jobs.submit(
+            user_id,
+            (user_id, symbol, model_type, horizon, forecast_method),
+            lambda job: run_prediction(user_id, symbol, model_type, progress=job.progress,
+                                       horizon=horizon, forecast_method=forecast_method)
+        )
         
-        # Prepare data for ML
-        prices = df['Close'].values.reshape(-1, 1)
+        return jsonify({**job.to_dict(), **job_urls(job), 'deduplicated': not created}), 202
         
-        # Scale data
-        scaler = MinMaxScaler(feature_range=(0, 1))
-        scaled_prices = scaler.fit_transform(prices)
-        
-        # Create sequences for prediction
-        look_back = min(60, len(prices) - 10)  # Use 60 days or less if not enough data
-        X, y = [], []
-        for i in range(look_back, len(scaled_prices)):
-            X.append(scaled_prices[i-look_back:i, 0])
-            y.append(scaled_prices[i, 0])
-        
-        X, y = np.array(X), np.array(y)
-        
-        if len(X) < 10:
-            return jsonify({'error': 'Not enough data points for prediction'}), 400
-        
-        split = int(0.8 * len(X))
-        X_train, X_test = X[:split], X[split:]
-        y_train, y_test = y[:split], y[split:]
-        
-        # Select and train model
-        if model_type == 'LSTM':
-            if LSTM_AVAILABLE:
-                try:
-                    # Reshape for LSTM [samples, time steps, features]
-                    X_train_lstm = X_train.reshape((X_train.shape[0], X_train.shape[1], 1))
-                    X_test_lstm = X_test.reshape((X_test.shape[0], X_test.shape[1], 1))
-                    
-                    model = Sequential([
-                        LSTM(50, return_sequences=True, input_shape=(look_back, 1)),
-                        Dropout(0.2),
-                        LSTM(50, return_sequences=False),
-                        Dropout(0.2),
-                        Dense(25),
-                        Dense(1)
-                    ])
-                    
-                    model.compile(optimizer='adam', loss='mean_squared_error')
-                    model.fit(X_train_lstm, y_train, epochs=15, batch_size=32, verbose=0)
-                    
-                    # Predict
-                    last_sequence = scaled_prices[-look_back:].reshape(1, look_back, 1)
-                    prediction_scaled = model.predict(last_sequence, verbose=0)[0, 0]
-                    
-                    # Calculate confidence using MSE on test set
-                    test_predictions = model.predict(X_test_lstm, verbose=0)
-                    mse = np.mean((test_predictions.flatten() - y_test) ** 2)
-                    confidence = max(0, min(1, 1 - mse))  # Lower MSE = higher confidence
-                    
-                except Exception as e:
-                    print(f"⚠️ LSTM error, falling back to RandomForest: {str(e)}")
-                    model_type = 'RandomForest'
+    except PredictionError as e:
+        return jsonify({'error': str(e)}), e.status
+    except JobLimitExceeded as e:
+        return jsonify({'error': str(e)}), 429
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def find_user_job(job_id, user):
+    job = prediction_jobs.get(job_id)
+    if job is None or job.user_id != user['user_id']:
+        return None
+    return job
+
+@app.route('/api/predict/jobs/<job_id>', methods=['GET'])
+@require_auth
+def get_prediction_job(job_id):
+    """Status, progress stage and (once finished) result of a prediction job"""
+    job = find_user_job(job_id, request.current_user)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify({**job.to_dict(), **job_urls(job)}), 200
+
+@app.route('/api/predict/jobs/<job_id>/events', methods=['GET'])
+def prediction_job_events(job_id):
+    """
+    Server-sent events for a prediction job: a 'progress' event on every
+    change and a final 'result' or 'error' event. EventSource cannot set
+    headers, so the token may also be passed as ?token=.
+    """
+    user = get_current_user() or verify_token(request.args.get('token', ''))
+    if not user:
+        return jsonify({'error': 'Authentication required'}), 401
+    job = find_user_job(job_id, user)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    def generate():
+        version = -1
+        while True:
+            current = job.wait_for_change(version, timeout=PREDICTION_JOB_HEARTBEAT_SECONDS)
+            if current == version:
+                # Keep idle connections (and proxies) alive
+                yield ": heartbeat\n\n"
+                continue
+            version = current
+            state = job.to_dict()
+            if job.finished:
+                event = 'result' if state['status'] == 'succeeded' else 'error'
+                yield f"event: {event}\ndata: {json.dumps(state)}\n\n"
+                return
+            yield f"event: progress\ndata: {json.dumps(state)}\n\n"
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/api/predict/batch', methods=['POST'])
+@require_auth
+def predict_batch():
+    """
+    Predict many symbols with one or more model types in one request.
+    History is fetched in bulk, all symbols are scaled in one vectorized
+    pass over a shared-memory matrix, models train in parallel (reusing
+    registered models) and predictions are saved with one insert_many.
+    Results stream back as NDJSON, one line per symbol/model as it
+    completes, followed by a summary line; ?stream=false returns one JSON body.
+    """
+    try:
+        user = request.current_user
+        user_id = user['user_id']
+        data = request.get_json() or {}
+        symbols = list(dict.fromkeys(s.upper().strip() for s in data.get('symbols', []) if s and s.strip()))
+        model_types = data.get('model_types') or [data.get('model_type', 'RandomForest')]
+        stream = request.args.get('stream', 'true').lower() not in ('0', 'false', 'no')
+        
+        if not symbols:
+            return jsonify({'error': 'symbols is required'}), 400
+        if len(symbols) > PREDICTION_BATCH_MAX_SYMBOLS:
+            return jsonify({'error': f'At most {PREDICTION_BATCH_MAX_SYMBOLS} symbols per batch'}), 400
+        invalid = [m for m in model_types if m not in MODEL_HYPERPARAMS]
+        if invalid:
+            return jsonify({'error': f"Invalid model type(s): {', '.join(invalid)}"}), 400
+        horizon, forecast_method = forecast_options(data)
+        methods = {model_type: resolve_method(model_type, horizon, forecast_method) for model_type in model_types}
+        
+        print(f"🔮 Batch predicting {len(symbols)} symbol(s) with {', '.join(model_types)}...")
+        loaded = load_close_prices_bulk(symbols, "1y")
+        
+        errors = []
+        series = []  # (symbol, resolved_symbol, closes, last_date)
+        for symbol in symbols:
+            resolved_symbol, closes, last_date, error = loaded[symbol]
+            if error:
+                errors.append({'symbol': symbol, 'error': error})
+            elif len(closes) < 30:
+                errors.append({'symbol': symbol, 'error': 'Not enough historical data for prediction'})
             else:
-                print("⚠️ TensorFlow not available, using RandomForest instead")
-                model_type = 'RandomForest'
-        
-        # Non-LSTM models
-        if model_type != 'LSTM':
-            if model_type == 'SVM':
-                model = SVR(kernel='rbf', C=1e3, gamma=0.1)
-            elif model_type == 'DecisionTree':
-                model = DecisionTreeRegressor(random_state=42)
-            else:  # RandomForest
-                model = RandomForestRegressor(n_estimators=100, random_state=42)
-            
-            model.fit(X_train, y_train)
-            
-            # Predict next price
-            last_sequence = scaled_prices[-look_back:].flatten().reshape(1, -1)
-            prediction_scaled = model.predict(last_sequence)[0]
-            
-            # Calculate confidence
-            train_score = model.score(X_train, y_train)
-            test_score = model.score(X_test, y_test) if len(X_test) > 0 else train_score
-            confidence = max(0, min(1, (train_score + test_score) / 2))
-        
-        # Inverse transform prediction
-        prediction_scaled_2d = np.array([[prediction_scaled]])
-        predicted_price = float(scaler.inverse_transform(prediction_scaled_2d)[0, 0])
-        
-        current_price = float(df['Close'].iloc[-1])
-        price_change = ((predicted_price - current_price) / current_price) * 100
-        
-        if price_change > 2:
-            recommendation = 'BUY'
-        elif price_change < -2:
-            recommendation = 'SELL'
-        else:
-            recommendation = 'HOLD'
-        
-        result = {
-            'symbol': stock_data['symbol'],  # Use the working symbol (may have exchange suffix)
-            'predicted_price': round(predicted_price, 2),
-            'current_price': round(current_price, 2),
-            'price_change_percent': round(price_change, 2),
-            'confidence': round(confidence * 100, 1),
-            'model_type': model_type,
-            'recommendation': recommendation,
-            'prediction_date': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        }
-        
-        # Save prediction to MongoDB
-        collections['stock_predictions'].insert_one({
-            'user_id': user['user_id'],
-            'symbol': stock_data['symbol'],
-            'predicted_price': predicted_price,
-            'current_price': current_price,
-            'confidence': confidence,
-            'model_type': model_type,
-            'recommendation': recommendation,
-            'created_at': datetime.now()
-        })
-        
-        print(f"✅ Prediction saved: {stock_data['symbol']} -> ${predicted_price:.2f} ({recommendation})")
-        
-        return jsonify(result), 200
+                series.append((symbol, resolved_symbol, closes, last_date))
+        
+        # One vectorized min-max scaling pass over all symbols
+        from sklearn.preprocessing import MinMaxScaler
+        scalers = [MinMaxScaler(feature_range=(0, 1)).fit(closes.reshape(-1, 1)) for _, _, closes, _ in series]
+        matrix, lengths = stack_series([closes for _, _, closes, _ in series])
+        if series:
+            scale = np.array([scaler.scale_[0] for scaler in scalers])
+            offset = np.array([scaler.min_[0] for scaler in scalers])
+            matrix = matrix * scale[:, None] + offset[:, None]
+        
+        # Registered models are reused; the rest train in parallel
+        ready = []    # (row, requested type, FittedModel)
+        pending = {}  # future -> (row, requested type, registry key, look_back)
+        shared = SharedArrays({'series': matrix}) if series else None
+        try:
+            for row, (symbol, resolved_symbol, closes, last_date) in enumerate(series):
+                look_back = min(60, len(closes) - 10)
+                for model_type in model_types:
+                    if model_type == 'Online':
+                        ready.append((row, model_type, online_price_model(resolved_symbol, closes, look_back)))
+                        continue
+                    direct_horizon = horizon if methods[model_type] == 'direct' else 1
+                    if len(closes) - look_back - direct_horizon + 1 < 10:
+                        errors.append({'symbol': symbol, 'model_type': model_type,
+                                       'error': f'Not enough data points for a direct {horizon}-day forecast'})
+                        continue
+                    key = prediction_model_key(resolved_symbol, model_type, look_back, last_date, direct_horizon)
+                    fitted = model_registry.get(key)
+                    if fitted is None:
+                        stored = stored_tree_model(key)
+                        if stored is not None:
+                            fitted = model_registry.put(key, **stored)
+                    if fitted is not None:
+                        ready.append((row, model_type, fitted))
+                        continue
+                    if model_type == 'LSTM' and LSTM_AVAILABLE:
+                        # Warm-started from the stored weights on a training thread
+                        future = training_pool.submit(
+                            'LSTM', fit_lstm_model, (), (closes, look_back, resolved_symbol)
+                        )
+                    else:
+                        future = training_pool.submit(
+                            'RandomForest' if model_type == 'LSTM' else model_type, fit_series,
+                            ((shared.specs, row, int(lengths[row])), look_back, direct_horizon),
+                            ((matrix, row, int(lengths[row])), look_back, direct_horizon)
+                        )
+                    pending[future] = (row, model_type, key, look_back)
+        except Exception:
+            if shared is not None:
+                # Tasks already queued would attach to the block after it is gone
+                training_pool.cancel(pending)
+                shared.close()
+            raise
+        
+        def completed():
+            for row, model_type, fitted in ready:
+                yield row, model_type, fitted, None
+            try:
+                for (row, model_type, key, look_back), fit, error in training_pool.as_completed(pending):
+                    if error is not None:
+                        yield row, model_type, None, error
+                        continue
+                    fit = keep_tree_model(key, {'scaler': scalers[row], 'look_back': look_back, **fit})
+                    fitted = model_registry.put(
+                        key, fit['model'], scaler=fit['scaler'], look_back=look_back,
+                        model_type=fit['model_type'], metrics=fit['metrics']
+                    )
+                    yield row, model_type, fitted, None
+            finally:
+                if shared is not None:
+                    # The client may have gone away with trainings still queued
+                    training_pool.cancel(pending)
+                    shared.close()
+        
+        def generate():
+            docs = []
+            failed = len(errors)
+            try:
+                for error in errors:
+                    yield error
+                for row, model_type, fitted, error in completed():
+                    symbol, resolved_symbol, closes, _ = series[row]
+                    if error is not None:
+                        failed += 1
+                        print(f"  ⚠️ {symbol} {model_type} failed: {str(error)}")
+                        yield {'symbol': symbol, 'model_type': model_type, 'error': str(error)}
+                        continue
+                    result, doc = build_prediction(user_id, resolved_symbol, fitted, closes,
+                                                   horizon, methods[model_type])
+                    docs.append(doc)
+                    yield {**result, 'requested_symbol': symbol}
+            finally:
+                # Save everything that finished, even if the client went away
+                if docs:
+                    collections['stock_predictions'].insert_many(docs, ordered=False)
+                    print(f"✅ Batch saved {len(docs)} prediction(s)")
+            yield {'done': True, 'predictions': len(docs), 'errors': failed}
+        
+        if not stream:
+            lines = list(generate())
+            summary = lines.pop()
+            return jsonify({
+                'predictions': [line for line in lines if 'error' not in line],
+                'errors': [line for line in lines if 'error' in line],
+                'count': summary['predictions'],
+            }), 200
+        
+        return Response(
+            stream_with_context(json.dumps(line) + '\n' for line in generate()),
+            mimetype='application/x-ndjson'
+        )
         
+    except PredictionError as e:
+        return jsonify({'error': str(e)}), e.status
+    except TrainingQueueFull as e:
+        return jsonify({'error': str(e)}), 503
     except Exception as e:
-        print(f"❌ Prediction error: {str(e)}")
+        print(f"❌ Batch prediction error: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+# Fold evaluations of /api/compare_models, reused until a newer bar arrives
+backtest_cache = BacktestCache(max_entries=BACKTEST_CACHE_SIZE)
+
+def fold_summary(index, fold, result, cached):
+    """Per-fold compare_models entry"""
+    return {
+        'fold': index,
+        'train': list(fold['train']),
+        'test': list(fold['test']),
+        'mae': round(result['metrics']['mae'], 4),
+        'rmse': round(result['metrics']['rmse'], 4),
+        'r2_score': round(result['metrics']['r2'], 4),
+        'train_seconds': result['seconds'],
+        'cached': cached,
+    }
+
+def comparison_result(name, fold_results, error, scaler, wall_seconds):
+    """One compare_models row from a model's fold evaluations (or its error)"""
+    if error is not None:
+        print(f"  ⚠️ {name} failed: {str(error)}")
+        return {'model': name, 'accuracy': 0, 'mae': 0, 'rmse': 0, 'r2_score': 0, 'mae_price': 0, 'error': str(error)}
+    
+    metrics, actual, preds = aggregate_folds([result for _, result, _ in fold_results])
+    
+    # Price-level error: min-max scaling is linear
+    mae_price = float(np.mean(np.abs(actual - preds)) / scaler.scale_[0])
+    train_seconds = round(sum(result['seconds'] for _, result, _ in fold_results), 3)
+    
+    print(f"  ✅ {name}: R²={metrics['r2']:.4f}, MAE=${mae_price:.2f} ({len(fold_results)} folds, {wall_seconds}s)")
+    return {
+        'model': name,
+        'accuracy': max(0, round(metrics['r2'] * 100, 1)),
+        'mae': round(metrics['mae'], 4),
+        'rmse': round(metrics['rmse'], 4),
+        'r2_score': round(metrics['r2'], 4),
+        'mae_price': round(mae_price, 2),
+        'train_seconds': train_seconds,
+        'wall_seconds': wall_seconds,
+        'folds': [fold_summary(index, fold, result, cached) for (index, fold), result, cached in fold_results],
+    }
+
+def backtest_settings(data):
+    """
+    Backtest options and the per-model timeout from a compare_models request
+    body; raises ValueError when invalid
+    """
+    def optional_int(name):
+        value = data.get(name)
+        try:
+            return None if value in (None, '') else int(value)
+        except (TypeError, ValueError):
+            raise ValueError('folds, step, horizon and train_size must be integers')
+    
+    try:
+        timeout = float(data.get('timeout', COMPARE_MODEL_TIMEOUT_SECONDS))
+    except (TypeError, ValueError):
+        timeout = float('nan')
+    if not np.isfinite(timeout) or timeout <= 0:
+        raise ValueError('timeout must be a positive number of seconds')
+    
+    return {
+        'folds': optional_int('folds') or BACKTEST_FOLDS,
+        'step': optional_int('step'),
+        'horizon': optional_int('horizon') or 1,
+        'mode': data.get('mode') or 'expanding',
+        'train_size': optional_int('train_size'),
+    }, timeout
+
 @app.route('/api/compare_models', methods=['POST'])
 @require_auth
 def compare_models():
-    """Compare all ML models' accuracy for a given stock symbol"""
+    """
+    Backtest every ML model on a stock symbol (see backtest.py).
+    
+    Body options: folds, step (test samples per fold), horizon (bars
+    ahead), mode ('expanding' or 'walk_forward') and train_size (training
+    samples per fold in walk_forward mode). Every (model, fold) trains
+    concurrently on the training pool, and fold results are cached until
+    the next bar. With ?stream=true (or Accept: application/x-ndjson) each
+    model's result is streamed as one JSON line as soon as all its folds
+    finish, followed by a final summary line.
+    """
     try:
         user = request.current_user
-        data = request.get_json()
+        data = request.get_json(silent=True) or {}
         symbol = data.get('symbol')
+        stream = (request.args.get('stream', '').lower() in ('1', 'true', 'yes')
+                  or request.accept_mimetypes.best == 'application/x-ndjson')
         
         if not symbol:
             return jsonify({'error': 'Symbol is required'}), 400
+        try:
+            settings, timeout = backtest_settings(data)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
         print(f"📊 Comparing all models for {symbol}...")
         
-        # Fetch historical data
-        stock_data, error = fetch_stock_data_safe(symbol, "1y")
-        if error or not stock_data:
-            return jsonify({'error': error or 'Stock symbol not found'}), 404
+        # Fetch closing prices
+        resolved_symbol, closes, last_date, error = load_close_prices(symbol, "1y")
+        if error:
+            return jsonify({'error': error}), 404
         
-        hist_data = stock_data['data']
-        if len(hist_data) < 30:
+        if len(closes) < 30:
             return jsonify({'error': 'Not enough historical data'}), 400
         
-        df = pd.DataFrame(hist_data)
-        df['Close'] = df['Close'].astype(float)
-        prices = df['Close'].values.reshape(-1, 1)
-        
+        from sklearn.preprocessing import MinMaxScaler
         scaler = MinMaxScaler(feature_range=(0, 1))
-        scaled_prices = scaler.fit_transform(prices)
-        
-        look_back = min(60, len(prices) - 10)
-        X, y = [], []
-        for i in range(look_back, len(scaled_prices)):
-            X.append(scaled_prices[i-look_back:i, 0])
-            y.append(scaled_prices[i, 0])
-        X, y = np.array(X), np.array(y)
+        scaled_prices = scaler.fit_transform(closes.reshape(-1, 1))[:, 0]
         
-        if len(X) < 10:
-            return jsonify({'error': 'Not enough data points'}), 400
-        
-        split = int(0.8 * len(X))
-        X_train, X_test = X[:split], X[split:]
-        y_train, y_test = y[:split], y[split:]
-        
-        from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
-        
-        results = []
-        model_configs = {
-            'RandomForest': RandomForestRegressor(n_estimators=100, random_state=42),
-            'SVM': SVR(kernel='rbf', C=1e3, gamma=0.1),
-            'DecisionTree': DecisionTreeRegressor(random_state=42),
-        }
-        
-        for name, model in model_configs.items():
-            try:
-                model.fit(X_train, y_train)
-                preds = model.predict(X_test)
-                
-                mae = float(mean_absolute_error(y_test, preds))
-                rmse = float(np.sqrt(mean_squared_error(y_test, preds)))
-                r2 = float(r2_score(y_test, preds))
-                accuracy = max(0, round(r2 * 100, 1))
-                
-                # Inverse transform for price-level errors
-                y_test_prices = scaler.inverse_transform(y_test.reshape(-1, 1)).flatten()
-                preds_prices = scaler.inverse_transform(preds.reshape(-1, 1)).flatten()
-                mae_price = float(np.mean(np.abs(y_test_prices - preds_prices)))
-                
-                results.append({
-                    'model': name,
-                    'accuracy': accuracy,
-                    'mae': round(mae, 4),
-                    'rmse': round(rmse, 4),
-                    'r2_score': round(r2, 4),
-                    'mae_price': round(mae_price, 2),
-                })
-                print(f"  ✅ {name}: R²={r2:.4f}, MAE=${mae_price:.2f}")
-            except Exception as e:
-                print(f"  ⚠️ {name} failed: {str(e)}")
-                results.append({'model': name, 'accuracy': 0, 'mae': 0, 'rmse': 0, 'r2_score': 0, 'mae_price': 0, 'error': str(e)})
+        look_back = min(60, len(closes) - 10)
+        horizon = settings['horizon']
+        n_samples = len(closes) - look_back - horizon + 1
+        try:
+            folds = list(enumerate(walk_forward_folds(n_samples, **settings)))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        def cache_key(name, index):
+            params = {**MODEL_HYPERPARAMS[name], **settings, 'look_back': look_back}
+            return (*model_registry.make_key(resolved_symbol, name, params, last_date), index)
+        
+        # Cached folds are reused; the series is copied into shared memory
+        # once and every remaining (model, fold) trains as its own task
+        started = time.perf_counter()
+        arrays = {'series': scaled_prices}
+        shared = None
+        fold_results = {}  # model -> [((index, fold), result, cached)]
+        futures = {}       # future -> (model, index)
+        skipped = []
+        try:
+            for name in MODEL_HYPERPARAMS:
+                if name == 'LSTM' and not LSTM_AVAILABLE:
+                    skipped.append({'model': 'LSTM', 'accuracy': 0, 'mae': 0, 'rmse': 0, 'r2_score': 0, 'mae_price': 0, 'error': 'TensorFlow not installed'})
+                    continue
+                fold_results[name] = []
+                for index, fold in folds:
+                    result = backtest_cache.get(cache_key(name, index))
+                    if result is not None:
+                        fold_results[name].append(((index, fold), result, True))
+                        continue
+                    if shared is None:
+                        shared = SharedArrays(arrays)
+                    future = training_pool.submit(
+                        name, evaluate_fold,
+                        (shared.specs, look_back, horizon, fold), (arrays, look_back, horizon, fold)
+                    )
+                    futures[future] = (name, index)
+        except Exception:
+            if shared is not None:
+                training_pool.cancel(futures)
+                shared.close()
+            raise
+        
+        def summary(results):
+            # Sort by accuracy descending
+            results.sort(key=lambda x: x['accuracy'], reverse=True)
+            return {
+                'symbol': resolved_symbol,
+                'models': results,
+                'data_points': n_samples,
+                'test_size': sum(fold['test'][1] - fold['test'][0] for _, fold in folds),
+                'backtest': {**settings, 'step': folds[0][1]['test'][1] - folds[0][1]['test'][0],
+                             'look_back': look_back, 'last_bar_date': str(last_date)[:10]},
+                'wall_seconds': round(time.perf_counter() - started, 3),
+            }
         
-        # LSTM
-        if LSTM_AVAILABLE:
+        def completed():
+            # A model's row is ready once all of its folds are
+            remaining = {name: len(folds) - len(results) for name, results in fold_results.items()}
+            failed = set()
+            for name, results in fold_results.items():
+                if not remaining[name]:
+                    yield comparison_result(name, sorted(results, key=lambda r: r[0][0]), None, scaler, 0.0)
             try:
-                X_train_lstm = X_train.reshape((X_train.shape[0], X_train.shape[1], 1))
-                X_test_lstm = X_test.reshape((X_test.shape[0], X_test.shape[1], 1))
-                
-                lstm_model = Sequential([
-                    LSTM(50, return_sequences=True, input_shape=(look_back, 1)),
-                    Dropout(0.2),
-                    LSTM(50, return_sequences=False),
-                    Dropout(0.2),
-                    Dense(25),
-                    Dense(1)
-                ])
-                lstm_model.compile(optimizer='adam', loss='mean_squared_error')
-                lstm_model.fit(X_train_lstm, y_train, epochs=15, batch_size=32, verbose=0)
-                
-                preds = lstm_model.predict(X_test_lstm, verbose=0).flatten()
-                mae = float(mean_absolute_error(y_test, preds))
-                rmse = float(np.sqrt(mean_squared_error(y_test, preds)))
-                r2 = float(r2_score(y_test, preds))
-                accuracy = max(0, round(r2 * 100, 1))
-                
-                y_test_prices = scaler.inverse_transform(y_test.reshape(-1, 1)).flatten()
-                preds_prices = scaler.inverse_transform(preds.reshape(-1, 1)).flatten()
-                mae_price = float(np.mean(np.abs(y_test_prices - preds_prices)))
-                
-                results.append({
-                    'model': 'LSTM',
-                    'accuracy': accuracy,
-                    'mae': round(mae, 4),
-                    'rmse': round(rmse, 4),
-                    'r2_score': round(r2, 4),
-                    'mae_price': round(mae_price, 2),
-                })
-                print(f"  ✅ LSTM: R²={r2:.4f}, MAE=${mae_price:.2f}")
-            except Exception as e:
-                print(f"  ⚠️ LSTM failed: {str(e)}")
-                results.append({'model': 'LSTM', 'accuracy': 0, 'mae': 0, 'rmse': 0, 'r2_score': 0, 'mae_price': 0, 'error': str(e)})
-        else:
-            results.append({'model': 'LSTM', 'accuracy': 0, 'mae': 0, 'rmse': 0, 'r2_score': 0, 'mae_price': 0, 'error': 'TensorFlow not installed'})
-        
-        # Sort by accuracy descending
-        results.sort(key=lambda x: x['accuracy'], reverse=True)
-        
-        return jsonify({
-            'symbol': stock_data['symbol'],
-            'models': results,
-            'data_points': len(X),
-            'test_size': len(X_test),
-        }), 200
-        
+                # Every fold's budget counts from the same start, so a model's
+                # folds share one deadline: the model times out unless all of
+                # them finish within timeout seconds
+                timeouts = {task: timeout for task in futures.values()}
+                for (name, index), result, error in training_pool.as_completed(futures, timeouts):
+                    if name in failed:
+                        continue
+                    if error is not None:
+                        failed.add(name)
+                        if isinstance(error, TimeoutError):
+                            error = TimeoutError(f"{name} did not finish within {timeout}s")
+                        # The model's other folds no longer count
+                        for future, (other, _) in futures.items():
+                            if other == name:
+                                future.cancel()
+                        yield comparison_result(name, None, error, scaler, None)
+                        continue
+                    backtest_cache.put(cache_key(name, index), result)
+                    fold_results[name].append(((index, folds[index][1]), result, False))
+                    remaining[name] -= 1
+                    if not remaining[name]:
+                        wall_seconds = round(time.perf_counter() - started, 3)
+                        yield comparison_result(name, sorted(fold_results[name], key=lambda r: r[0][0]),
+                                                None, scaler, wall_seconds)
+            finally:
+                if shared is not None:
+                    # The client may have gone away with folds still queued
+                    training_pool.cancel(futures)
+                    shared.close()
+        
+        if not stream:
+            return jsonify(summary(list(completed()) + skipped)), 200
+        
+        def generate():
+            results = list(skipped)
+            for row in skipped:
+                yield json.dumps(row) + '\n'
+            for row in completed():
+                results.append(row)
+                yield json.dumps(row) + '\n'
+            yield json.dumps({'done': True, **summary(results)}) + '\n'
+        
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+        
+    except TrainingQueueFull as e:
+        return jsonify({'error': str(e)}), 503
     except Exception as e:
         print(f"❌ Model comparison error: {str(e)}")
         return jsonify({'error': str(e)}), 500
@@ -948,6 +1905,10 @@ def get_user_predictions():
             .limit(50)
         )
         
+        for p in predictions:
+            if 'forecast' in p:
+                p['forecast'] = {**p['forecast'], 'prices': decode_path(p['forecast']['prices'])}
+        
         return jsonify([serialize_doc(p) for p in predictions]), 200
         
     except Exception as e:
@@ -969,7 +1930,7 @@ def get_watchlist():
         enriched = []
         for item in watchlist:
             try:
-                stock_data, _ = fetch_stock_data_safe(item['symbol'], '5d')
+                stock_data, _ = fetch_stock_data_safe(item['symbol'], '5d', include_info=False)
                 enriched.append({
                     **serialize_doc(item),
                     'current_price': stock_data['current_price'] if stock_data else None
@@ -1218,6 +2179,20 @@ def health_check():
             'database': db.name,
             'collections': collection_stats,
             'openai_configured': bool(OPENAI_API_KEY),
+            'ohlcv_cache': ohlcv_cache.stats(),
+            'symbol_resolver': symbol_resolver.stats(),
+            'metadata_cache': metadata_cache.stats(),
+            'history_single_flight': history_flight.stats(),
+            'model_registry': model_registry.stats(),
+            'tree_models': tree_models.stats() if tree_models is not None else None,
+            'backtest_cache': backtest_cache.stats(),
+            'indicator_cache': indicator_cache.stats(),
+            'training_pool': training_pool.stats(),
+            'lstm_store': lstm_store.stats(),
+            'online_models': online_models.stats(),
+            'startup': startup_report(),
+            'prediction_jobs': prediction_jobs.stats(),
+            'market_data_provider': market_data.name,
             'message': 'Flask API + MongoDB is running!'
         }), 200
         
@@ -1250,6 +2225,117 @@ def database_info():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# ============================================
+# MAINTENANCE COMMANDS
+# Run: flask --app app <command>
+# ============================================
+
+@app.cli.command('migrate-stock-data')
+@click.option('--keep-snapshots', is_flag=True, help='Leave the old stock_data snapshot documents in place.')
+def migrate_stock_data(keep_snapshots):
+    """Move embedded stock_data history arrays into per-bar stock_bars documents."""
+    snapshot_query = {'data': {'$exists': True}}
+    symbols = collections['stock_data'].distinct('symbol', snapshot_query)
+    print(f"🔄 Migrating {len(symbols)} symbol(s) to stock_bars...")
+    
+    for raw_symbol in symbols:
+        symbol = raw_symbol.upper().strip()
+        frames = []
+        for doc in collections['stock_data'].find({**snapshot_query, 'symbol': raw_symbol}).sort('date', ASCENDING):
+            frame = pd.DataFrame(doc['data'])
+            if frame.empty or 'Date' not in frame:
+                continue
+            frame.index = pd.DatetimeIndex(pd.to_datetime(frame.pop('Date')), name='Date')
+            # The bar dated on the fetch day may have been incomplete
+            if doc.get('date'):
+                frame = frame[frame.index < pd.Timestamp(doc['date'])]
+            frames.append(frame[OHLCV_COLUMNS])
+        
+        added = 0
+        if frames:
+            merged = pd.concat(frames)
+            merged = merged[~merged.index.duplicated(keep='last')].sort_index()
+            # Bars stored by an earlier (possibly interrupted) run are not inserted again
+            stored_dates = pd.DatetimeIndex(collections['stock_bars'].distinct('date', {'symbol': symbol}))
+            merged = merged[~merged.index.isin(stored_dates)]
+            if not merged.empty:
+                summary = load_bar_summary(symbol)
+                covers_from = summary['covers_from'] if summary else merged.index[0].strftime('%Y-%m-%d')
+                added = save_stored_bars(symbol, merged, covers_from, summary)
+        
+        if not keep_snapshots:
+            collections['stock_data'].delete_many({**snapshot_query, 'symbol': raw_symbol})
+        print(f"  ✅ {symbol}: {added} bar(s) migrated")
+    
+    print("✅ Migration complete!")
+
+@app.cli.command('export-bars')
+@click.argument('symbols', nargs=-1, required=True)
+@click.option('--period', default='max', show_default=True, help='History period to export.')
+def export_bars(symbols, period):
+    """Write daily bars for SYMBOLS into the local memory-mapped bar store."""
+    if bar_store is None:
+        raise click.ClickException('Set LOCAL_BAR_STORE_DIR to enable the local bar store.')
+    
+    for symbol in symbols:
+        for sym in symbol_resolver.candidates(symbol):
+            hist = fetch_history(sym, period, '1d')
+            if hist.empty:
+                symbol_resolver.record_miss(symbol, sym)
+            else:
+                symbol_resolver.record_hit(symbol, sym)
+                count = bar_store.write(sym, hist)
+                print(f"  ✅ {sym}: {count} bar(s) -> {bar_store.path(sym)}")
+                break
+        else:
+            print(f"  ⚠️ {symbol.upper()}: no data found")
+
+@app.cli.command('record-market-data')
+@click.argument('symbols', nargs=-1, required=True)
+@click.option('--period', default='10y', show_default=True, help='History period to record.')
+@click.option('--out', 'out_dir', default=None, help='Recording directory (defaults to MARKET_DATA_REPLAY_DIR).')
+def record_market_data(symbols, period, out_dir):
+    """Record daily bars and metadata for SYMBOLS for the replay market data provider."""
+    out_dir = out_dir or MARKET_DATA_REPLAY_DIR
+    if not out_dir:
+        raise click.ClickException('Pass --out or set MARKET_DATA_REPLAY_DIR.')
+    recorder = ReplayProvider(root=out_dir, synthetic=False)
+    
+    for symbol in symbols:
+        symbol = symbol.upper().strip()
+        hist = market_data.history(symbol, period=period, interval='1d')
+        if hist.empty:
+            print(f"  ⚠️ {symbol}: no data found")
+            continue
+        try:
+            info = market_data.metadata(symbol)
+        except Exception:
+            info = None
+        count = recorder.record(symbol, hist, info)
+        print(f"  ✅ {symbol}: {count} bar(s) recorded")
+
+# ============================================
+# STARTUP
+# ============================================
+
+def preload():
+    """Load the deferred libraries and set up the database ahead of the first request"""
+    for name in ('pandas', 'sklearn.preprocessing', 'sklearn.ensemble', 'sklearn.svm', 'sklearn.tree', 'yfinance'):
+        if module_available(name):
+            timed_import(name)
+    if LSTM_AVAILABLE:
+        timed_import('tensorflow')
+    try:
+        database_setup.get()
+    except Exception:
+        pass  # reported by setup_database; retried on first use
+
+ready_seconds = mark_ready()
+print(f"⏱️ App loaded in {ready_seconds:.2f}s")
+# Training workers import this module as __mp_main__; they never serve requests
+if PRELOAD_ON_START and __name__ != '__mp_main__':
+    threading.Thread(target=preload, name='preload', daemon=True).start()
+
 # ============================================
 # RUN THE APP
 # ============================================
@@ -1262,6 +2348,7 @@ if __name__ == '__main__':
     print(f"🔗 API URL: http://localhost:5000")
     print(f"❤️  Health: http://localhost:5000/health")
     print(f"🤖 OpenAI: {'Configured' if OPENAI_API_KEY else 'Not configured (using fallback)'}")
+    print(f"📈 Market data: {market_data.name}")
     print("="*50 + "\n")
     
     app.run(debug=True, host='0.0.0.0', port=5000)
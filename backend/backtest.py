@@ -0,0 +1,168 @@
+# ============================================
+# WALK-FORWARD BACKTESTING
+# Out-of-sample evaluation of a model over consecutive test blocks
+# ============================================
+#
+# The look_back windows of a scaled series are split into `folds`
+# consecutive test blocks of `step` samples that end at the latest bar.
+# Each fold trains on the samples before its block:
+#   expanding     every sample from the start of the series
+#   walk_forward  a fixed number (train_size) of the most recent samples
+# With a horizon h the target is the close h bars after the window, and the
+# h - 1 samples before a test block are left out of training so no training
+# target falls inside it.
+#
+# Every (model, fold) is one training pool task. Workers map the scaled
+# series from shared memory and slice the windows of their fold out of one
+# strided view, so no fold copies the dataset.
+
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from stock_common.datasets import make_windows
+from training import SharedArrays, fit_and_predict, regression_metrics
+
+BACKTEST_MODES = ('expanding', 'walk_forward')
+
+# Share of the samples tested when no step is given
+DEFAULT_TEST_FRACTION = 0.5
+
+# Every fold is a training task per model, so the fold count is bounded
+MAX_FOLDS = 20
+
+
+def walk_forward_folds(n_samples, folds=5, step=None, horizon=1, mode='expanding', train_size=None):
+    """
+    Sample index ranges of each fold as a list of dicts with 'train' and
+    'test' (start, end) pairs, oldest fold first. Raises ValueError when
+    the series is too short for the requested layout.
+    """
+    if mode not in BACKTEST_MODES:
+        raise ValueError(f"mode must be one of: {', '.join(BACKTEST_MODES)}")
+    if not 1 <= folds <= MAX_FOLDS:
+        raise ValueError(f"folds must be between 1 and {MAX_FOLDS}")
+    if horizon < 1:
+        raise ValueError('horizon must be at least 1')
+    if step is None:
+        step = max(2, int(DEFAULT_TEST_FRACTION * n_samples) // folds)
+    if step < 2:
+        # R² needs at least two test samples
+        raise ValueError('step must be at least 2')
+
+    first_test = n_samples - folds * step
+    first_train_end = first_test - (horizon - 1)
+    if mode == 'walk_forward':
+        train_size = train_size or first_train_end
+        if train_size < 1 or train_size > first_train_end:
+            raise ValueError(f"train_size must be between 1 and {max(first_train_end, 1)}")
+    if first_train_end < 10:
+        raise ValueError('Not enough data points for this many folds')
+
+    layout = []
+    for fold in range(folds):
+        test_start = first_test + fold * step
+        train_end = test_start - (horizon - 1)
+        train_start = train_end - train_size if mode == 'walk_forward' else 0
+        layout.append({'train': (train_start, train_end), 'test': (test_start, test_start + step)})
+    return layout
+
+
+def _score_fold(series, model_type, look_back, horizon, fold):
+    X, y = make_windows(series, look_back, horizon=horizon)
+    if horizon > 1:
+        y = y[:, -1]
+    (train_start, train_end), (test_start, test_end) = fold['train'], fold['test']
+    preds = fit_and_predict(model_type, X[train_start:train_end], y[train_start:train_end],
+                            X[test_start:test_end], look_back)
+    return preds, np.array(y[test_start:test_end])
+
+
+def evaluate_fold(model_type, arrays, look_back, horizon, fold):
+    """
+    Fit model_type on one fold's training windows of arrays['series'] and
+    score it on its test windows. `arrays` holds numpy arrays, or the specs
+    of a SharedArrays block when called in a worker process.
+    """
+    started = time.perf_counter()
+    handles = []
+    if isinstance(arrays, SharedArrays.Specs):
+        arrays, handles = SharedArrays.attach(arrays)
+    try:
+        preds, actual = _score_fold(arrays['series'], model_type, look_back, horizon, fold)
+    finally:
+        # Drop the views onto shared memory before unmapping it
+        del arrays
+        for shm in handles:
+            shm.close()
+    return {
+        'predictions': preds,
+        'actual': actual,
+        'metrics': regression_metrics(actual, preds),
+        'seconds': round(time.perf_counter() - started, 3),
+    }
+
+
+class BacktestCache:
+    """
+    LRU cache of fold evaluations keyed by (symbol, model type,
+    hyperparameters + backtest settings, last bar date, fold). A fold's
+    result only changes when a new bar arrives, and storing results for a
+    newer bar date drops the older ones of the same backtest.
+    """
+
+    def __init__(self, max_entries=2048):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            result = self._entries.get(key)
+            if result is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return result
+
+    def put(self, key, result):
+        with self._lock:
+            # key is (symbol, model type, settings, last bar date, fold)
+            for old in [k for k in self._entries if k[:3] == key[:3] and k[3] != key[3]]:
+                del self._entries[old]
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, symbol=None):
+        with self._lock:
+            if symbol is None:
+                self._entries.clear()
+                return
+            symbol = symbol.upper().strip()
+            for key in [k for k in self._entries if k[0] == symbol]:
+                del self._entries[key]
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+def aggregate_folds(fold_results):
+    """Metrics over the concatenated out-of-sample predictions of all folds"""
+    actual = np.concatenate([r['actual'] for r in fold_results])
+    preds = np.concatenate([r['predictions'] for r in fold_results])
+    return regression_metrics(actual, preds), actual, preds
@@ -0,0 +1,354 @@
+# ============================================
+# MICRO-BENCHMARKS
+# Run: python benchmarks.py [name ...]
+# Uses synthetic data only - no network or MongoDB needed
+# ============================================
+
+import os
+import subprocess
+import sys
+import timeit
+
+import numpy as np
+import pandas as pd
+
+# Modules shared by both backends live in ../stock_common
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from serialization import history_to_records, history_to_columns
+from stock_common.datasets import make_windows
+
+# Trading-day lengths of typical Yahoo Finance periods
+HISTORY_LENGTHS = {
+    '1y': 252,
+    '10y': 2520,
+    'max': 11000,
+}
+
+
+def synthetic_history(n_bars, seed=42):
+    """Random-walk OHLCV frame shaped like yf.Ticker().history() output"""
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n_bars)))
+    open_ = close * (1 + rng.normal(0, 0.002, n_bars))
+    high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 0.003, n_bars)))
+    low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 0.003, n_bars)))
+    volume = rng.integers(1_000_000, 50_000_000, n_bars)
+    index = pd.bdate_range(end='2024-12-31', periods=n_bars, tz='America/New_York', name='Date')
+    return pd.DataFrame(
+        {'Open': open_, 'High': high, 'Low': low, 'Close': close, 'Volume': volume},
+        index=index
+    )
+
+
+def time_call(fn, repeat=5):
+    """Best-of-N wall time in milliseconds"""
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number * 1000
+
+
+def report(title, rows):
+    print(f"\n{title}")
+    for label, results in rows:
+        baseline = results[0][1]
+        cells = '  '.join(f"{name}: {ms:8.3f} ms ({baseline / ms:5.1f}x)" for name, ms in results)
+        print(f"  {label:>4} | {cells}")
+
+
+# ---- history serialization (fetch_stock_data_safe) ----
+
+def iterrows_records(hist):
+    """Original per-row loop from fetch_stock_data_safe"""
+    data = []
+    for index, row in hist.iterrows():
+        data.append({
+            'Date': index.strftime('%Y-%m-%d'),
+            'Open': float(row['Open']),
+            'High': float(row['High']),
+            'Low': float(row['Low']),
+            'Close': float(row['Close']),
+            'Volume': int(row['Volume'])
+        })
+    return data
+
+
+def bench_serialization():
+    rows = []
+    for label, n_bars in HISTORY_LENGTHS.items():
+        hist = synthetic_history(n_bars)
+        assert history_to_records(hist) == iterrows_records(hist)
+        rows.append((label, [
+            ('iterrows', time_call(lambda: iterrows_records(hist))),
+            ('records', time_call(lambda: history_to_records(hist))),
+            ('columnar', time_call(lambda: history_to_columns(hist))),
+        ]))
+    report('History serialization', rows)
+
+
+# ---- training windows (predict / compare_models) ----
+
+LOOK_BACK = 60
+
+
+def loop_windows(scaled_prices, look_back):
+    """Original per-row loop from predict and compare_models"""
+    X, y = [], []
+    for i in range(look_back, len(scaled_prices)):
+        X.append(scaled_prices[i-look_back:i, 0])
+        y.append(scaled_prices[i, 0])
+    return np.array(X), np.array(y)
+
+
+def bench_windows():
+    rows = []
+    for label, n_bars in HISTORY_LENGTHS.items():
+        close = synthetic_history(n_bars)['Close'].to_numpy()
+        scaled = ((close - close.min()) / (close.max() - close.min())).reshape(-1, 1)
+        X_loop, y_loop = loop_windows(scaled, LOOK_BACK)
+        X_view, y_view = make_windows(scaled[:, 0], LOOK_BACK)
+        assert np.array_equal(X_loop, X_view) and np.array_equal(y_loop, y_view)
+        rows.append((label, [
+            ('loop', time_call(lambda: loop_windows(scaled, LOOK_BACK))),
+            ('view', time_call(lambda: make_windows(scaled[:, 0], LOOK_BACK))),
+            # What a model's fit() pays when it needs a contiguous copy
+            ('view+copy', time_call(lambda: np.ascontiguousarray(make_windows(scaled[:, 0], LOOK_BACK)[0]))),
+        ]))
+    report(f'Training windows (look_back={LOOK_BACK})', rows)
+
+
+# ---- online model updates (model_type 'Online') ----
+
+def bench_online(look_back=LOOK_BACK, steps=200):
+    from online_models import OnlineModelStore
+    from training import MODEL_HYPERPARAMS, create_model
+
+    close = synthetic_history(HISTORY_LENGTHS['1y'] + steps)['Close'].to_numpy()
+    history = close[:HISTORY_LENGTHS['1y']]
+    store = OnlineModelStore('', build_model=lambda: create_model('Online'), params=MODEL_HYPERPARAMS['Online'])
+
+    store.update('WARMUP', history, look_back)  # keep library imports out of the timings
+    started = timeit.default_timer()
+    store.update('BENCH', history, look_back)
+    init_ms = (timeit.default_timer() - started) * 1000
+
+    # One new bar per call over a rolling one-year window, as a live feed would deliver
+    update_ms, predict_ms = [], []
+    for step in range(1, steps + 1):
+        window = close[step:HISTORY_LENGTHS['1y'] + step]
+        started = timeit.default_timer()
+        fit = store.update('BENCH', window, look_back)
+        update_ms.append((timeit.default_timer() - started) * 1000)
+        assert fit['metrics']['new_bars'] == 1
+
+        last = fit['scaler'].transform(window[-look_back:].reshape(-1, 1)).reshape(1, look_back)
+        started = timeit.default_timer()
+        fit['model'].predict(last)
+        predict_ms.append((timeit.default_timer() - started) * 1000)
+
+    print(f"\nOnline model (look_back={look_back}, in-memory state)")
+    print(f"  initial fit on 1y      {init_ms:8.3f} ms")
+    print(f"  update, 1 new bar      {np.median(update_ms):8.3f} ms median, {np.percentile(update_ms, 95):8.3f} ms p95")
+    print(f"  predict                {np.median(predict_ms):8.3f} ms median, {np.percentile(predict_ms, 95):8.3f} ms p95")
+
+
+# ---- flattened tree models (tree_export) ----
+
+def bench_trees(look_back=LOOK_BACK):
+    import pickle
+    import tempfile
+
+    from training import create_model
+    from stock_common.tree_export import FlatForest
+
+    close = synthetic_history(HISTORY_LENGTHS['1y'])['Close'].to_numpy()
+    scaled = (close - close.min()) / (close.max() - close.min())
+    X, y = make_windows(scaled, look_back)
+
+    for model_type in ('RandomForest', 'DecisionTree'):
+        model = create_model(model_type).fit(X, y)
+        flat = FlatForest.from_sklearn(model)
+        with tempfile.TemporaryDirectory() as tmp:
+            flat.save(os.path.join(tmp, 'model.flat'))
+            mapped = FlatForest.load(os.path.join(tmp, 'model.flat'))
+            assert np.allclose(mapped.predict(X), model.predict(X), rtol=1e-12, atol=0)
+
+            rows = []
+            for label, batch in (('1', X[-1:]), (str(len(X)), X)):
+                rows.append((label, [
+                    ('sklearn', time_call(lambda: model.predict(batch))),
+                    ('flat', time_call(lambda: flat.predict(batch))),
+                    ('mmap', time_call(lambda: mapped.predict(batch))),
+                ]))
+            report(f"{model_type} predict, rows per call (look_back={look_back})", rows)
+            pickled = len(pickle.dumps(model, protocol=pickle.HIGHEST_PROTOCOL))
+            print(f"  size | pickled: {pickled / 1024:9.1f} KiB  flat: {flat.nbytes / 1024:9.1f} KiB "
+                  f"({pickled / flat.nbytes:4.1f}x smaller)")
+
+
+# ---- multi-day forecasts (forecasting) ----
+
+def loop_forecast(model, scaler, closes, look_back, horizon):
+    """One scaled single-row predict() per day, appending each prediction to the history"""
+    history = list(closes[-look_back:])
+    path = []
+    for _ in range(horizon):
+        window = scaler.transform(np.array(history[-look_back:]).reshape(-1, 1)).reshape(1, look_back)
+        price = float(scaler.inverse_transform(model.predict(window).reshape(-1, 1))[0, 0])
+        history.append(price)
+        path.append(price)
+    return np.array(path)
+
+
+def bench_forecast(look_back=LOOK_BACK, horizons=(5, 30)):
+    from sklearn.preprocessing import MinMaxScaler
+
+    from forecasting import forecast_path
+    from stock_common.model_registry import FittedModel
+    from training import fit_candidate
+    from stock_common.tree_export import flatten_model
+
+    close = synthetic_history(HISTORY_LENGTHS['1y'])['Close'].to_numpy()
+    scaler = MinMaxScaler(feature_range=(0, 1)).fit(close.reshape(-1, 1))
+    scaled = scaler.transform(close.reshape(-1, 1))[:, 0]
+
+    def fitted(model_type, horizon=1):
+        model, _ = fit_candidate(model_type, scaled, look_back, horizon)
+        return FittedModel(flatten_model(model), scaler, look_back, model_type, {}, 0, 0)
+
+    for model_type in ('RandomForest', 'SVM'):
+        one_step = fitted(model_type)
+        rows = []
+        for horizon in horizons:
+            assert np.allclose(forecast_path(one_step, close, horizon),
+                               loop_forecast(one_step.model, scaler, close, look_back, horizon), rtol=1e-9)
+            results = [
+                ('loop', time_call(lambda: loop_forecast(one_step.model, scaler, close, look_back, horizon))),
+                ('recursive', time_call(lambda: forecast_path(one_step, close, horizon))),
+            ]
+            if model_type == 'RandomForest':
+                direct = fitted(model_type, horizon)
+                results.append(('direct', time_call(lambda: forecast_path(direct, close, horizon))))
+            rows.append((str(horizon), results))
+        report(f"{model_type} forecast path, days ahead (look_back={look_back})", rows)
+
+
+# ---- technical indicators (indicators) ----
+
+def bench_indicators(steps=200):
+    from indicators import DEFAULT_SERIES, IndicatorCache, IndicatorSet
+
+    hist = synthetic_history(HISTORY_LENGTHS['10y'] + steps)
+    bars = {name.lower(): hist[name].to_numpy(dtype=np.float64) for name in ('Open', 'High', 'Low', 'Close', 'Volume')}
+    days = hist.index.tz_localize(None).values.astype('datetime64[D]').astype(np.int64)
+    indicators = IndicatorSet(DEFAULT_SERIES)
+
+    rows = []
+    for period in ('1y', '10y'):
+        n = HISTORY_LENGTHS[period]
+        window = {name: column[:n] for name, column in bars.items()}
+        rows.append((period, [('compute', time_call(lambda: indicators.compute(window)))]))
+    report(f"All default series ({', '.join(DEFAULT_SERIES)}), full computation", rows)
+
+    # One new bar per call over a growing ten-year history, as a live feed would deliver
+    n = HISTORY_LENGTHS['10y']
+    cache = IndicatorCache()
+    cache.get('BENCH', DEFAULT_SERIES, days[:n], {name: column[:n] for name, column in bars.items()})
+    update_ms = []
+    for step in range(1, steps + 1):
+        window = {name: column[:n + step] for name, column in bars.items()}
+        started = timeit.default_timer()
+        cache.get('BENCH', DEFAULT_SERIES, days[:n + step], window, days[n + step - 1])
+        update_ms.append((timeit.default_timer() - started) * 1000)
+    assert cache.stats()['extended'] == steps
+
+    print(f"  cached, 1 new bar      {np.median(update_ms):8.3f} ms median, {np.percentile(update_ms, 95):8.3f} ms p95")
+
+
+# ---- application start-up (cold `import app`) ----
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+STARTUP_APPS = {
+    'backend': HERE,
+    'stock-ml-backend': os.path.join(HERE, '..', 'stock-ml-backend'),
+}
+# Libraries that should only load on first use
+DEFERRED_MODULES = ('pandas', 'sklearn', 'scipy', 'tensorflow', 'yfinance')
+
+STARTUP_PROBE = (
+    "import sys, time\n"
+    "started = time.perf_counter()\n"
+    "import app\n"
+    "elapsed = time.perf_counter() - started\n"
+    f"loaded = [m for m in {DEFERRED_MODULES!r} if m in sys.modules]\n"
+    "print('STARTUP', elapsed, ','.join(loaded))\n"
+)
+
+
+def cold_import(app_dir):
+    """
+    Import app.py in a fresh interpreter with -X importtime.
+    Returns (seconds, deferred modules loaded anyway, [(module, seconds)] of app's direct imports).
+    """
+    env = {**os.environ, 'MARKET_DATA_PROVIDER': 'replay', 'PRELOAD_ON_START': 'false'}
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', STARTUP_PROBE],
+        cwd=app_dir, env=env, capture_output=True, text=True, timeout=600
+    )
+    probe = [line for line in proc.stdout.splitlines() if line.startswith('STARTUP ')]
+    if proc.returncode != 0 or not probe:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else 'import failed')
+    _, seconds, loaded = (probe[-1].split(' ') + [''])[:3]
+
+    # importtime lines: "import time: self [us] | cumulative | <indent>name";
+    # app's own imports are the depth-1 lines just before the "app" line
+    children, direct = [], []
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line.split('|')
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        name = name.strip()
+        if depth == 0:
+            if name == 'app':
+                direct = children
+                break
+            children = []
+        elif depth == 1:
+            children.append((name, int(cumulative) / 1e6))
+    return float(seconds), [m for m in loaded.split(',') if m], direct
+
+
+def bench_startup(top=8):
+    print("\nApplication start-up (cold import, fresh interpreter)")
+    for label, app_dir in STARTUP_APPS.items():
+        if not os.path.exists(os.path.join(app_dir, 'app.py')):
+            continue
+        try:
+            seconds, loaded, direct = cold_import(app_dir)
+        except Exception as e:
+            print(f"  {label}: failed ({str(e)})")
+            continue
+        print(f"  {label}: {seconds * 1000:8.1f} ms; deferred libraries loaded at import: {', '.join(loaded) or 'none'}")
+        for name, module_seconds in sorted(direct, key=lambda item: -item[1])[:top]:
+            print(f"    {name:<24} {module_seconds * 1000:8.1f} ms")
+
+
+BENCHMARKS = {
+    'serialization': bench_serialization,
+    'windows': bench_windows,
+    'online': bench_online,
+    'trees': bench_trees,
+    'forecast': bench_forecast,
+    'indicators': bench_indicators,
+    'startup': bench_startup,
+}
+
+
+if __name__ == '__main__':
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        if name not in BENCHMARKS:
+            print(f"Unknown benchmark '{name}'. Available: {', '.join(BENCHMARKS)}")
+            sys.exit(1)
+        BENCHMARKS[name]()
@@ -0,0 +1,91 @@
+# ============================================
+# MULTI-DAY FORECASTS
+# Forecast paths from fitted next-close and multi-output models
+# ============================================
+#
+# A path of `horizon` closes comes from one of two methods:
+#   recursive  a next-close model is rolled forward, each prediction
+#              becoming the newest input of the next step
+#   direct     a multi-output model (training.DIRECT_MODEL_TYPES) trained
+#              on `horizon`-day targets predicts the whole path in one call
+#
+# The rollout runs on the scaled series in one preallocated buffer: every
+# step is a single predict() on a strided view of the windows being rolled,
+# and scaling is undone once for the whole path at the end. Each step needs
+# the previous one, and every (symbol, model type) has its own fitted model,
+# so only paths of the same model can share a step's predict() call;
+# forecast_path() rolls one path, at one single-row predict() per day.
+
+import numpy as np
+
+from training import DIRECT_MODEL_TYPES
+
+FORECAST_METHODS = ('auto', 'recursive', 'direct')
+
+
+def resolve_method(model_type, horizon, method='auto'):
+    """
+    Forecast method actually used: 'direct' where the model type supports
+    it ('auto' picks it for multi-day horizons, as one multi-output fit and
+    predict is cheaper than a rollout), otherwise 'recursive'
+    """
+    if method not in FORECAST_METHODS:
+        raise ValueError(f"forecast_method must be one of: {', '.join(FORECAST_METHODS)}")
+    if horizon > 1 and method != 'recursive' and model_type in DIRECT_MODEL_TYPES:
+        return 'direct'
+    return 'recursive'
+
+
+def one_step_predictor(model, model_type):
+    """predict(X) for scaled windows X (n_paths, look_back), returning (n_paths,)"""
+    if model_type == 'LSTM':
+        # Calling the model skips Keras predict()'s per-call batching setup
+        return lambda X: np.asarray(model(X[..., np.newaxis], training=False)).reshape(len(X))
+    return lambda X: np.asarray(model.predict(X), dtype=np.float64).reshape(len(X))
+
+
+def recursive_forecast(predict, windows, horizon):
+    """
+    Roll a one-step predictor forward from each row of windows
+    (n_paths, look_back); returns the (n_paths, horizon) predicted values.
+    """
+    windows = np.atleast_2d(np.asarray(windows, dtype=np.float64))
+    n_paths, look_back = windows.shape
+    buffer = np.empty((n_paths, look_back + horizon))
+    buffer[:, :look_back] = windows
+    for step in range(horizon):
+        buffer[:, look_back + step] = predict(buffer[:, step:step + look_back])
+    return buffer[:, look_back:]
+
+
+def forecast_path(fitted, closes, horizon=1):
+    """
+    The next `horizon` closes after closes from a registry FittedModel.
+    A multi-output model predicts its path directly; its width must equal
+    horizon. Returns a float64 array of prices.
+    """
+    scaler = fitted.scaler
+    scale, offset = scaler.scale_[0], scaler.min_[0]
+    look_back = fitted.look_back
+    window = (np.asarray(closes[-look_back:], dtype=np.float64) * scale + offset)[np.newaxis, :]
+
+    model = fitted.model
+    # FlatForest.n_outputs, or n_outputs_ of a scikit-learn tree model
+    if getattr(model, 'n_outputs', getattr(model, 'n_outputs_', 1)) > 1:
+        scaled_path = np.asarray(model.predict(window), dtype=np.float64).reshape(-1)
+        if len(scaled_path) != horizon:
+            raise ValueError(f"Model forecasts {len(scaled_path)} days, not {horizon}")
+    else:
+        predict = one_step_predictor(model, fitted.model_type)
+        scaled_path = recursive_forecast(predict, window, horizon)[0]
+    return (scaled_path - offset) / scale
+
+
+def encode_path(prices):
+    """Forecast prices as packed little-endian float32 bytes for MongoDB"""
+    return np.asarray(prices, dtype='<f4').tobytes()
+
+
+def decode_path(packed):
+    """Prices from encode_path() bytes as a list of floats rounded to cents"""
+    return np.round(np.frombuffer(bytes(packed), dtype='<f4').astype(np.float64), 2).tolist()
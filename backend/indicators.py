@@ -0,0 +1,493 @@
+# ============================================
+# TECHNICAL INDICATORS
+# Column-wise indicator series over OHLCV arrays, updated bar by bar
+# ============================================
+#
+# Every indicator computes its whole series in one vectorized pass and keeps
+# just enough state (running sums, the last smoothed values, a ring buffer
+# of the window) to extend it by one bar in O(1):
+#
+#   sma_<n>                      simple moving average of the close
+#   ema_<n>                      exponential moving average, seeded with sma_<n>
+#   rsi_<n>                      Wilder's relative strength index
+#   macd[_<fast>_<slow>_<sig>]   macd, macd_signal, macd_hist (default 12/26/9)
+#   bollinger[_<n>_<k>]          bb_upper, bb_middle, bb_lower (default 20/2)
+#   atr_<n>                      Wilder's average true range
+#   obv                          on-balance volume
+#
+# Values before an indicator has a full window are NaN.
+#
+# IndicatorCache keeps the series of recently requested symbols and only
+# feeds them the bars that arrived since, so a refresh costs O(new bars).
+
+import copy
+import re
+import threading
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+DEFAULT_SERIES = ['sma_20', 'sma_50', 'ema_12', 'ema_26', 'rsi_14', 'macd', 'bollinger', 'atr_14', 'obv']
+
+# Longest window any indicator may use
+MAX_WINDOW = 500
+
+
+def _ema(values, n, alpha):
+    """
+    EMA of values with smoothing alpha, seeded with the mean of the first n
+    finite values; leading NaNs (e.g. an indicator still warming up) are skipped
+    """
+    from scipy.signal import lfilter
+
+    out = np.full(len(values), np.nan)
+    finite = np.flatnonzero(np.isfinite(values))
+    if not len(finite) or len(values) - finite[0] < n:
+        return out
+    seed_at = finite[0] + n - 1
+    seed = values[finite[0]:seed_at + 1].mean()
+    out[seed_at] = seed
+    if seed_at + 1 < len(values):
+        out[seed_at + 1:], _ = lfilter([alpha], [1, alpha - 1], values[seed_at + 1:], zi=[(1 - alpha) * seed])
+    return out
+
+
+class _EMAState:
+    """O(1) continuation of _ema()"""
+
+    def __init__(self, n, alpha):
+        self.n = n
+        self.alpha = alpha
+        self.count = 0        # finite values seen
+        self.seed_sum = 0.0   # their sum while warming up
+        self.value = np.nan
+
+    @classmethod
+    def after(cls, values, n, alpha, series):
+        """State at the end of values, given series = _ema(values, n, alpha)"""
+        state = cls(n, alpha)
+        finite = np.flatnonzero(np.isfinite(values))
+        if len(finite):
+            state.count = len(values) - finite[0]
+            if state.count < n:
+                state.seed_sum = float(values[finite[0]:].sum())
+            else:
+                state.value = float(series[-1])
+        return state
+
+    def update(self, x):
+        if not np.isfinite(x):
+            return self.value
+        self.count += 1
+        if self.count < self.n:
+            self.seed_sum += x
+        elif self.count == self.n:
+            self.value = (self.seed_sum + x) / self.n
+        else:
+            self.value = self.alpha * x + (1 - self.alpha) * self.value
+        return self.value
+
+
+class _Window:
+    """Ring buffer of the last n values with their running sum and sum of squares"""
+
+    def __init__(self, n, history=()):
+        self.n = n
+        self.buffer = np.zeros(n)
+        tail = np.asarray(history, dtype=np.float64)[-n:]
+        self.count = len(tail)
+        self.buffer[:len(tail)] = tail
+        self.position = len(tail) % n
+        self.sum = float(tail.sum())
+        self.sumsq = float((tail ** 2).sum())
+
+    def push(self, x):
+        if self.count >= self.n:
+            old = self.buffer[self.position]
+            self.sum -= old
+            self.sumsq -= old * old
+        else:
+            self.count += 1
+        self.buffer[self.position] = x
+        self.position = (self.position + 1) % self.n
+        self.sum += x
+        self.sumsq += x * x
+
+    @property
+    def full(self):
+        return self.count >= self.n
+
+
+class SMA:
+    def __init__(self, n):
+        self.n = n
+        self.outputs = [f'sma_{n}']
+
+    def compute(self, bars):
+        close = bars['close']
+        out = np.full(len(close), np.nan)
+        if len(close) >= self.n:
+            out[self.n - 1:] = sliding_window_view(close, self.n).mean(axis=1)
+        self._window = _Window(self.n, close)
+        return {self.outputs[0]: out}
+
+    def update(self, bar):
+        self._window.push(bar['close'])
+        value = self._window.sum / self.n if self._window.full else np.nan
+        return {self.outputs[0]: value}
+
+
+class EMA:
+    def __init__(self, n):
+        self.n = n
+        self.outputs = [f'ema_{n}']
+
+    def compute(self, bars):
+        alpha = 2 / (self.n + 1)
+        out = _ema(bars['close'], self.n, alpha)
+        self._state = _EMAState.after(bars['close'], self.n, alpha, out)
+        return {self.outputs[0]: out}
+
+    def update(self, bar):
+        return {self.outputs[0]: self._state.update(bar['close'])}
+
+
+class RSI:
+    def __init__(self, n):
+        self.n = n
+        self.outputs = [f'rsi_{n}']
+
+    @staticmethod
+    def _rsi(gain, loss):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(loss == 0, 100.0, 100 - 100 / (1 + gain / loss))
+
+    def compute(self, bars):
+        close = bars['close']
+        change = np.diff(close)
+        gains, losses = np.maximum(change, 0), np.maximum(-change, 0)
+        alpha = 1 / self.n
+        avg_gain, avg_loss = _ema(gains, self.n, alpha), _ema(losses, self.n, alpha)
+        out = np.full(len(close), np.nan)
+        out[1:] = np.where(np.isfinite(avg_gain), self._rsi(avg_gain, avg_loss), np.nan)
+        self._gain = _EMAState.after(gains, self.n, alpha, avg_gain)
+        self._loss = _EMAState.after(losses, self.n, alpha, avg_loss)
+        self._last_close = float(close[-1]) if len(close) else None
+        return {self.outputs[0]: out}
+
+    def update(self, bar):
+        close, previous = bar['close'], self._last_close
+        self._last_close = close
+        if previous is None:
+            return {self.outputs[0]: np.nan}
+        change = close - previous
+        gain = self._gain.update(max(change, 0.0))
+        loss = self._loss.update(max(-change, 0.0))
+        value = float(self._rsi(gain, loss)) if np.isfinite(gain) else np.nan
+        return {self.outputs[0]: value}
+
+
+class MACD:
+    def __init__(self, fast=12, slow=26, signal=9):
+        self.fast, self.slow, self.signal = fast, slow, signal
+        suffix = '' if (fast, slow, signal) == (12, 26, 9) else f'_{fast}_{slow}_{signal}'
+        self.outputs = [f'macd{suffix}', f'macd_signal{suffix}', f'macd_hist{suffix}']
+
+    def compute(self, bars):
+        close = bars['close']
+        alphas = [2 / (n + 1) for n in (self.fast, self.slow, self.signal)]
+        fast = _ema(close, self.fast, alphas[0])
+        slow = _ema(close, self.slow, alphas[1])
+        macd = fast - slow
+        signal = _ema(macd, self.signal, alphas[2])
+        self._states = (
+            _EMAState.after(close, self.fast, alphas[0], fast),
+            _EMAState.after(close, self.slow, alphas[1], slow),
+            _EMAState.after(macd, self.signal, alphas[2], signal),
+        )
+        return dict(zip(self.outputs, (macd, signal, macd - signal)))
+
+    def update(self, bar):
+        fast, slow, signal = self._states
+        macd = fast.update(bar['close']) - slow.update(bar['close'])
+        signal_value = signal.update(macd)
+        return dict(zip(self.outputs, (macd, signal_value, macd - signal_value)))
+
+
+class Bollinger:
+    def __init__(self, n=20, k=2):
+        self.n, self.k = n, k
+        suffix = '' if (n, k) == (20, 2) else f'_{n}_{k}'
+        self.outputs = [f'bb_upper{suffix}', f'bb_middle{suffix}', f'bb_lower{suffix}']
+
+    def compute(self, bars):
+        close = bars['close']
+        middle = np.full(len(close), np.nan)
+        width = np.full(len(close), np.nan)
+        if len(close) >= self.n:
+            windows = sliding_window_view(close, self.n)
+            middle[self.n - 1:] = windows.mean(axis=1)
+            width[self.n - 1:] = self.k * windows.std(axis=1)
+        self._window = _Window(self.n, close)
+        return dict(zip(self.outputs, (middle + width, middle, middle - width)))
+
+    def update(self, bar):
+        window = self._window
+        window.push(bar['close'])
+        if not window.full:
+            return dict.fromkeys(self.outputs, np.nan)
+        middle = window.sum / self.n
+        width = self.k * np.sqrt(max(window.sumsq / self.n - middle * middle, 0.0))
+        return dict(zip(self.outputs, (middle + width, middle, middle - width)))
+
+
+class ATR:
+    def __init__(self, n):
+        self.n = n
+        self.outputs = [f'atr_{n}']
+
+    def compute(self, bars):
+        high, low, close = bars['high'], bars['low'], bars['close']
+        true_range = high - low
+        if len(close) > 1:
+            previous = close[:-1]
+            true_range[1:] = np.maximum.reduce(
+                [true_range[1:], np.abs(high[1:] - previous), np.abs(low[1:] - previous)]
+            )
+        out = _ema(true_range, self.n, 1 / self.n)
+        self._state = _EMAState.after(true_range, self.n, 1 / self.n, out)
+        self._last_close = float(close[-1]) if len(close) else None
+        return {self.outputs[0]: out}
+
+    def update(self, bar):
+        true_range = bar['high'] - bar['low']
+        if self._last_close is not None:
+            true_range = max(true_range, abs(bar['high'] - self._last_close), abs(bar['low'] - self._last_close))
+        self._last_close = bar['close']
+        return {self.outputs[0]: self._state.update(true_range)}
+
+
+class OBV:
+    def __init__(self):
+        self.outputs = ['obv']
+
+    def compute(self, bars):
+        close, volume = bars['close'], bars['volume']
+        direction = np.sign(np.diff(close))
+        out = np.zeros(len(close))
+        out[1:] = np.cumsum(direction * volume[1:])
+        self._value = float(out[-1]) if len(out) else None
+        self._last_close = float(close[-1]) if len(close) else None
+        return {'obv': out}
+
+    def update(self, bar):
+        if self._last_close is None:
+            self._value = 0.0
+        else:
+            self._value += np.sign(bar['close'] - self._last_close) * bar['volume']
+        self._last_close = bar['close']
+        return {'obv': self._value}
+
+
+INDICATORS = {
+    'sma': (SMA, 1, 1),          # class, min and max numeric parameters
+    'ema': (EMA, 1, 1),
+    'rsi': (RSI, 1, 1),
+    'atr': (ATR, 1, 1),
+    'macd': (MACD, 0, 3),
+    'bollinger': (Bollinger, 0, 2),
+    'obv': (OBV, 0, 0),
+}
+
+
+def parse_indicator(name):
+    """Indicator instance for a series name like 'sma_20' or 'macd_5_35_5'; raises ValueError"""
+    match = re.fullmatch(r'([a-z]+)((?:_\d+)*)', name.strip().lower())
+    if not match or match.group(1) not in INDICATORS:
+        raise ValueError(f"Unknown indicator '{name}'. Available: {', '.join(INDICATORS)}")
+    cls, min_params, max_params = INDICATORS[match.group(1)]
+    params = [int(p) for p in match.group(2).split('_')[1:]]
+    if len(params) not in (min_params, max_params) or not all(1 <= p <= MAX_WINDOW for p in params):
+        expected = match.group(1) + '_<n>' * max_params
+        if max_params:
+            expected += f" (windows from 1 to {MAX_WINDOW})"
+        raise ValueError(f"'{name}': expected {expected}")
+    return cls(*params)
+
+
+def _copy_state(value):
+    if isinstance(value, _Window):
+        window = copy.copy(value)
+        window.buffer = value.buffer.copy()
+        return window
+    if isinstance(value, _EMAState):
+        return copy.copy(value)
+    if isinstance(value, tuple):
+        return tuple(_copy_state(item) for item in value)
+    return value
+
+
+class IndicatorSet:
+    """Several indicators computed and updated together over one symbol's bars"""
+
+    def __init__(self, names):
+        self.indicators = [parse_indicator(name) for name in names]
+        self.outputs = [output for indicator in self.indicators for output in indicator.outputs]
+
+    def compute(self, bars):
+        """
+        Full series for bars, a mapping of float64 'open', 'high', 'low',
+        'close' and 'volume' arrays; returns {output: array}
+        """
+        series = {}
+        for indicator in self.indicators:
+            series.update(indicator.compute(bars))
+        return series
+
+    def snapshot(self):
+        """
+        Independent copy of the indicators' running state; copies only the
+        mutable state objects, which is much cheaper than copy.deepcopy()
+        """
+        clone = copy.copy(self)
+        clone.indicators = []
+        for indicator in self.indicators:
+            copied = copy.copy(indicator)
+            copied.__dict__.update((name, _copy_state(value)) for name, value in indicator.__dict__.items())
+            clone.indicators.append(copied)
+        return clone
+
+    def update(self, bar):
+        """Extend every indicator by one bar (a mapping of scalars); returns {output: value}"""
+        values = {}
+        for indicator in self.indicators:
+            values.update(indicator.update(bar))
+        return values
+
+
+# Closes compared to tell new bars from a revised history
+ANCHOR_BARS = 5
+
+OHLCV_FIELDS = ('open', 'high', 'low', 'close', 'volume')
+
+
+class _Entry:
+    """One symbol's indicator series, extendable by one bar at a time"""
+
+    def __init__(self, names):
+        self.names = names
+        self.lock = threading.Lock()
+        self.days = []
+
+    def compute(self, days, bars):
+        """Replace the series with a full computation over bars"""
+        self.indicators = IndicatorSet(self.names)
+        self.days = [int(d) for d in days]
+        self.bars = {field: np.asarray(bars[field], dtype=np.float64).tolist() for field in OHLCV_FIELDS}
+        # The latest bar may still change (an intraday bar), so keep the state before it
+        history = {field: np.asarray(bars[field][:-1], dtype=np.float64) for field in OHLCV_FIELDS}
+        self.series = {k: v.tolist() for k, v in self.indicators.compute(history).items()}
+        self.before_last = self.indicators.snapshot()
+        self._append({field: self.bars[field][-1] for field in OHLCV_FIELDS}, bar_known=True)
+
+    def _append(self, bar, bar_known=False):
+        values = self.indicators.update(bar)
+        for output, value in values.items():
+            self.series[output].append(float(value))
+        if not bar_known:
+            for field in OHLCV_FIELDS:
+                self.bars[field].append(bar[field])
+
+    def extend(self, days, bars):
+        """
+        Bring the entry up to date with bars; False when the new history
+        does not continue the stored one (revised or reaching further back)
+        """
+        days = np.asarray(days)
+        if not self.days or not len(days) or days[0] < self.days[0]:
+            return False
+        last = int(np.searchsorted(days, self.days[-1]))
+        if last >= len(days) or days[last] != self.days[-1]:
+            return False
+        # The bars before the latest stored one must be unchanged
+        anchor = slice(max(0, last - ANCHOR_BARS), last)
+        stored = np.asarray(self.bars['close'][len(self.days) - (anchor.stop - anchor.start) - 1:-1])
+        if not np.allclose(stored, bars['close'][anchor], rtol=1e-6, atol=0):
+            return False
+
+        # Re-apply the latest stored bar if it changed, then append the new ones
+        latest = {field: float(bars[field][last]) for field in OHLCV_FIELDS}
+        if any(latest[field] != self.bars[field][-1] for field in OHLCV_FIELDS):
+            self.indicators = self.before_last.snapshot()
+            for output in self.series:
+                self.series[output].pop()
+            for field in OHLCV_FIELDS:
+                self.bars[field][-1] = latest[field]
+            self._append(latest, bar_known=True)
+        for i in range(last + 1, len(days)):
+            if i == len(days) - 1:
+                self.before_last = self.indicators.snapshot()
+            self._append({field: float(bars[field][i]) for field in OHLCV_FIELDS})
+            self.days.append(int(days[i]))
+        return True
+
+    def select(self, outputs, first_day=None, last_day=None):
+        """(days, {output: values}) between two inclusive day numbers"""
+        start = 0 if first_day is None else bisect_left(self.days, first_day)
+        stop = len(self.days) if last_day is None else bisect_right(self.days, last_day)
+        return self.days[start:stop], {output: self.series[output][start:stop] for output in outputs}
+
+
+class IndicatorCache:
+    """
+    LRU cache of indicator series per (symbol, period, indicator set).
+    get() feeds an entry the bars that arrived since it was computed, and
+    recomputes it only when the history was revised. Each entry has its own
+    lock, so computing one symbol never blocks requests for the others.
+    """
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.counts = {'computed': 0, 'extended': 0, 'current': 0}
+
+    def get(self, symbol, names, days, bars, first_day=None, last_day=None, period=None):
+        """
+        Indicator series of names for symbol's bars (day numbers and OHLCV
+        arrays, oldest first) between two inclusive day numbers:
+        (days, {output: list of values}). Nothing before the first of the
+        given bars is returned, even if the entry still holds older ones.
+        """
+        outputs = IndicatorSet(names).outputs
+        if not len(days):
+            return [], {output: [] for output in outputs}
+        key = (symbol.upper().strip(), period, tuple(sorted(set(names))))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = _Entry(key[2])
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+            else:
+                self._entries.move_to_end(key)
+
+        with entry.lock:
+            size = len(entry.days)
+            if entry.extend(days, bars):
+                mode = 'extended' if len(entry.days) > size else 'current'
+            else:
+                entry.compute(days, bars)
+                mode = 'computed'
+            first_day = int(days[0]) if first_day is None else max(first_day, int(days[0]))
+            selected = entry.select(outputs, first_day, last_day)
+
+        with self._lock:
+            self.counts[mode] += 1
+        return selected
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'max_entries': self.max_entries, **self.counts}
@@ -0,0 +1,168 @@
+# ============================================
+# BACKGROUND JOB QUEUE
+# Runs slow requests (e.g. model training) off the request thread
+# ============================================
+
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+FINISHED_STATES = (SUCCEEDED, FAILED)
+
+
+class JobLimitExceeded(Exception):
+    """Raised when a user or the whole queue has too many unfinished jobs"""
+
+
+class Job:
+    """
+    One queued unit of work. Every change bumps `version` and wakes anyone
+    waiting in wait_for_change(), which is what the progress streams use.
+    """
+
+    def __init__(self, user_id, key, fn):
+        self.id = uuid.uuid4().hex
+        self.user_id = user_id
+        self.key = key
+        self.fn = fn
+        self.status = QUEUED
+        self.stage = QUEUED
+        self.result = None
+        self.error = None
+        self.error_status = None
+        self.created_at = datetime.now()
+        self.started_at = None
+        self.finished_at = None
+        self.finished_monotonic = None
+        self.version = 0
+        self._changed = threading.Condition()
+
+    def update(self, **fields):
+        with self._changed:
+            for name, value in fields.items():
+                setattr(self, name, value)
+            self.version += 1
+            self._changed.notify_all()
+
+    def progress(self, stage):
+        """Report the current stage of a running job"""
+        self.update(stage=stage)
+
+    @property
+    def finished(self):
+        return self.status in FINISHED_STATES
+
+    def wait_for_change(self, version, timeout=None):
+        """Block until the job changes past `version` (or timeout); returns the new version"""
+        with self._changed:
+            self._changed.wait_for(lambda: self.version != version, timeout=timeout)
+            return self.version
+
+    def to_dict(self):
+        with self._changed:
+            return {
+                'job_id': self.id,
+                'status': self.status,
+                'stage': self.stage,
+                'result': self.result,
+                'error': self.error,
+                'created_at': self.created_at.isoformat(),
+                'started_at': self.started_at.isoformat() if self.started_at else None,
+                'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            }
+
+
+class JobQueue:
+    """
+    Bounded pool of worker threads with per-user concurrency limits.
+
+    Submitting work whose key matches an unfinished job returns that job
+    instead of queueing a duplicate. Finished jobs stay readable for
+    `retention` seconds.
+    """
+
+    def __init__(self, max_workers=2, max_unfinished=100, per_user_limit=3, retention=3600):
+        self.max_workers = max_workers
+        self.max_unfinished = max_unfinished
+        self.per_user_limit = per_user_limit
+        self.retention = retention
+
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='jobs')
+        self._jobs = {}     # job id -> Job
+        self._active = {}   # key -> unfinished Job
+        self._lock = threading.Lock()
+
+        self.submitted = 0
+        self.deduplicated = 0
+        self.rejected = 0
+
+    def submit(self, user_id, key, fn):
+        """
+        Queue fn(job) for a user and return (job, created).
+        fn returns the job result or raises; an exception with a `status`
+        attribute records it as error_status.
+        """
+        with self._lock:
+            self._purge()
+            existing = self._active.get(key)
+            if existing is not None:
+                self.deduplicated += 1
+                return existing, False
+
+            unfinished = list(self._active.values())
+            if len(unfinished) >= self.max_unfinished:
+                self.rejected += 1
+                raise JobLimitExceeded('The job queue is full, try again later')
+            if sum(1 for job in unfinished if job.user_id == user_id) >= self.per_user_limit:
+                self.rejected += 1
+                raise JobLimitExceeded(f'At most {self.per_user_limit} unfinished jobs per user')
+
+            job = Job(user_id, key, fn)
+            self._jobs[job.id] = job
+            self._active[key] = job
+            self.submitted += 1
+
+        self._executor.submit(self._run, job)
+        return job, True
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _run(self, job):
+        job.update(status=RUNNING, stage=RUNNING, started_at=datetime.now())
+        try:
+            result = job.fn(job)
+            final = {'status': SUCCEEDED, 'stage': SUCCEEDED, 'result': result}
+        except Exception as e:
+            final = {'status': FAILED, 'stage': FAILED, 'error': str(e),
+                     'error_status': getattr(e, 'status', 500)}
+        with self._lock:
+            self._active.pop(job.key, None)
+        job.update(finished_at=datetime.now(), finished_monotonic=time.monotonic(), fn=None, **final)
+
+    def _purge(self):
+        cutoff = time.monotonic() - self.retention
+        for job_id in [jid for jid, job in self._jobs.items()
+                       if job.finished_monotonic is not None and job.finished_monotonic < cutoff]:
+            del self._jobs[job_id]
+
+    def stats(self):
+        with self._lock:
+            running = sum(1 for job in self._active.values() if job.status == RUNNING)
+            return {
+                'max_workers': self.max_workers,
+                'per_user_limit': self.per_user_limit,
+                'running': running,
+                'queued': len(self._active) - running,
+                'retained': len(self._jobs),
+                'submitted': self.submitted,
+                'deduplicated': self.deduplicated,
+                'rejected': self.rejected,
+            }
@@ -0,0 +1,278 @@
+# ============================================
+# ONLINE PREDICTION MODELS
+# Next-close linear models updated bar by bar
+# ============================================
+#
+# Each symbol has one incrementally trained model on the same look_back
+# windows of min-max scaled closes as the batch-trained models. A request
+# only feeds the model the windows ending in bars it has not seen, so an
+# update costs O(new bars), and the state is pickled to
+# <ONLINE_MODEL_DIR>/<SYMBOL>.pkl so it survives restarts.
+
+import copy
+import os
+import pickle
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+import numpy as np
+
+from stock_common.datasets import make_windows, resume_index
+
+
+class OnlineRegressor:
+    """
+    Linear regressor trained one sample at a time, in chronological order.
+
+    learner 'sgd'  squared loss with an L2 penalty `alpha` and a constant step
+                   `eta0`, like SGDRegressor(learning_rate='constant')
+    learner 'pa'   passive-aggressive (PA-I) updates with aggressiveness `C`
+                   and insensitivity `epsilon`, like PassiveAggressiveRegressor
+
+    Updating a few samples takes microseconds; scikit-learn's partial_fit
+    spends most of a single-bar update validating its input.
+    """
+
+    def __init__(self, learner='sgd', eta0=0.01, alpha=1e-5, C=0.01, epsilon=0.0, passes=5):
+        if learner not in ('sgd', 'pa'):
+            raise ValueError("learner must be 'sgd' or 'pa'")
+        self.learner = learner
+        self.eta0 = eta0
+        self.alpha = alpha
+        self.C = C
+        self.epsilon = epsilon
+        self.passes = passes
+        self.coef_ = None
+        self.intercept_ = 0.0
+        self.n_samples_seen_ = 0
+
+    def partial_fit(self, X, y):
+        X = np.asarray(X, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        if self.coef_ is None:
+            self.coef_ = np.zeros(X.shape[1])
+        coef, intercept = self.coef_, self.intercept_
+        decay = 1 - self.eta0 * self.alpha
+        for x, target in zip(X, y):
+            error = float(x @ coef) + intercept - target
+            if self.learner == 'sgd':
+                coef *= decay
+                coef -= (self.eta0 * error) * x
+                intercept -= self.eta0 * error
+            else:
+                loss = abs(error) - self.epsilon
+                if loss > 0:
+                    # The intercept acts as a constant input of 1
+                    step = -np.sign(error) * min(self.C, loss / (float(x @ x) + 1))
+                    coef += step * x
+                    intercept += step
+        self.intercept_ = intercept
+        self.n_samples_seen_ += len(X)
+        return self
+
+    def fit(self, X, y):
+        self.coef_, self.intercept_, self.n_samples_seen_ = None, 0.0, 0
+        for _ in range(self.passes):
+            self.partial_fit(X, y)
+        return self
+
+    def predict(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        if self.coef_ is None:
+            return np.zeros(len(X))
+        return X @ self.coef_ + self.intercept_
+
+    def score(self, X, y):
+        """Coefficient of determination (R²) of the predictions"""
+        y = np.asarray(y, dtype=np.float64)
+        residual = float(np.sum((y - self.predict(X)) ** 2))
+        total = float(np.sum((y - y.mean()) ** 2))
+        return 1 - residual / total if total > 0 else 0.0
+
+
+# Closes kept with the state to find the last seen bar in new history
+ANCHOR_BARS = 5
+
+# Leading share of the windows used for the initial passes; the rest are
+# streamed once so the error estimate starts out of sample
+TRAIN_FRACTION = 0.8
+
+# Bars over which the running squared error is averaged
+ERROR_WINDOW = 20
+
+
+class OnlineModelStore:
+    """
+    Per-symbol OnlineRegressor states kept in memory and on disk.
+
+    update() initialises a symbol's model with a few passes over its
+    history, then on later calls trains it on only the new windows. The
+    running (prequential) error is measured on each window before the
+    model learns from it and drives the reported confidence.
+
+    At most max_symbols states stay in memory (least recently used first
+    out); evicted symbols are read back from disk when requested again.
+    """
+
+    def __init__(self, root, build_model, params, max_symbols=256):
+        self.root = root
+        self.build_model = build_model
+        self.params = params
+        self.max_symbols = max_symbols
+
+        self._states = OrderedDict()  # symbol -> (saved file version or None, state dict)
+        self._locks = {}
+        self._guard = threading.Lock()
+        self.counts = {'initialized': 0, 'updated': 0, 'current': 0}
+
+    def _path(self, symbol):
+        name = re.sub(r'[^A-Z0-9._-]', '_', symbol)
+        return os.path.join(self.root, name + '.pkl')
+
+    def _lock(self, symbol):
+        with self._guard:
+            return self._locks.setdefault(symbol, threading.Lock())
+
+    def _version(self, symbol):
+        """Identity of the saved state file; every save replaces it with a new inode"""
+        if not self.root:
+            return None
+        try:
+            stat = os.stat(self._path(symbol))
+        except OSError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns
+
+    def _remember(self, symbol, version, state):
+        with self._guard:
+            self._states[symbol] = (version, state)
+            self._states.move_to_end(symbol)
+            while len(self._states) > self.max_symbols:
+                self._states.popitem(last=False)
+
+    def _load(self, symbol):
+        """The symbol's state, re-read from disk when another process saved a newer one"""
+        version = self._version(symbol)
+        with self._guard:
+            cached = self._states.get(symbol)
+        if cached is not None and (version is None or cached[0] == version):
+            self._remember(symbol, *cached)
+            return cached[1]
+        if version is None:
+            return None
+        try:
+            with open(self._path(symbol), 'rb') as f:
+                state = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            return None
+        self._remember(symbol, version, state)
+        return state
+
+    def _save(self, symbol, state):
+        if not self.root:
+            self._remember(symbol, None, state)
+            return
+        os.makedirs(self.root, exist_ok=True)
+        path = self._path(symbol)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, 'wb') as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+        self._remember(symbol, self._version(symbol), state)
+
+    @staticmethod
+    def _learn(state, X, y):
+        """Score the windows with the current model, then train on them"""
+        if not len(X):
+            return
+        squared_error = float(np.mean((state['model'].predict(X) - y) ** 2))
+        weight = min(1.0, len(X) / ERROR_WINDOW)
+        previous = state['error']
+        state['error'] = squared_error if previous is None else (1 - weight) * previous + weight * squared_error
+        state['model'].partial_fit(X, y)
+
+    def _initialize(self, closes, look_back):
+        from sklearn.preprocessing import MinMaxScaler
+
+        scaler = MinMaxScaler(feature_range=(0, 1))
+        scaled = scaler.fit_transform(closes.reshape(-1, 1))[:, 0]
+        X, y = make_windows(scaled, look_back)
+        split = int(TRAIN_FRACTION * len(X))
+
+        state = {
+            'model': self.build_model(),
+            'scaler': scaler,
+            'params': self.params,
+            'look_back': look_back,
+            'anchor': None,
+            'bars': 0,
+            'updates': 0,
+            'error': None,
+            'initialized_at': datetime.now().isoformat(),
+        }
+        state['model'].fit(X[:split], y[:split])
+        self._learn(state, X[split:], y[split:])
+        return state
+
+    def update(self, symbol, closes, look_back):
+        """
+        Train symbol's model on the bars it has not seen and return the
+        model registry fields. The returned model is a copy, so later
+        updates never change it under a running prediction.
+        """
+        symbol = symbol.upper().strip()
+        closes = np.asarray(closes, dtype=np.float64)
+        started = time.perf_counter()
+
+        with self._lock(symbol):
+            state = self._load(symbol)
+            new_start = None
+            if state is not None and state['params'] == self.params and state['look_back'] == look_back:
+                new_start = resume_index(closes, state['anchor'], state['bars'])
+
+            if new_start is None:
+                mode, new_bars = 'initialized', len(closes)
+                state = self._initialize(closes, look_back)
+            elif new_start == len(closes):
+                mode, new_bars = 'current', 0
+            else:
+                mode, new_bars = 'updated', len(closes) - new_start
+                # Windows whose target is a new bar; inputs may reach back into seen bars
+                first = max(0, new_start - look_back)
+                scaler = state['scaler']
+                scaled = closes[first:] * scaler.scale_[0] + scaler.min_[0]
+                self._learn(state, *make_windows(scaled, look_back))
+                state['updates'] += 1
+
+            if mode != 'current':
+                state['anchor'] = closes[-ANCHOR_BARS:].tolist()
+                state['bars'] = len(closes)
+                state['updated_at'] = datetime.now().isoformat()
+                self._save(symbol, state)
+
+            model = copy.deepcopy(state['model'])
+            scaler = state['scaler']
+            error = state['error'] or 0.0
+
+        with self._guard:
+            self.counts[mode] += 1
+
+        return {
+            'model': model,
+            'scaler': scaler,
+            'look_back': look_back,
+            'model_type': 'Online',
+            'metrics': {
+                'confidence': max(0.0, min(1.0, 1 - error)),
+                'mode': mode,
+                'new_bars': new_bars,
+                'update_ms': round((time.perf_counter() - started) * 1000, 3),
+            },
+        }
+
+    def stats(self):
+        with self._guard:
+            return {'symbols': len(self._states), 'max_symbols': self.max_symbols, **self.counts}
@@ -0,0 +1,57 @@
+# ============================================
+# HISTORY SERIALIZATION
+# Column-wise conversion of OHLCV frames to JSON-ready structures
+# ============================================
+
+import numpy as np
+
+OHLCV_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+
+def _dates(index):
+    """Format a DatetimeIndex as 'YYYY-MM-DD' strings in the index's own timezone"""
+    if getattr(index, 'tz', None) is not None:
+        index = index.tz_localize(None)
+    return index.values.astype('datetime64[D]').astype(str).tolist()
+
+
+def _columns(hist):
+    """Convert each OHLCV column to a Python list in one pass per column"""
+    return {
+        'Date': _dates(hist.index),
+        'Open': hist['Open'].to_numpy(dtype=np.float64).tolist(),
+        'High': hist['High'].to_numpy(dtype=np.float64).tolist(),
+        'Low': hist['Low'].to_numpy(dtype=np.float64).tolist(),
+        'Close': hist['Close'].to_numpy(dtype=np.float64).tolist(),
+        'Volume': hist['Volume'].to_numpy(dtype=np.int64).tolist(),
+    }
+
+
+def history_to_records(hist):
+    """
+    Serialize a history frame to a list of bar dicts:
+    [{'Date': 'YYYY-MM-DD', 'Open': ..., 'High': ..., 'Low': ..., 'Close': ..., 'Volume': ...}]
+    Same output as iterating hist.iterrows(), without per-row Series objects.
+    """
+    cols = _columns(hist)
+    return [
+        {'Date': d, 'Open': o, 'High': h, 'Low': l, 'Close': c, 'Volume': v}
+        for d, o, h, l, c, v in zip(
+            cols['Date'], cols['Open'], cols['High'], cols['Low'], cols['Close'], cols['Volume']
+        )
+    ]
+
+
+def history_to_columns(hist):
+    """
+    Serialize a history frame to parallel arrays:
+    {'Date': [...], 'Open': [...], 'High': [...], 'Low': [...], 'Close': [...], 'Volume': [...]}
+    """
+    return _columns(hist)
+
+
+def serialize_history(hist, data_format='records'):
+    """Serialize a history frame in the requested response shape"""
+    if data_format == 'columnar':
+        return history_to_columns(hist)
+    return history_to_records(hist)
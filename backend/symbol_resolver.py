@@ -0,0 +1,166 @@
+# ============================================
+# SYMBOL RESOLUTION INDEX
+# Remembers which exchange suffix works for a ticker
+# ============================================
+
+import threading
+from datetime import datetime, timedelta
+
+# Exchange suffixes probed for symbols without one
+EXCHANGE_SUFFIXES = ['.NS', '.BO']  # NSE India, BSE India
+
+
+class SymbolResolver:
+    """
+    Resolution index for the SYMBOL -> SYMBOL.NS -> SYMBOL.BO probing.
+
+    Positive entries remember the variant that returned data, negative
+    entries remember variants that came back empty until they expire.
+    An empty response may only mean the upstream is having trouble, so it
+    is skipped for empty_ttl; once another variant of the symbol returns
+    data, the variants that came back empty are known not to be its
+    listing and are skipped for negative_ttl. Expired entries are dropped
+    on lookup. The index lives in memory and is persisted to a MongoDB
+    collection so it survives restarts.
+
+    Document shape:
+        {
+            'symbol': 'RELIANCE',
+            'resolved': 'RELIANCE.NS',
+            'resolved_at': datetime,
+            'misses': {'RELIANCE': datetime_expires_at},
+            'updated_at': datetime
+        }
+    """
+
+    def __init__(self, collection=None, negative_ttl=6 * 3600, positive_ttl=7 * 24 * 3600, empty_ttl=15 * 60):
+        self.collection = collection
+        self.negative_ttl = timedelta(seconds=negative_ttl)
+        self.positive_ttl = timedelta(seconds=positive_ttl)
+        self.empty_ttl = timedelta(seconds=empty_ttl)
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def variants(symbol):
+        """All symbol variants in probing order"""
+        symbol = symbol.upper().strip()
+        if '.' in symbol:
+            return [symbol]
+        return [symbol] + [f"{symbol}{suffix}" for suffix in EXCHANGE_SUFFIXES]
+
+    @staticmethod
+    def _field(variant):
+        # MongoDB field names cannot contain dots
+        return variant.replace('.', '_')
+
+    def _load(self, symbol):
+        """Get the in-memory entry, reading it from MongoDB on first access"""
+        with self._lock:
+            entry = self._entries.get(symbol)
+        if entry is not None:
+            return entry
+
+        entry = {'resolved': None, 'resolved_at': None, 'misses': {}}
+        if self.collection is not None:
+            try:
+                doc = self.collection.find_one({'symbol': symbol})
+                if doc:
+                    entry['resolved'] = doc.get('resolved')
+                    entry['resolved_at'] = doc.get('resolved_at')
+                    misses = doc.get('misses') or {}
+                    now = datetime.now()
+                    for variant in self.variants(symbol):
+                        expires_at = misses.get(self._field(variant))
+                        if expires_at and expires_at > now:
+                            entry['misses'][variant] = expires_at
+            except Exception as e:
+                print(f"⚠️ Symbol index read failed for {symbol}: {str(e)}")
+
+        with self._lock:
+            return self._entries.setdefault(symbol, entry)
+
+    def _persist(self, symbol, entry):
+        if self.collection is None:
+            return
+        try:
+            self.collection.update_one(
+                {'symbol': symbol},
+                {'$set': {
+                    'symbol': symbol,
+                    'resolved': entry['resolved'],
+                    'resolved_at': entry['resolved_at'],
+                    'misses': {self._field(v): exp for v, exp in entry['misses'].items()},
+                    'updated_at': datetime.now()
+                }},
+                upsert=True
+            )
+        except Exception as e:
+            print(f"⚠️ Symbol index write failed for {symbol}: {str(e)}")
+
+    def candidates(self, symbol):
+        """
+        Variants worth probing for a symbol, best first.
+        A known-good variant goes first; variants with an unexpired
+        negative entry are skipped entirely, expired ones are dropped.
+        """
+        symbol = symbol.upper().strip()
+        entry = self._load(symbol)
+        now = datetime.now()
+
+        with self._lock:
+            for variant in [v for v, expires_at in entry['misses'].items() if expires_at <= now]:
+                del entry['misses'][variant]
+            resolved = entry['resolved']
+            if resolved and entry['resolved_at'] and now - entry['resolved_at'] > self.positive_ttl:
+                resolved = None
+            ordered = self.variants(symbol)
+            if resolved in ordered:
+                ordered.remove(resolved)
+                ordered.insert(0, resolved)
+            return [v for v in ordered if v == resolved or v not in entry['misses']]
+
+    def record_hit(self, symbol, variant):
+        """
+        Remember that a variant returned data, which makes the misses of the
+        symbol's other variants definitive
+        """
+        symbol = symbol.upper().strip()
+        entry = self._load(symbol)
+        now = datetime.now()
+        with self._lock:
+            changed = entry['resolved'] != variant or variant in entry['misses']
+            entry['resolved'] = variant
+            if changed or entry['resolved_at'] is None or now - entry['resolved_at'] > self.positive_ttl:
+                entry['resolved_at'] = now
+                changed = True
+            entry['misses'].pop(variant, None)
+            for other, expires_at in entry['misses'].items():
+                if now < expires_at < now + self.negative_ttl:
+                    entry['misses'][other] = now + self.negative_ttl
+                    changed = True
+        if changed:
+            self._persist(symbol, entry)
+
+    def record_miss(self, symbol, variant):
+        """
+        Remember that a variant returned no data: for empty_ttl, or for
+        negative_ttl when another variant of the symbol is known to work
+        """
+        symbol = symbol.upper().strip()
+        entry = self._load(symbol)
+        with self._lock:
+            known = entry['resolved'] not in (None, variant)
+            entry['misses'][variant] = datetime.now() + (self.negative_ttl if known else self.empty_ttl)
+            if entry['resolved'] == variant:
+                entry['resolved'] = None
+                entry['resolved_at'] = None
+        self._persist(symbol, entry)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'symbols': len(self._entries),
+                'resolved': sum(1 for e in self._entries.values() if e['resolved']),
+                'negative_entries': sum(len(e['misses']) for e in self._entries.values()),
+            }
@@ -0,0 +1,100 @@
+# ============================================
+# TEST FIXTURES
+# Import paths, an in-memory MongoDB and a recording market data provider
+# ============================================
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPO_ROOT = os.path.dirname(BACKEND_DIR)
+for path in (REPO_ROOT, BACKEND_DIR):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+from stock_common.market_data import MarketDataProvider
+
+
+def make_bars(start, end, seed=0):
+    """Business-day bars shaped like yf.Ticker().history() output"""
+    index = pd.bdate_range(start, end, tz='America/New_York', name='Date')
+    rng = np.random.default_rng(seed)
+    close = 100 + np.cumsum(rng.normal(0, 1, len(index)))
+    return pd.DataFrame({
+        'Open': close - 0.5,
+        'High': close + 1.0,
+        'Low': close - 1.0,
+        'Close': close,
+        'Volume': rng.integers(1_000, 10_000, len(index)),
+    }, index=index)
+
+
+class FakeProvider(MarketDataProvider):
+    """Serves slices of fixed per-symbol bars and records every request"""
+
+    name = 'fake'
+
+    def __init__(self, bars):
+        self.bars = bars
+        self.calls = []
+
+    def history(self, symbol, period='1y', interval='1d', start=None):
+        self.calls.append((symbol, period, start))
+        frame = self.bars.get(symbol)
+        if frame is None:
+            return pd.DataFrame()
+        if start is not None:
+            return frame[frame.index >= pd.Timestamp(start, tz=frame.index.tz)]
+        days = {'1d': 1, '5d': 7, '1mo': 31, '3mo': 92, '6mo': 183, '1y': 366, '2y': 731}.get(period)
+        if days is None:
+            return frame
+        return frame[frame.index >= frame.index[-1] - pd.Timedelta(days=days - 1)]
+
+    def metadata(self, symbol):
+        return {'longName': f'{symbol} Inc'}
+
+
+@pytest.fixture(scope='session')
+def app_module():
+    """backend/app.py imported against mongomock instead of a MongoDB server"""
+    mongomock = pytest.importorskip('mongomock')
+    import pymongo
+
+    real_client = pymongo.MongoClient
+    pymongo.MongoClient = lambda uri, *args, **kwargs: mongomock.MongoClient(uri)
+    try:
+        import app
+    finally:
+        pymongo.MongoClient = real_client
+    return app
+
+
+@pytest.fixture
+def provider(app_module, monkeypatch):
+    """Two years of AAPL bars ending today, with empty bar collections and caches"""
+    today = pd.Timestamp.now().normalize()
+    fake = FakeProvider({'AAPL': make_bars(today - pd.Timedelta(days=800), today)})
+    monkeypatch.setattr(app_module, 'market_data', fake)
+    for name in ('stock_bars', 'stock_data'):
+        app_module.collections[name].delete_many({})
+    app_module.ohlcv_cache.invalidate()
+    return fake
+
+
+@pytest.fixture
+def client(app_module):
+    return app_module.app.test_client()
+
+
+@pytest.fixture
+def token(app_module):
+    return app_module.generate_token('user-1', 'user-1@example.com')
+
+
+@pytest.fixture
+def auth_headers(token):
+    return {'Authorization': f'Bearer {token}'}
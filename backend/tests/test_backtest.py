@@ -0,0 +1,129 @@
+import numpy as np
+import pytest
+
+from backtest import BacktestCache, aggregate_folds, evaluate_fold, walk_forward_folds
+from training import SharedArrays
+
+
+def test_expanding_folds_have_fixed_boundaries():
+    layout = walk_forward_folds(100, folds=4, step=10, horizon=3)
+
+    assert layout == [
+        {'train': (0, 58), 'test': (60, 70)},
+        {'train': (0, 68), 'test': (70, 80)},
+        {'train': (0, 78), 'test': (80, 90)},
+        {'train': (0, 88), 'test': (90, 100)},
+    ]
+
+
+def test_walk_forward_folds_train_on_a_sliding_window():
+    layout = walk_forward_folds(100, folds=3, step=10, mode='walk_forward', train_size=40)
+
+    assert [fold['train'] for fold in layout] == [(30, 70), (40, 80), (50, 90)]
+    assert [fold['test'] for fold in layout] == [(70, 80), (80, 90), (90, 100)]
+
+
+@pytest.mark.parametrize('mode', ['expanding', 'walk_forward'])
+@pytest.mark.parametrize('horizon', [1, 5])
+@pytest.mark.parametrize('folds,step', [(1, None), (5, None), (7, 12)])
+def test_folds_are_chronological_and_never_overlap(mode, horizon, folds, step):
+    n_samples = 250
+    layout = walk_forward_folds(n_samples, folds=folds, step=step, horizon=horizon, mode=mode)
+
+    assert len(layout) == folds
+    tests = [fold['test'] for fold in layout]
+    # Consecutive test blocks that end at the latest sample
+    assert tests[-1][1] == n_samples
+    assert all(end == next_start for (_, end), (next_start, _) in zip(tests, tests[1:]))
+    for fold in layout:
+        (train_start, train_end), (test_start, test_end) = fold['train'], fold['test']
+        assert 0 <= train_start < train_end and test_start < test_end
+        # The last training target (h - 1 samples ahead) comes before the first test sample
+        assert train_end - 1 + (horizon - 1) < test_start
+
+
+@pytest.mark.parametrize('options,message', [
+    ({'mode': 'monthly'}, 'mode must be one of'),
+    ({'folds': 0}, 'folds must be between'),
+    ({'folds': 21}, 'folds must be between'),
+    ({'horizon': 0}, 'horizon must be at least 1'),
+    ({'step': 1}, 'step must be at least 2'),
+    ({'folds': 10, 'step': 10}, 'Not enough data points'),
+    ({'mode': 'walk_forward', 'train_size': 61}, 'train_size must be between'),
+])
+def test_invalid_layouts_are_rejected(options, message):
+    with pytest.raises(ValueError, match=message):
+        walk_forward_folds(100, **{'folds': 4, 'step': 10, **options})
+
+
+def series(n=200):
+    return np.sin(np.linspace(0, 12, n)) * 0.4 + 0.5
+
+
+@pytest.mark.parametrize('horizon', [1, 3])
+def test_fold_is_scored_on_its_own_test_targets(horizon):
+    values = series()
+    look_back = 10
+    n_samples = len(values) - look_back - horizon + 1
+    fold = walk_forward_folds(n_samples, folds=3, step=15, horizon=horizon)[1]
+
+    result = evaluate_fold('DecisionTree', {'series': values}, look_back, horizon, fold)
+
+    test_start, test_end = fold['test']
+    # Sample t is the window ending at t + look_back - 1 and targets horizon bars later
+    expected = values[test_start + look_back + horizon - 1:test_end + look_back + horizon - 1]
+    np.testing.assert_array_equal(result['actual'], expected)
+    assert result['predictions'].shape == expected.shape
+    assert set(result['metrics']) >= {'mae', 'rmse', 'r2'}
+
+
+def test_fold_results_are_deterministic_and_match_shared_memory():
+    values = series()
+    fold = walk_forward_folds(len(values) - 10, folds=4, step=20)[2]
+
+    first = evaluate_fold('DecisionTree', {'series': values}, 10, 1, fold)
+    second = evaluate_fold('DecisionTree', {'series': values}, 10, 1, fold)
+    with SharedArrays({'series': values}) as shared:
+        from_shared = evaluate_fold('DecisionTree', shared.specs, 10, 1, fold)
+
+    np.testing.assert_array_equal(first['predictions'], second['predictions'])
+    np.testing.assert_array_equal(first['predictions'], from_shared['predictions'])
+    assert first['metrics'] == from_shared['metrics']
+
+
+def test_aggregate_scores_the_concatenated_folds():
+    folds = [
+        {'actual': np.array([1.0, 2.0]), 'predictions': np.array([1.5, 2.0])},
+        {'actual': np.array([3.0, 4.0]), 'predictions': np.array([3.0, 3.5])},
+    ]
+
+    metrics, actual, preds = aggregate_folds(folds)
+
+    np.testing.assert_array_equal(actual, [1.0, 2.0, 3.0, 4.0])
+    np.testing.assert_array_equal(preds, [1.5, 2.0, 3.0, 3.5])
+    assert metrics['mae'] == pytest.approx(0.25)
+
+
+def test_cache_drops_folds_of_an_older_bar():
+    cache = BacktestCache(max_entries=10)
+    settings = (('folds', 2),)
+    cache.put(('AAPL', 'SVM', settings, '2026-10-15', 0), 'old')
+    cache.put(('MSFT', 'SVM', settings, '2026-10-15', 0), 'other')
+    cache.put(('AAPL', 'SVM', settings, '2026-10-16', 0), 'new')
+
+    assert cache.get(('AAPL', 'SVM', settings, '2026-10-15', 0)) is None
+    assert cache.get(('AAPL', 'SVM', settings, '2026-10-16', 0)) == 'new'
+    assert cache.get(('MSFT', 'SVM', settings, '2026-10-15', 0)) == 'other'
+
+
+def test_cache_evicts_the_least_recently_used_fold():
+    cache = BacktestCache(max_entries=2)
+    keys = [('AAPL', 'SVM', (), '2026-10-16', fold) for fold in range(3)]
+    cache.put(keys[0], 0)
+    cache.put(keys[1], 1)
+    cache.get(keys[0])
+    cache.put(keys[2], 2)
+
+    assert cache.get(keys[1]) is None
+    assert (cache.get(keys[0]), cache.get(keys[2])) == (0, 2)
+    assert cache.stats()['entries'] == 2
@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+from stock_common.datasets import make_windows, resume_index
+
+
+@pytest.mark.parametrize('look_back,horizon', [(1, 1), (5, 1), (5, 3), (30, 30)])
+def test_windows_match_the_loop_they_replace(look_back, horizon):
+    values = np.arange(60, dtype=np.float64) ** 1.5
+    X, y = make_windows(values, look_back, horizon)
+
+    expected_X = [values[t - look_back:t] for t in range(look_back, len(values) - horizon + 1)]
+    expected_y = [values[t:t + horizon] for t in range(look_back, len(values) - horizon + 1)]
+    np.testing.assert_array_equal(X, expected_X)
+    np.testing.assert_array_equal(y, np.array(expected_y)[:, 0] if horizon == 1 else expected_y)
+
+
+def test_windows_of_a_matrix_target_one_column():
+    values = np.arange(40, dtype=np.float64).reshape(20, 2)
+    X, y = make_windows(values, 4, target=1)
+
+    assert X.shape == (16, 4, 2)
+    np.testing.assert_array_equal(X[0], values[:4])
+    np.testing.assert_array_equal(y, values[4:, 1])
+
+
+def test_too_short_series_give_no_windows():
+    X, y = make_windows(np.arange(5.0), 5, 2)
+    assert X.shape == (0, 5) and y.shape == (0, 2)
+
+
+def test_resume_index_finds_the_unseen_values():
+    values = np.arange(100.0, 200.0)
+    anchor = values[90:95]
+
+    assert resume_index(values, anchor, bars=95) == 95
+    # The history lost its first 10 values since the model was trained
+    assert resume_index(values[10:], anchor, bars=95) == 85
+    # Re-fetched closes within the bar store's tolerance still match
+    assert resume_index(values, anchor * (1 + 5e-5), bars=95) == 95
+
+
+def test_resume_index_rejects_doubtful_anchors():
+    values = np.arange(100.0, 200.0)
+    anchor = values[90:95]
+
+    assert resume_index(values * 1.01, anchor, bars=95) is None
+    # An anchor ending past the bars the model saw is a coincidental match
+    assert resume_index(values, anchor, bars=80) is None
+    # A flat stretch matches in several places
+    assert resume_index(np.ones(50), np.ones(5), bars=50) is None
@@ -0,0 +1,68 @@
+import bson
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.linear_model import LinearRegression
+from sklearn.preprocessing import MinMaxScaler
+
+from forecasting import decode_path, encode_path, forecast_path, resolve_method
+from stock_common.datasets import make_windows
+from stock_common.model_registry import FittedModel
+from stock_common.tree_export import FlatForest
+
+LOOK_BACK = 20
+
+
+def closes(n=400, seed=0):
+    return 100 + np.cumsum(np.random.default_rng(seed).normal(0, 1, n))
+
+
+def fitted(model, model_type, prices, horizon=1):
+    scaler = MinMaxScaler().fit(prices.reshape(-1, 1))
+    X, y = make_windows(scaler.transform(prices.reshape(-1, 1))[:, 0], LOOK_BACK, horizon)
+    model.fit(X, y)
+    return FittedModel(model, scaler, LOOK_BACK, model_type, {}, None, 0)
+
+
+def test_encoded_path_survives_a_bson_round_trip():
+    prices = [101.234567, 99.5, 1234.56789, 0.015]
+    document = bson.decode(bson.encode({'prices': encode_path(prices)}))
+
+    assert decode_path(document['prices']) == [101.23, 99.5, 1234.57, 0.01]
+    assert len(encode_path(prices)) == 4 * len(prices)
+
+
+def test_recursive_path_matches_a_step_by_step_loop():
+    prices = closes()
+    fit = fitted(LinearRegression(), 'LinearRegression', prices)
+
+    path = forecast_path(fit, prices, horizon=10)
+
+    history = list(prices)
+    for _ in range(10):
+        window = fit.scaler.transform(np.array(history[-LOOK_BACK:]).reshape(-1, 1)).reshape(1, -1)
+        scaled = fit.model.predict(window)
+        history.append(fit.scaler.inverse_transform(scaled.reshape(-1, 1))[0, 0])
+    np.testing.assert_allclose(path, history[-10:], rtol=1e-9)
+
+
+def test_direct_path_comes_from_one_multi_output_prediction():
+    prices = closes()
+    fit = fitted(RandomForestRegressor(n_estimators=10, random_state=0), 'RandomForest', prices, horizon=5)
+    flat = fit._replace(model=FlatForest.from_sklearn(fit.model))
+
+    path = forecast_path(flat, prices, horizon=5)
+
+    window = fit.scaler.transform(prices[-LOOK_BACK:].reshape(-1, 1)).reshape(1, -1)
+    expected = fit.scaler.inverse_transform(fit.model.predict(window).reshape(-1, 1))[:, 0]
+    np.testing.assert_allclose(path, expected, rtol=1e-9)
+    with pytest.raises(ValueError):
+        forecast_path(flat, prices, horizon=3)
+
+
+def test_method_resolution():
+    assert resolve_method('RandomForest', 5) == 'direct'
+    assert resolve_method('RandomForest', 1) == 'recursive'
+    assert resolve_method('RandomForest', 5, 'recursive') == 'recursive'
+    with pytest.raises(ValueError):
+        resolve_method('RandomForest', 5, 'sideways')
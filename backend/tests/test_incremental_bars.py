@@ -0,0 +1,67 @@
+import pandas as pd
+from pandas.testing import assert_frame_equal
+
+
+def full_download(app_module, provider, period):
+    """What a plain (non-incremental) download of period would return"""
+    frame = app_module.normalize_history(provider.bars['AAPL'])
+    return frame[frame.index >= app_module.period_start(period)]
+
+
+def assert_same_bars(actual, expected):
+    assert actual.index.is_unique
+    assert_frame_equal(actual, expected, check_dtype=False, check_freq=False)
+
+
+def test_first_fetch_stores_the_completed_bars(app_module, provider):
+    history = app_module.fetch_history_incremental('AAPL', '1y')
+
+    assert provider.calls == [('AAPL', '1y', None)]
+    assert_same_bars(history, full_download(app_module, provider, '1y'))
+    today = pd.Timestamp.now().normalize()
+    completed = history[history.index < today]
+    assert app_module.collections['stock_bars'].count_documents({'symbol': 'AAPL'}) == len(completed)
+    summary = app_module.load_bar_summary('AAPL')
+    assert summary['bar_count'] == len(completed)
+
+
+def test_later_fetches_download_only_new_bars(app_module, provider):
+    bars = provider.bars['AAPL']
+    provider.bars['AAPL'] = bars.iloc[:-3]
+    app_module.fetch_history_incremental('AAPL', '1y')
+    last_stored = app_module.load_bar_summary('AAPL')['last_date']
+
+    provider.bars['AAPL'] = bars
+    history = app_module.fetch_history_incremental('AAPL', '1y')
+
+    assert provider.calls[-1] == ('AAPL', '1y', last_stored.strftime('%Y-%m-%d'))
+    assert_same_bars(history, full_download(app_module, provider, '1y'))
+    stored = app_module.load_stored_bars('AAPL')
+    assert stored.index.is_unique
+    assert stored.index[-1] > last_stored
+
+
+def test_duplicate_stored_bars_are_served_once(app_module, provider):
+    app_module.fetch_history_incremental('AAPL', '1y')
+    stock_bars = app_module.collections['stock_bars']
+    duplicate = stock_bars.find_one({'symbol': 'AAPL'}, {'_id': 0}, sort=[('date', -1)])
+    stock_bars.insert_one(duplicate)
+
+    history = app_module.fetch_history_incremental('AAPL', '1y')
+
+    assert_same_bars(history, full_download(app_module, provider, '1y'))
+
+
+def test_rebased_history_is_downloaded_again(app_module, provider):
+    app_module.fetch_history_incremental('AAPL', '1y')
+    # A split halves every past close upstream
+    for column in ('Open', 'High', 'Low', 'Close'):
+        provider.bars['AAPL'][column] /= 2
+
+    history = app_module.fetch_history_incremental('AAPL', '1y')
+
+    assert provider.calls[-1] == ('AAPL', '1y', None)
+    assert_same_bars(history, full_download(app_module, provider, '1y'))
+    stored = app_module.load_stored_bars('AAPL')
+    expected = full_download(app_module, provider, '1y')
+    assert_same_bars(stored, expected[expected.index < pd.Timestamp.now().normalize()])
@@ -0,0 +1,136 @@
+import numpy as np
+import pytest
+
+from indicators import DEFAULT_SERIES, IndicatorCache, IndicatorSet, parse_indicator
+
+SERIES = DEFAULT_SERIES + ['macd_5_35_5', 'bollinger_10_3', 'sma_1']
+
+
+def make_bars(n=300, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 100 + np.cumsum(rng.normal(0, 1, n))
+    return {
+        'open': close + rng.normal(0, 0.5, n),
+        'high': close + rng.random(n) + 0.5,
+        'low': close - rng.random(n) - 0.5,
+        'close': close,
+        'volume': rng.integers(1_000, 10_000, n).astype(np.float64),
+    }
+
+
+def head(bars, n):
+    return {field: values[:n] for field, values in bars.items()}
+
+
+def assert_series_equal(actual, expected):
+    assert actual.keys() == expected.keys()
+    for output in expected:
+        np.testing.assert_allclose(actual[output], expected[output], rtol=1e-9, atol=1e-9, err_msg=output)
+
+
+def test_bar_by_bar_updates_match_full_computation():
+    bars = make_bars()
+    expected = IndicatorSet(SERIES).compute(bars)
+
+    indicators = IndicatorSet(SERIES)
+    series = {output: list(values) for output, values in indicators.compute(head(bars, 100)).items()}
+    for i in range(100, 300):
+        for output, value in indicators.update({field: bars[field][i] for field in bars}).items():
+            series[output].append(value)
+
+    assert_series_equal(series, expected)
+
+
+def test_snapshot_is_independent_of_later_updates():
+    bars = make_bars()
+    indicators = IndicatorSet(SERIES)
+    indicators.compute(head(bars, 200))
+    snapshot = indicators.snapshot()
+    bar = {field: bars[field][200] for field in bars}
+
+    first = indicators.update(bar)
+    indicators.update({field: bars[field][201] for field in bars})
+
+    assert_series_equal(snapshot.update(bar), first)
+
+
+@pytest.mark.parametrize('name', ['sma', 'sma_0', 'macd_1_2', 'foo_3', 'sma_501'])
+def test_invalid_names_are_rejected(name):
+    with pytest.raises(ValueError):
+        parse_indicator(name)
+
+
+def cache_get(cache, bars, n, **kwargs):
+    days = np.arange(n) + 1000
+    return cache.get('AAPL', SERIES, days, head(bars, n), **kwargs)
+
+
+def full_series(bars, n, start=0):
+    return {output: values[start:] for output, values in IndicatorSet(SERIES).compute(head(bars, n)).items()}
+
+
+def test_cache_extends_with_new_bars_only():
+    bars = make_bars()
+    cache = IndicatorCache()
+
+    cache_get(cache, bars, 250)
+    days, series = cache_get(cache, bars, 253)
+    cache_get(cache, bars, 253)
+
+    assert list(days) == list(range(1000, 1253))
+    assert_series_equal(series, full_series(bars, 253))
+    assert cache.stats() == {'entries': 1, 'max_entries': 256, 'computed': 1, 'extended': 1, 'current': 1}
+
+
+def test_cache_replaces_a_revised_latest_bar():
+    bars = make_bars()
+    cache = IndicatorCache()
+    cache_get(cache, bars, 250)
+
+    revised = {field: values.copy() for field, values in bars.items()}
+    revised['close'][249] += 3.0
+    revised['high'][249] += 3.0
+    _, series = cache_get(cache, revised, 251)
+
+    assert_series_equal(series, full_series(revised, 251))
+    assert cache.stats()['computed'] == 1
+
+
+def test_cache_recomputes_a_revised_history():
+    bars = make_bars()
+    cache = IndicatorCache()
+    cache_get(cache, bars, 250)
+
+    rebased = {field: values / 2 if field != 'volume' else values for field, values in bars.items()}
+    _, series = cache_get(cache, rebased, 251)
+
+    assert_series_equal(series, full_series(rebased, 251))
+    assert cache.stats()['computed'] == 2
+
+
+def test_cache_keeps_periods_apart():
+    bars = make_bars()
+    cache = IndicatorCache()
+    long_days = np.arange(300) + 1000
+    short_days = long_days[-23:]
+    short_bars = {field: values[-23:] for field, values in bars.items()}
+
+    cache.get('AAPL', SERIES, long_days, bars, period='1y')
+    days, series = cache.get('AAPL', SERIES, short_days, short_bars, period='1mo')
+
+    # A month of bars on its own, not the tail of the year already computed
+    assert list(days) == list(short_days)
+    assert_series_equal(series, IndicatorSet(SERIES).compute(short_bars))
+    assert cache.stats()['entries'] == 2
+
+
+def test_cache_never_returns_bars_before_the_requested_ones():
+    bars = make_bars()
+    cache = IndicatorCache()
+    days = np.arange(300) + 1000
+    cache.get('AAPL', SERIES, days, bars)
+
+    selected, series = cache.get('AAPL', SERIES, days[-50:], {f: v[-50:] for f, v in bars.items()})
+
+    assert list(selected) == list(days[-50:])
+    assert all(len(values) == 50 for values in series.values())
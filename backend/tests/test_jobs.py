@@ -0,0 +1,190 @@
+import threading
+import time
+
+import pytest
+
+import jobs
+from jobs import FAILED, SUCCEEDED, JobLimitExceeded, JobQueue
+
+
+def wait_finished(job, timeout=5):
+    version = -1
+    deadline = time.monotonic() + timeout
+    while not job.finished:
+        assert time.monotonic() < deadline, job.to_dict()
+        version = job.wait_for_change(version, timeout=0.1)
+    return job.to_dict()
+
+
+class Gate:
+    """A job function that reports a stage and then blocks until released"""
+
+    def __init__(self, result=None, error=None):
+        self.release = threading.Event()
+        self.result = result
+        self.error = error
+
+    def __call__(self, job):
+        job.progress('training')
+        self.release.wait(5)
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+def test_job_runs_and_keeps_its_result():
+    queue = JobQueue(max_workers=1)
+    job, created = queue.submit('u1', 'k1', lambda job: {'price': 1.5})
+
+    state = wait_finished(job)
+
+    assert created
+    assert (state['status'], state['result'], state['error']) == (SUCCEEDED, {'price': 1.5}, None)
+    assert queue.get(job.id) is job
+    assert state['started_at'] and state['finished_at']
+
+
+def test_failed_job_records_the_error_and_its_status():
+    error = ValueError('no data')
+    error.status = 404
+    queue = JobQueue(max_workers=1)
+    gate = Gate(error=error)
+    job, _ = queue.submit('u1', 'k1', gate)
+    gate.release.set()
+
+    state = wait_finished(job)
+
+    assert (state['status'], state['error'], job.error_status) == (FAILED, 'no data', 404)
+
+
+def test_unfinished_duplicates_share_one_job():
+    queue = JobQueue(max_workers=1)
+    gate = Gate(result=1)
+    first, _ = queue.submit('u1', 'k1', gate)
+    second, created = queue.submit('u1', 'k1', Gate(result=2))
+    gate.release.set()
+
+    assert second is first and not created
+    assert wait_finished(first)['result'] == 1
+    # A finished job is not reused
+    third, created = queue.submit('u1', 'k1', lambda job: 3)
+    assert created and wait_finished(third)['result'] == 3
+    assert queue.stats()['deduplicated'] == 1
+
+
+def test_limits_reject_unfinished_jobs_per_user_and_in_total():
+    queue = JobQueue(max_workers=1, max_unfinished=3, per_user_limit=2)
+    gates = [Gate() for _ in range(3)]
+    try:
+        queue.submit('u1', 'a', gates[0])
+        queue.submit('u1', 'b', gates[1])
+        with pytest.raises(JobLimitExceeded, match='per user'):
+            queue.submit('u1', 'c', Gate())
+        queue.submit('u2', 'd', gates[2])
+        with pytest.raises(JobLimitExceeded, match='queue is full'):
+            queue.submit('u3', 'e', Gate())
+        assert queue.stats()['rejected'] == 2
+    finally:
+        for gate in gates:
+            gate.release.set()
+
+
+def test_finished_jobs_expire_after_the_retention(monkeypatch):
+    queue = JobQueue(max_workers=1, retention=60)
+    job, _ = queue.submit('u1', 'k1', lambda job: 1)
+    wait_finished(job)
+    queue.submit('u1', 'k2', lambda job: 2)
+    assert queue.get(job.id) is job
+
+    now = time.monotonic()
+    monkeypatch.setattr(jobs.time, 'monotonic', lambda: now + 61)
+    queue.submit('u1', 'k3', lambda job: 3)
+
+    assert queue.get(job.id) is None
+
+
+@pytest.fixture
+def prediction_jobs(app_module, monkeypatch):
+    """A fresh job queue whose predictions block until released"""
+    queue = JobQueue(max_workers=1, per_user_limit=2)
+    monkeypatch.setattr(app_module, 'prediction_jobs', queue)
+    release = threading.Event()
+
+    def run_prediction(user_id, symbol, model_type='RandomForest', progress=None, **options):
+        progress('training')
+        release.wait(5)
+        if symbol == 'MISSING':
+            raise app_module.PredictionError('No data found for MISSING', 404)
+        return {'symbol': symbol, 'model_type': model_type, 'predicted_price': 101.0}
+
+    monkeypatch.setattr(app_module, 'run_prediction', run_prediction)
+    queue.release = release
+    return queue
+
+
+def test_prediction_job_is_submitted_and_polled(client, auth_headers, prediction_jobs):
+    response = client.post('/api/predict/jobs', json={'symbol': 'aapl'}, headers=auth_headers)
+    assert response.status_code == 202
+    body = response.get_json()
+    assert body['status_url'] == f"/api/predict/jobs/{body['job_id']}" and not body['deduplicated']
+
+    repeat = client.post('/api/predict/jobs', json={'symbol': 'AAPL'}, headers=auth_headers).get_json()
+    assert repeat['job_id'] == body['job_id'] and repeat['deduplicated']
+
+    prediction_jobs.release.set()
+    wait_finished(prediction_jobs.get(body['job_id']))
+    state = client.get(body['status_url'], headers=auth_headers).get_json()
+
+    assert state['status'] == SUCCEEDED
+    assert state['result'] == {'symbol': 'AAPL', 'model_type': 'RandomForest', 'predicted_price': 101.0}
+
+
+def test_prediction_job_limits_answer_429(client, auth_headers, prediction_jobs):
+    for symbol in ('AAPL', 'MSFT'):
+        assert client.post('/api/predict/jobs', json={'symbol': symbol}, headers=auth_headers).status_code == 202
+    response = client.post('/api/predict/jobs', json={'symbol': 'NVDA'}, headers=auth_headers)
+    prediction_jobs.release.set()
+
+    assert response.status_code == 429
+
+
+def test_jobs_are_private_to_their_user(app_module, client, auth_headers, prediction_jobs):
+    job_id = client.post('/api/predict/jobs', json={'symbol': 'AAPL'}, headers=auth_headers).get_json()['job_id']
+    prediction_jobs.release.set()
+    other = {'Authorization': f"Bearer {app_module.generate_token('user-2', 'user-2@example.com')}"}
+
+    assert client.get(f'/api/predict/jobs/{job_id}', headers=other).status_code == 404
+    assert client.get(f'/api/predict/jobs/{job_id}').status_code == 401
+    assert client.get('/api/predict/jobs/unknown', headers=auth_headers).status_code == 404
+
+
+def test_job_events_require_a_valid_token(app_module, client, auth_headers, prediction_jobs):
+    job_id = client.post('/api/predict/jobs', json={'symbol': 'AAPL'}, headers=auth_headers).get_json()['job_id']
+    prediction_jobs.release.set()
+    url = f'/api/predict/jobs/{job_id}/events'
+    other = app_module.generate_token('user-2', 'user-2@example.com')
+
+    assert client.get(url).status_code == 401
+    assert client.get(url + '?token=not-a-jwt').status_code == 401
+    assert client.get(url + '?token=' + other).status_code == 404
+
+
+def test_job_events_stream_progress_then_the_result(client, token, auth_headers, prediction_jobs):
+    job_id = client.post('/api/predict/jobs', json={'symbol': 'AAPL'}, headers=auth_headers).get_json()['job_id']
+    response = client.get(f'/api/predict/jobs/{job_id}/events?token={token}')
+    assert response.mimetype == 'text/event-stream'
+
+    prediction_jobs.release.set()
+    events = [chunk.decode().split('\n', 1)[0] for chunk in response.response if not chunk.startswith(b':')]
+
+    assert events[-1] == 'event: result'
+    assert set(events[:-1]) == {'event: progress'}
+
+
+def test_failed_prediction_job_reports_an_error_event(client, token, auth_headers, prediction_jobs):
+    job_id = client.post('/api/predict/jobs', json={'symbol': 'MISSING'}, headers=auth_headers).get_json()['job_id']
+    prediction_jobs.release.set()
+    body = b''.join(client.get(f'/api/predict/jobs/{job_id}/events?token={token}').response).decode()
+
+    assert body.rstrip().split('\n\n')[-1].startswith('event: error')
+    assert 'No data found for MISSING' in body
@@ -0,0 +1,174 @@
+import os
+import pickle
+import sys
+import types
+
+import numpy as np
+import pytest
+
+from stock_common.lstm_store import LSTMStore
+
+LOOK_BACK = 10
+PARAMS = {'units': 50, 'layers': 2, 'epochs': 15, 'batch_size': 32}
+
+
+class StubModel:
+    """Stands in for a Keras model: predicts the last value of each window and records its fits"""
+
+    def __init__(self):
+        self.fits = []
+
+    def fit(self, X, y, epochs=1, batch_size=32, validation_split=0.0, callbacks=(), verbose=0):
+        for callback in callbacks:
+            callback.model = self
+            callback.on_train_begin()
+        self.fits.append(len(X))
+
+    def predict(self, X, verbose=0):
+        return X[:, -1, 0]
+
+    def save(self, path):
+        with open(path, 'wb') as f:
+            pickle.dump(self, f)
+
+
+@pytest.fixture
+def keras(monkeypatch):
+    """The few tensorflow.keras names the store imports, backed by StubModel"""
+    callbacks = types.ModuleType('tensorflow.keras.callbacks')
+    models = types.ModuleType('tensorflow.keras.models')
+
+    class Callback:
+        def on_train_begin(self, logs=None):
+            pass
+
+    class EarlyStopping(Callback):
+        def __init__(self, **options):
+            self.options = options
+
+    def load_model(path):
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+
+    callbacks.Callback, callbacks.EarlyStopping = Callback, EarlyStopping
+    models.load_model = load_model
+    keras = types.ModuleType('tensorflow.keras')
+    keras.callbacks, keras.models = callbacks, models
+    tensorflow = types.ModuleType('tensorflow')
+    tensorflow.keras = keras
+    for name, module in [('tensorflow', tensorflow), ('tensorflow.keras', keras),
+                         ('tensorflow.keras.callbacks', callbacks), ('tensorflow.keras.models', models)]:
+        monkeypatch.setitem(sys.modules, name, module)
+
+
+@pytest.fixture
+def store(tmp_path, keras):
+    return LSTMStore(str(tmp_path), lambda look_back: StubModel(), PARAMS, max_new_bars=20)
+
+
+def closes(n=200):
+    # A slow wave between 100 and 110, so the stub's next-value guess is close
+    return 105 + 5 * np.sin(np.linspace(0, 6, n))
+
+
+def fit(store, values, look_back=LOOK_BACK):
+    metrics = store.fit('AAPL', values, look_back)['metrics']
+    return metrics['mode'], metrics.get('reason')
+
+
+def test_first_fit_trains_and_stores_the_model(tmp_path, store):
+    values = closes()
+
+    assert fit(store, values) == ('retrained', 'no stored model')
+    assert sorted(os.listdir(tmp_path)) == ['AAPL.json', 'AAPL.keras']
+    meta = store.metadata('AAPL')
+    assert meta['bars'] == 200 and meta['anchor'] == values[-5:].tolist()
+
+
+def test_unchanged_history_reuses_the_stored_model(store):
+    values = closes()
+    fit(store, values)
+
+    result = store.fit('AAPL', values, LOOK_BACK)
+
+    assert result['metrics']['mode'] == 'reused'
+    assert len(result['model'].fits) == 1
+    assert store.stats()['reused'] == 1
+
+
+def test_a_few_new_bars_finetune_on_their_windows_only(store):
+    values = closes(203)
+    fit(store, values[:200])
+
+    result = store.fit('AAPL', values, LOOK_BACK)
+
+    assert result['metrics']['mode'] == 'finetuned'
+    # The stored training run, then one window per new bar
+    assert result['model'].fits[1:] == [3]
+    meta = store.metadata('AAPL')
+    assert (meta['bars'], meta['finetunes']) == (203, 1)
+    assert meta['anchor'] == values[-5:].tolist()
+
+
+def test_a_sliding_history_still_finetunes(store):
+    values = closes(205)
+    fit(store, values[:200])
+
+    assert fit(store, values[5:]) == ('finetuned', None)
+    assert store.metadata('AAPL')['bars'] == 200
+
+
+def test_too_many_new_bars_retrain(store):
+    values = closes(230)
+    fit(store, values[:200])
+
+    assert fit(store, values) == ('retrained', '30 new bars')
+
+
+@pytest.mark.parametrize('change', ['params', 'look_back'])
+def test_a_changed_schema_retrains(tmp_path, store, change):
+    values = closes()
+    fit(store, values)
+
+    if change == 'params':
+        store = LSTMStore(str(tmp_path), lambda look_back: StubModel(), {**PARAMS, 'units': 64})
+        assert fit(store, values) == ('retrained', 'model schema changed')
+    else:
+        assert fit(store, values, look_back=20) == ('retrained', 'model schema changed')
+
+
+def test_training_options_are_not_part_of_the_schema(tmp_path, store):
+    values = closes()
+    fit(store, values)
+
+    store = LSTMStore(str(tmp_path), lambda look_back: StubModel(), {**PARAMS, 'epochs': 30})
+
+    assert fit(store, values) == ('reused', None)
+
+
+def test_revised_bars_retrain(store):
+    values = closes()
+    fit(store, values[:190])
+
+    revised = values.copy()
+    revised[185:190] += 0.5
+    assert fit(store, revised) == ('retrained', 'stored bars are no longer in the history')
+
+
+def test_prices_outside_the_trained_range_retrain(store):
+    values = closes()
+    fit(store, values)
+
+    mode, reason = fit(store, np.r_[values, 125.0, 126.0])
+
+    assert (mode, reason) == ('retrained', 'prices moved outside the trained range')
+
+
+def test_a_large_error_on_the_new_bars_retrains(store):
+    values = closes()
+    fit(store, values)
+
+    # Within the trained range, but nothing like the next-value guess
+    mode, reason = fit(store, np.r_[values, 100.5, 109.5, 100.5, 109.5])
+
+    assert mode == 'retrained' and reason.startswith('error on new bars')
@@ -0,0 +1,62 @@
+import threading
+
+import pandas as pd
+
+from stock_common.market_data import ReplayProvider
+
+
+def make_provider(root=None, **kwargs):
+    return ReplayProvider(root=root, anchor='2026-10-16', synthetic_bars=300, **kwargs)
+
+
+def test_synthetic_bars_replay_identically():
+    first = make_provider().history('AAPL', period='1mo')
+    second = make_provider().history('aapl', period='1mo')
+
+    pd.testing.assert_frame_equal(first, second)
+    assert first.index[-1] == pd.Timestamp('2026-10-16')
+
+
+def test_loaded_frames_are_bounded():
+    provider = make_provider(max_frames=3)
+    for symbol in ('A', 'B', 'C'):
+        provider.history(symbol)
+    provider.history('A')
+    provider.history('D')
+
+    assert list(provider._frames) == ['C', 'A', 'D']
+
+
+def test_concurrent_readers_share_the_bounded_frames():
+    provider = make_provider(max_frames=4)
+    symbols = [f'S{i}' for i in range(12)]
+    errors = []
+
+    def read(offset):
+        try:
+            for i in range(40):
+                symbol = symbols[(offset + i) % len(symbols)]
+                assert provider.history(symbol, period='5d')['Close'].iloc[-1] > 0
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=read, args=(i,)) for i in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert len(provider._frames) <= 4
+
+
+def test_recording_replaces_the_loaded_frame(tmp_path):
+    provider = make_provider(str(tmp_path))
+    synthetic = provider.history('AAPL', period='max')
+
+    recorded = synthetic.iloc[:10] * 2
+    assert provider.record('AAPL', recorded, info={'longName': 'Apple Inc.'}) == 10
+
+    replayed = provider.history('AAPL', period='max')
+    pd.testing.assert_frame_equal(replayed, recorded, check_freq=False, check_dtype=False)
+    assert provider.metadata('AAPL') == {'longName': 'Apple Inc.'}
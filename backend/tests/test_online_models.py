@@ -0,0 +1,115 @@
+import os
+
+import numpy as np
+import pytest
+
+from online_models import OnlineModelStore, OnlineRegressor
+
+LOOK_BACK = 10
+
+
+def closes(n=300, seed=0):
+    rng = np.random.default_rng(seed)
+    return 100 + np.cumsum(rng.normal(0, 1, n))
+
+
+def make_store(root, **kwargs):
+    return OnlineModelStore(str(root), lambda: OnlineRegressor(passes=2), {'learner': 'sgd'}, **kwargs)
+
+
+def saved_state(store, symbol):
+    return store._load(symbol)
+
+
+def test_new_bars_are_appended(tmp_path):
+    store = make_store(tmp_path)
+    values = closes()
+
+    assert store.update('AAPL', values[:250], LOOK_BACK)['metrics']['mode'] == 'initialized'
+    metrics = store.update('AAPL', values[:253], LOOK_BACK)['metrics']
+    assert (metrics['mode'], metrics['new_bars']) == ('updated', 3)
+    assert store.update('AAPL', values[:253], LOOK_BACK)['metrics']['mode'] == 'current'
+
+    state = saved_state(store, 'AAPL')
+    assert state['bars'] == 253 and state['updates'] == 1
+    assert state['anchor'] == values[248:253].tolist()
+
+
+def test_a_sliding_history_keeps_the_bar_count_of_the_closes(tmp_path):
+    store = make_store(tmp_path)
+    values = closes()
+
+    store.update('AAPL', values[:250], LOOK_BACK)
+    for end in (252, 255, 260):
+        # The history window drops old bars as new ones arrive
+        metrics = store.update('AAPL', values[end - 250:end], LOOK_BACK)['metrics']
+        assert metrics['mode'] == 'updated'
+        assert saved_state(store, 'AAPL')['bars'] == 250
+
+
+def test_a_revised_history_resets_the_model(tmp_path):
+    store = make_store(tmp_path)
+    values = closes()
+    store.update('AAPL', values[:250], LOOK_BACK)
+
+    # The last stored bars changed, so the anchor is not found
+    revised = np.r_[values[:245], values[245:251] * 1.05]
+    metrics = store.update('AAPL', revised, LOOK_BACK)['metrics']
+
+    assert (metrics['mode'], metrics['new_bars']) == ('initialized', 251)
+    assert saved_state(store, 'AAPL')['updates'] == 0
+
+
+def test_changed_parameters_reset_the_model(tmp_path):
+    values = closes()
+    make_store(tmp_path).update('AAPL', values[:250], LOOK_BACK)
+
+    other = OnlineModelStore(str(tmp_path), lambda: OnlineRegressor(passes=2), {'learner': 'pa'})
+    assert other.update('AAPL', values[:251], LOOK_BACK)['metrics']['mode'] == 'initialized'
+    assert make_store(tmp_path).update('AAPL', values[:251], 20)['metrics']['mode'] == 'initialized'
+
+
+def test_a_restarted_store_reloads_the_saved_state(tmp_path):
+    values = closes()
+    first = make_store(tmp_path)
+    first.update('AAPL', values[:250], LOOK_BACK)
+    assert os.listdir(tmp_path) == ['AAPL.pkl']
+
+    second = make_store(tmp_path)
+    assert second.update('AAPL', values[:250], LOOK_BACK)['metrics']['mode'] == 'current'
+    assert second.update('AAPL', values[:252], LOOK_BACK)['metrics']['new_bars'] == 2
+
+    # The first store notices the newer file instead of its own copy
+    assert first.update('AAPL', values[:252], LOOK_BACK)['metrics']['mode'] == 'current'
+
+
+def test_evicted_states_are_read_back_from_disk(tmp_path):
+    store = make_store(tmp_path, max_symbols=2)
+    values = closes()
+    for symbol in ('AAPL', 'MSFT', 'NVDA'):
+        store.update(symbol, values[:250], LOOK_BACK)
+
+    assert store.stats()['symbols'] == 2
+    assert store.update('AAPL', values[:250], LOOK_BACK)['metrics']['mode'] == 'current'
+
+
+def test_returned_models_do_not_change_with_later_updates(tmp_path):
+    store = make_store(tmp_path)
+    values = closes()
+    model = store.update('AAPL', values[:250], LOOK_BACK)['model']
+    coef = model.coef_.copy()
+
+    store.update('AAPL', values[:260], LOOK_BACK)
+
+    np.testing.assert_array_equal(model.coef_, coef)
+
+
+@pytest.mark.parametrize('learner', ['sgd', 'pa'])
+def test_regressor_learns_a_linear_target(learner):
+    rng = np.random.default_rng(0)
+    X = rng.random((300, 5))
+    y = X @ np.arange(5.0) + 1
+
+    model = OnlineRegressor(learner=learner, C=1.0, eta0=0.05, passes=20).fit(X, y)
+
+    assert model.score(X, y) > 0.95
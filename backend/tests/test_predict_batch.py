@@ -0,0 +1,91 @@
+import json
+
+import pandas as pd
+import pytest
+
+from conftest import make_bars
+
+
+@pytest.fixture
+def batch(app_module, provider):
+    """AAPL and MSFT bars, two weeks of SHORT bars, no stored predictions and no registered models"""
+    today = pd.Timestamp.now().normalize()
+    provider.bars['MSFT'] = make_bars(today - pd.Timedelta(days=400), today, seed=1)
+    provider.bars['SHORT'] = make_bars(today - pd.Timedelta(days=14), today, seed=2)
+    app_module.collections['stock_predictions'].delete_many({})
+    app_module.model_registry.invalidate()
+    return app_module.collections['stock_predictions']
+
+
+def post(client, headers, stream=True, **body):
+    url = '/api/predict/batch' + ('' if stream else '?stream=false')
+    return client.post(url, json=body, headers=headers)
+
+
+def test_streamed_batch_has_one_line_per_prediction_then_a_summary(client, auth_headers, batch):
+    response = post(client, auth_headers, symbols=['aapl', 'MSFT', 'AAPL'],
+                    model_types=['RandomForest', 'DecisionTree'])
+
+    assert response.status_code == 200 and response.mimetype == 'application/x-ndjson'
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    rows, summary = lines[:-1], lines[-1]
+
+    assert summary == {'done': True, 'predictions': 4, 'errors': 0}
+    assert sorted((row['requested_symbol'], row['model_type']) for row in rows) == [
+        ('AAPL', 'DecisionTree'), ('AAPL', 'RandomForest'), ('MSFT', 'DecisionTree'), ('MSFT', 'RandomForest'),
+    ]
+    assert all(row['predicted_price'] > 0 for row in rows)
+    assert batch.count_documents({}) == 4
+
+
+def test_batch_body_separates_predictions_and_errors(client, auth_headers, batch):
+    response = post(client, auth_headers, stream=False, symbols=['AAPL', 'MISSING', 'SHORT'],
+                    model_type='DecisionTree')
+
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['count'] == 1
+    assert [(row['requested_symbol'], row['model_type']) for row in body['predictions']] == [('AAPL', 'DecisionTree')]
+    errors = {row['symbol']: row['error'] for row in body['errors']}
+    assert set(errors) == {'MISSING', 'SHORT'}
+    assert errors['SHORT'] == 'Not enough historical data for prediction'
+    assert batch.count_documents({}) == 1
+
+
+def test_failing_symbols_are_streamed_and_counted(client, auth_headers, batch):
+    response = post(client, auth_headers, symbols=['MISSING', 'AAPL'], model_types=['DecisionTree'])
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+    assert lines[0]['symbol'] == 'MISSING' and 'error' in lines[0]
+    assert lines[1]['requested_symbol'] == 'AAPL' and 'error' not in lines[1]
+    assert lines[-1] == {'done': True, 'predictions': 1, 'errors': 1}
+
+
+def test_registered_models_are_reused(app_module, client, auth_headers, batch):
+    post(client, auth_headers, stream=False, symbols=['AAPL'], model_type='DecisionTree')
+    submitted = app_module.training_pool.stats()['submitted']
+
+    body = post(client, auth_headers, stream=False, symbols=['AAPL'], model_type='DecisionTree').get_json()
+
+    assert body['count'] == 1
+    assert app_module.training_pool.stats()['submitted'] == submitted
+
+
+@pytest.mark.parametrize('body,message', [
+    ({}, 'symbols is required'),
+    ({'symbols': ['AAPL'], 'model_types': ['Magic']}, 'Invalid model type(s): Magic'),
+])
+def test_invalid_batches_are_rejected(client, auth_headers, batch, body, message):
+    response = post(client, auth_headers, **body)
+
+    assert response.status_code == 400
+    assert response.get_json() == {'error': message}
+
+
+def test_batches_are_limited_in_size(app_module, client, auth_headers, batch, monkeypatch):
+    monkeypatch.setattr(app_module, 'PREDICTION_BATCH_MAX_SYMBOLS', 2)
+
+    response = post(client, auth_headers, symbols=['AAPL', 'MSFT', 'NVDA'])
+
+    assert response.status_code == 400
+    assert batch.count_documents({}) == 0
@@ -0,0 +1,169 @@
+import threading
+
+import pandas as pd
+import pytest
+
+from stock_common import stock_cache
+from stock_common.stock_cache import MetadataCache, OHLCVCache, SingleFlight, frame_nbytes
+
+
+def frame(rows=10):
+    return pd.DataFrame({'Close': [float(i) for i in range(rows)]})
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(stock_cache.time, 'monotonic', clock)
+    return clock
+
+
+def test_hit_returns_stored_frame_for_normalized_symbol():
+    cache = OHLCVCache()
+    data = frame()
+    cache.put('aapl ', '1y', data)
+    assert cache.get('AAPL', '1y') is data
+    assert cache.get('AAPL', '1mo') is None
+    assert cache.get('AAPL', '1y', interval='1h') is None
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['entries']) == (1, 2, 1)
+
+
+def test_entries_expire_after_period_ttl(clock):
+    cache = OHLCVCache()
+    cache.put('AAPL', '1d', frame())
+    cache.put('AAPL', '1y', frame())
+    clock.now += cache.ttl_for('1d')
+    assert cache.get('AAPL', '1d') is None
+    assert cache.get('AAPL', '1y') is not None
+    assert cache.stats()['expirations'] == 1
+    assert cache.ttl_for('1d') < cache.ttl_for('1y') < cache.ttl_for('max')
+
+
+def test_least_recently_used_entry_is_evicted_by_count():
+    cache = OHLCVCache(max_entries=2)
+    cache.put('A', '1y', frame())
+    cache.put('B', '1y', frame())
+    cache.get('A', '1y')
+    cache.put('C', '1y', frame())
+    assert cache.get('B', '1y') is None
+    assert cache.get('A', '1y') is not None and cache.get('C', '1y') is not None
+    assert cache.stats()['evictions'] == 1
+
+
+def test_size_budget_evicts_and_skips_oversized_frames():
+    size = frame_nbytes(frame())
+    cache = OHLCVCache(max_bytes=2 * size)
+    for symbol in ('A', 'B', 'C'):
+        cache.put(symbol, '1y', frame())
+    assert cache.stats()['entries'] == 2
+    assert cache.stats()['bytes'] <= 2 * size
+
+    cache.put('BIG', '1y', frame(10_000))
+    assert cache.get('BIG', '1y') is None
+    assert cache.stats()['entries'] == 2
+
+
+def test_invalidate_one_symbol():
+    cache = OHLCVCache()
+    cache.put('AAPL', '1y', frame())
+    cache.put('AAPL', '1mo', frame())
+    cache.put('MSFT', '1y', frame())
+    cache.invalidate('aapl')
+    assert cache.stats()['entries'] == 1
+    assert cache.get('MSFT', '1y') is not None
+
+
+def test_metadata_is_loaded_once_until_it_expires(clock):
+    cache = MetadataCache(ttl=60)
+    loads = []
+
+    def loader(symbol):
+        loads.append(symbol)
+        return {'longName': symbol}
+
+    assert cache.get_or_load('aapl', loader) == {'longName': 'AAPL'}
+    cache.get_or_load('AAPL', loader)
+    clock.now += 60
+    cache.get_or_load('AAPL', loader)
+    assert loads == ['AAPL', 'AAPL']
+
+
+def test_metadata_load_errors_are_not_cached():
+    cache = MetadataCache()
+
+    def failing(symbol):
+        raise RuntimeError('upstream down')
+
+    assert cache.get_or_load('AAPL', failing) == {}
+    assert cache.get_or_load('AAPL', lambda symbol: {'longName': 'Apple'}) == {'longName': 'Apple'}
+    assert cache.stats()['load_errors'] == 1
+
+
+def run_concurrently(flight, key, fn, callers):
+    """Start callers threads on flight.do(key, fn) while fn blocks; returns their outcomes"""
+    outcomes = [None] * callers
+
+    def call(i):
+        try:
+            outcomes[i] = flight.do(key, fn)
+        except Exception as e:
+            outcomes[i] = e
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(callers)]
+    for thread in threads:
+        thread.start()
+    return threads, outcomes
+
+
+def wait_for_waiters(flight, count):
+    while flight.stats()['coalesced'] < count:
+        threading.Event().wait(0.001)
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        release.wait(5)
+        return 'bars'
+
+    threads, outcomes = run_concurrently(flight, 'AAPL', fetch, 8)
+    wait_for_waiters(flight, 7)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert outcomes == ['bars'] * 8
+    assert len(calls) == 1
+    assert flight.stats() == {'in_flight': 0, 'executed': 1, 'coalesced': 7}
+
+
+def test_waiters_share_the_leaders_exception():
+    flight = SingleFlight()
+    release = threading.Event()
+
+    def fetch():
+        release.wait(5)
+        raise ValueError('no data')
+
+    threads, outcomes = run_concurrently(flight, 'AAPL', fetch, 3)
+    wait_for_waiters(flight, 2)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert all(isinstance(outcome, ValueError) for outcome in outcomes)
+    # A finished flight is forgotten, so the next call runs again
+    assert flight.do('AAPL', lambda: 'retried') == 'retried'
@@ -0,0 +1,114 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import symbol_resolver
+from symbol_resolver import SymbolResolver
+
+
+class Clock:
+    """Replaces symbol_resolver.datetime with a hand-moved now()"""
+
+    def __init__(self):
+        self.current = datetime(2026, 10, 16, 12, 0)
+
+    def now(self):
+        return self.current
+
+    def advance(self, **delta):
+        self.current += timedelta(**delta)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(symbol_resolver, 'datetime', clock)
+    return clock
+
+
+@pytest.fixture
+def collection():
+    mongomock = pytest.importorskip('mongomock')
+    return mongomock.MongoClient().db.symbol_resolution
+
+
+def make_resolver(collection=None):
+    return SymbolResolver(collection, negative_ttl=6 * 3600, empty_ttl=15 * 60)
+
+
+def test_variants_are_probed_in_order():
+    assert SymbolResolver.variants(' reliance ') == ['RELIANCE', 'RELIANCE.NS', 'RELIANCE.BO']
+    assert SymbolResolver.variants('TCS.NS') == ['TCS.NS']
+
+
+def test_the_resolved_variant_goes_first(clock):
+    resolver = make_resolver()
+    resolver.record_hit('reliance', 'RELIANCE.NS')
+
+    assert resolver.candidates('RELIANCE') == ['RELIANCE.NS', 'RELIANCE', 'RELIANCE.BO']
+
+    clock.advance(days=8)
+    # Past the positive TTL the usual probing order applies again
+    assert resolver.candidates('RELIANCE') == ['RELIANCE', 'RELIANCE.NS', 'RELIANCE.BO']
+
+
+def test_an_empty_response_is_skipped_only_briefly(clock):
+    resolver = make_resolver()
+    for variant in SymbolResolver.variants('NOPE'):
+        resolver.record_miss('NOPE', variant)
+
+    assert resolver.candidates('NOPE') == []
+    clock.advance(minutes=16)
+    assert resolver.candidates('NOPE') == ['NOPE', 'NOPE.NS', 'NOPE.BO']
+
+
+def test_misses_become_definitive_once_another_variant_works(clock):
+    resolver = make_resolver()
+    resolver.record_miss('RELIANCE', 'RELIANCE')
+    resolver.record_hit('RELIANCE', 'RELIANCE.NS')
+    # A later miss while the symbol resolves elsewhere is definitive as well
+    resolver.record_miss('RELIANCE', 'RELIANCE.BO')
+
+    clock.advance(hours=5)
+    assert resolver.candidates('RELIANCE') == ['RELIANCE.NS']
+    clock.advance(hours=2)
+    assert resolver.candidates('RELIANCE') == ['RELIANCE.NS', 'RELIANCE', 'RELIANCE.BO']
+
+
+def test_a_miss_of_the_resolved_variant_forgets_it(clock):
+    resolver = make_resolver()
+    resolver.record_hit('RELIANCE', 'RELIANCE.NS')
+    resolver.record_miss('RELIANCE', 'RELIANCE.NS')
+
+    assert resolver.candidates('RELIANCE') == ['RELIANCE', 'RELIANCE.BO']
+    clock.advance(minutes=16)
+    assert resolver.candidates('RELIANCE') == ['RELIANCE', 'RELIANCE.NS', 'RELIANCE.BO']
+
+
+def test_expired_misses_are_pruned_on_lookup(clock):
+    resolver = make_resolver()
+    for symbol in ('AAA', 'BBB', 'CCC'):
+        resolver.record_miss(symbol, symbol)
+    assert resolver.stats()['negative_entries'] == 3
+
+    clock.advance(minutes=16)
+    resolver.candidates('AAA')
+    assert resolver.stats()['negative_entries'] == 2
+
+
+def test_the_index_survives_a_restart(clock, collection):
+    resolver = make_resolver(collection)
+    resolver.record_miss('RELIANCE', 'RELIANCE')
+    resolver.record_hit('RELIANCE', 'RELIANCE.NS')
+    resolver.record_miss('TATA', 'TATA')
+
+    restarted = make_resolver(collection)
+    assert restarted.candidates('RELIANCE') == ['RELIANCE.NS', 'RELIANCE.BO']
+    assert restarted.candidates('TATA') == ['TATA.NS', 'TATA.BO']
+
+    # Expired misses are not read back
+    clock.advance(hours=1)
+    restarted = make_resolver(collection)
+    assert restarted.candidates('TATA') == ['TATA', 'TATA.NS', 'TATA.BO']
+    assert restarted.candidates('RELIANCE') == ['RELIANCE.NS', 'RELIANCE.BO']
+    assert restarted.stats()['negative_entries'] == 1
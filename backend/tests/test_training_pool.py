@@ -0,0 +1,126 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from training import SharedArrays, TrainingPool, TrainingQueueFull
+
+
+def shared_sum(model_type, specs, delay=0.0):
+    """Process task: sum the shared series after an optional delay"""
+    arrays, handles = SharedArrays.attach(specs)
+    try:
+        time.sleep(delay)
+        return float(arrays['series'].sum())
+    finally:
+        for handle in handles:
+            handle.close()
+
+
+def local_sum(model_type, arrays, delay=0.0):
+    time.sleep(delay)
+    return float(arrays['series'].sum())
+
+
+def is_unlinked(block):
+    try:
+        SharedArrays._open(block).close()
+    except FileNotFoundError:
+        return True
+    return False
+
+
+@pytest.fixture
+def pool():
+    pool = TrainingPool(max_workers=1, cores=1, max_queue=8, queue_timeout=1.0)
+    yield pool
+    pool.shutdown()
+
+
+@pytest.fixture
+def shared():
+    arrays = {'series': np.arange(100.0)}
+    shared = SharedArrays(arrays)
+    yield shared, arrays
+    shared.close()
+
+
+def test_process_and_thread_tasks_return_their_results(pool, shared):
+    shared, arrays = shared
+
+    assert pool.run('DecisionTree', shared_sum, (shared.specs,), (arrays,)) == 4950.0
+    assert pool.run('LSTM', local_sum, (shared.specs,), (arrays,)) == 4950.0
+    assert pool.stats()['submitted'] == 2
+
+
+def test_closed_shared_arrays_are_unlinked(shared):
+    shared, _ = shared
+    block = shared.specs['series'][0]
+    assert not is_unlinked(block)
+
+    shared.close()
+
+    assert is_unlinked(block)
+    with pytest.raises(FileNotFoundError):
+        SharedArrays.attach(shared.specs)
+
+
+def test_a_task_over_its_budget_is_reported_as_timed_out(pool, shared):
+    shared, arrays = shared
+    futures = {
+        pool.submit('DecisionTree', shared_sum, (shared.specs, 1.0), (arrays,)): 'slow',
+        pool.submit('LSTM', local_sum, (shared.specs,), (arrays,)): 'fast',
+    }
+
+    started = time.monotonic()
+    results = {name: (result, error) for name, result, error in pool.as_completed(futures, {'slow': 0.2})}
+
+    assert time.monotonic() - started < 0.9
+    assert results['fast'] == (4950.0, None)
+    assert results['slow'][0] is None and isinstance(results['slow'][1], TimeoutError)
+    assert pool.stats()['timeouts'] == 1
+
+    # The task keeps running in the background until cancel() waits for it
+    block = shared.specs['series'][0]
+    pool.cancel(futures)
+    assert all(future.done() for future in futures)
+    shared.close()
+    assert is_unlinked(block)
+
+
+def test_cancel_drops_queued_tasks_and_waits_for_running_ones(pool, shared):
+    shared, arrays = shared
+    futures = [pool.submit('DecisionTree', shared_sum, (shared.specs, 0.3), (arrays,)) for _ in range(5)]
+    running = futures[0]
+    while not running.running():
+        time.sleep(0.01)
+
+    pool.cancel(futures)
+    block = shared.specs['series'][0]
+    shared.close()
+
+    assert all(future.done() for future in futures)
+    assert running.result() == 4950.0
+    # One worker runs a task and the pool hands over at most one more
+    assert sum(future.cancelled() for future in futures) >= 3
+    assert is_unlinked(block)
+
+
+def test_a_full_queue_rejects_new_tasks(shared):
+    shared, arrays = shared
+    pool = TrainingPool(max_threads=1, cores=1, max_queue=1, queue_timeout=0.05)
+    release = threading.Event()
+    try:
+        blocked = [pool.submit('LSTM', lambda model_type: release.wait(5), (), ()) for _ in range(2)]
+        with pytest.raises(TrainingQueueFull):
+            pool.submit('LSTM', local_sum, (), (arrays,))
+        assert pool.stats()['rejected'] == 1
+
+        release.set()
+        pool.cancel(blocked)
+        # Finished tasks free their slots
+        assert pool.run('LSTM', local_sum, (), (arrays,)) == 4950.0
+    finally:
+        release.set()
+        pool.shutdown()
@@ -0,0 +1,91 @@
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.linear_model import LinearRegression
+from sklearn.tree import DecisionTreeRegressor
+
+from stock_common.tree_export import FlatForest, TreeModelStore, flatten_model
+
+
+def training_data(n_outputs=1, seed=0):
+    rng = np.random.default_rng(seed)
+    X = rng.random((300, 12))
+    y = X @ rng.random((12, n_outputs)) + rng.normal(0, 0.05, (300, n_outputs))
+    return X, (y[:, 0] if n_outputs == 1 else y)
+
+
+MODELS = [
+    DecisionTreeRegressor(random_state=0),
+    DecisionTreeRegressor(max_depth=4, random_state=0),
+    RandomForestRegressor(n_estimators=20, random_state=0),
+]
+
+
+@pytest.mark.parametrize('model', MODELS, ids=lambda m: f'{type(m).__name__}-{m.max_depth}')
+@pytest.mark.parametrize('n_outputs', [1, 5])
+def test_predictions_match_scikit_learn(model, n_outputs):
+    X, y = training_data(n_outputs)
+    model.fit(X, y)
+    X_new = np.random.default_rng(1).random((50, 12))
+
+    flat = FlatForest.from_sklearn(model)
+
+    assert flat.n_outputs == n_outputs
+    np.testing.assert_allclose(flat.predict(X_new), model.predict(X_new), rtol=1e-12, atol=0)
+
+
+@pytest.mark.parametrize('mmap', [True, False])
+def test_saved_forest_loads_with_the_same_predictions(tmp_path, mmap):
+    X, y = training_data(3)
+    model = RandomForestRegressor(n_estimators=10, random_state=0).fit(X, y)
+    path = str(tmp_path / 'model.flat')
+
+    FlatForest.from_sklearn(model).save(path)
+    loaded = FlatForest.load(path, mmap=mmap)
+
+    assert (loaded.n_trees, loaded.n_outputs) == (10, 3)
+    np.testing.assert_allclose(loaded.predict(X), model.predict(X), rtol=1e-12, atol=0)
+
+
+def test_rejects_foreign_files_and_wrong_widths(tmp_path):
+    path = tmp_path / 'model.flat'
+    path.write_bytes(b'not a model' * 10)
+    with pytest.raises(ValueError):
+        FlatForest.load(str(path))
+
+    X, y = training_data()
+    flat = FlatForest.from_sklearn(DecisionTreeRegressor(random_state=0).fit(X, y))
+    with pytest.raises(ValueError):
+        flat.predict(X[:, :5])
+
+
+def test_only_tree_models_are_flattened():
+    X, y = training_data()
+    linear = LinearRegression().fit(X, y)
+    assert flatten_model(linear) is linear
+    assert isinstance(flatten_model(DecisionTreeRegressor().fit(X, y)), FlatForest)
+
+
+def test_store_keeps_only_the_newest_bar_date(tmp_path):
+    from sklearn.preprocessing import MinMaxScaler
+
+    X, y = training_data()
+    model = RandomForestRegressor(n_estimators=5, random_state=0).fit(X, y)
+    fit = {
+        'model': FlatForest.from_sklearn(model),
+        'scaler': MinMaxScaler().fit(np.array([[10.0], [20.0]])),
+        'look_back': 12,
+        'model_type': 'RandomForest',
+        'metrics': {'confidence': 0.9},
+    }
+    store = TreeModelStore(str(tmp_path))
+
+    store.save(('AAPL', 'RandomForest', 12, '2026-01-01'), dict(fit))
+    saved = store.save(('AAPL', 'RandomForest', 12, '2026-01-02'), dict(fit))
+
+    assert store.load(('AAPL', 'RandomForest', 12, '2026-01-01')) is None
+    loaded = store.load(('AAPL', 'RandomForest', 12, '2026-01-02'))
+    assert loaded['metrics'] == {'confidence': 0.9}
+    assert loaded['scaler'].data_max_[0] == 20.0
+    np.testing.assert_allclose(loaded['model'].predict(X), saved['model'].predict(X))
+    np.testing.assert_allclose(loaded['model'].predict(X), model.predict(X), rtol=1e-12, atol=0)
@@ -0,0 +1,439 @@
+# ============================================
+# MODEL TRAINING WORKERS
+# Model construction and parallel candidate training
+# ============================================
+#
+# This module must not import app: its functions run in worker processes.
+# Training arrays are placed in shared memory once and every worker maps
+# the same pages instead of receiving a pickled copy.
+#
+# Worker processes start from a forkserver (spawn where it is missing), not
+# by forking the multi-threaded web process: OpenMP, BLAS and TensorFlow
+# thread pools deadlock in forked children. TensorFlow models train on a
+# thread of the request process; the scikit-learn ones in the process pool.
+#
+# scikit-learn and TensorFlow are imported when a model is first built.
+#
+# Every task gets a fixed share of the pool's core budget: RandomForest
+# n_jobs, the BLAS/OpenMP pools of worker processes and TensorFlow's
+# intra-op threads are all capped to it, so training never spreads over
+# the cores the request threads need. The BLAS/OpenMP caps are applied in
+# the workers only, never to the web process.
+
+import os
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_all_start_methods, get_context, resource_tracker, shared_memory
+
+import numpy as np
+
+from stock_common.datasets import make_windows
+from stock_common.tree_export import flatten_model
+
+# Hyperparameters per model type (part of the model registry key)
+MODEL_HYPERPARAMS = {
+    'RandomForest': {'n_estimators': 100, 'random_state': 42},
+    'SVM': {'kernel': 'rbf', 'C': 1e3, 'gamma': 0.1},
+    'DecisionTree': {'random_state': 42},
+    'LSTM': {'units': 50, 'dropout': 0.2, 'dense': 25, 'epochs': 15, 'batch_size': 32},
+    # Incremental linear model (online_models.OnlineRegressor); a constant
+    # step keeps it tracking recent bars
+    'Online': {'learner': 'sgd', 'eta0': 0.01, 'alpha': 1e-5, 'passes': 5},
+}
+
+# Model types trained in the process pool; the rest train on a thread
+PROCESS_MODEL_TYPES = ('RandomForest', 'SVM', 'DecisionTree')
+
+# Model types that fit several outputs natively, so one model can predict
+# a whole multi-day path directly
+DIRECT_MODEL_TYPES = ('RandomForest', 'DecisionTree')
+
+# Leading share of the windows used for training; the rest is the test set
+TRAIN_FRACTION = 0.8
+
+# Modules the forkserver imports before forking workers; '__main__' makes
+# workers inherit the entry script instead of each re-running it
+FORKSERVER_PRELOAD = ['__main__', 'training', 'backtest']
+
+# Threads one training task may use; set per process by TrainingPool
+TASK_THREADS = 1
+_tensorflow_configured = False
+
+
+class TrainingQueueFull(Exception):
+    """Raised when the training pool has no free slot within its queue timeout"""
+
+
+def set_task_threads(threads):
+    """Threads one training task in this process may use (RandomForest n_jobs, TensorFlow)"""
+    global TASK_THREADS
+    TASK_THREADS = max(1, int(threads))
+
+
+def init_worker(threads):
+    """Process pool initializer: set_task_threads() and cap the worker's BLAS/OpenMP pools"""
+    set_task_threads(threads)
+    for var in ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS'):
+        os.environ[var] = str(TASK_THREADS)
+    try:
+        from threadpoolctl import threadpool_limits
+        threadpool_limits(limits=TASK_THREADS)
+    except ImportError:
+        pass
+
+
+def configure_tensorflow():
+    """Limit TensorFlow to TASK_THREADS intra-op threads before it first runs"""
+    global _tensorflow_configured
+    if _tensorflow_configured:
+        return
+    _tensorflow_configured = True
+    import tensorflow as tf
+    try:
+        tf.config.threading.set_intra_op_parallelism_threads(TASK_THREADS)
+        tf.config.threading.set_inter_op_parallelism_threads(1)
+    except RuntimeError:
+        pass  # TensorFlow was already initialised by someone else
+
+
+def create_model(model_type, look_back=60):
+    """Untrained model of the given type, configured from MODEL_HYPERPARAMS"""
+    params = MODEL_HYPERPARAMS[model_type]
+    if model_type == 'SVM':
+        from sklearn.svm import SVR
+        return SVR(**params)
+    if model_type == 'DecisionTree':
+        from sklearn.tree import DecisionTreeRegressor
+        return DecisionTreeRegressor(**params)
+    if model_type == 'Online':
+        from online_models import OnlineRegressor
+        return OnlineRegressor(**params)
+    if model_type == 'LSTM':
+        configure_tensorflow()
+        from tensorflow.keras.models import Sequential
+        from tensorflow.keras.layers import LSTM, Dense, Dropout
+
+        model = Sequential([
+            LSTM(params['units'], return_sequences=True, input_shape=(look_back, 1)),
+            Dropout(params['dropout']),
+            LSTM(params['units'], return_sequences=False),
+            Dropout(params['dropout']),
+            Dense(params['dense']),
+            Dense(1)
+        ])
+        model.compile(optimizer='adam', loss='mean_squared_error')
+        return model
+    from sklearn.ensemble import RandomForestRegressor
+    return RandomForestRegressor(n_jobs=TASK_THREADS, **params)
+
+
+def fit_and_predict(model_type, X_train, y_train, X_test, look_back):
+    """Train one candidate and return its predictions for X_test"""
+    model = create_model(model_type, look_back)
+    if model_type == 'LSTM':
+        params = MODEL_HYPERPARAMS['LSTM']
+        model.fit(X_train.reshape((-1, look_back, 1)), y_train,
+                  epochs=params['epochs'], batch_size=params['batch_size'], verbose=0)
+        return model.predict(X_test.reshape((-1, look_back, 1)), verbose=0).flatten()
+    model.fit(X_train, y_train)
+    return np.asarray(model.predict(X_test), dtype=np.float64)
+
+
+def split_windows(scaled, look_back, horizon=1):
+    """
+    Chronological train/test split of the look_back windows of a scaled
+    series; with a horizon > 1 each target is the next `horizon` values
+    """
+    X, y = make_windows(scaled, look_back, horizon=horizon)
+    split = int(TRAIN_FRACTION * len(X))
+    return X[:split], y[:split], X[split:], y[split:]
+
+
+def fit_candidate(model_type, scaled, look_back, horizon=1):
+    """
+    Fit a scikit-learn next-close model on a min-max scaled close series, or
+    with a horizon > 1 a direct multi-output model of the next `horizon`
+    closes (DIRECT_MODEL_TYPES only). LSTMs are trained by lstm_store.
+    Returns (model, confidence in [0, 1]).
+    """
+    if horizon > 1 and model_type not in DIRECT_MODEL_TYPES:
+        raise ValueError(f"{model_type} does not support multi-output forecasts")
+    X_train, y_train, X_test, y_test = split_windows(scaled, look_back, horizon)
+
+    model = create_model(model_type)
+    model.fit(X_train, y_train)
+
+    train_score = model.score(X_train, y_train)
+    test_score = model.score(X_test, y_test) if len(X_test) > 0 else train_score
+    return model, max(0, min(1, (train_score + test_score) / 2))
+
+
+def fit_series(model_type, series, look_back, horizon=1):
+    """
+    fit_candidate for one row of a padded matrix of scaled closes.
+    `series` is (matrix, row, length), or (SharedArrays specs, row, length)
+    when called in a worker process; the matrix is the 'series' array.
+    Tree models come back flattened (tree_export.FlatForest), which is a
+    fraction of the size to send back and keep, and predicts faster.
+    """
+    source, row, length = series
+    handles = []
+    if isinstance(source, SharedArrays.Specs):
+        arrays, handles = SharedArrays.attach(source)
+        source = arrays.pop('series')
+    try:
+        model, confidence = fit_candidate(model_type, source[row, :length], look_back, horizon)
+    finally:
+        # Drop the views onto shared memory before unmapping it
+        del source
+        for shm in handles:
+            shm.close()
+    return {'model': flatten_model(model), 'model_type': model_type, 'metrics': {'confidence': confidence}}
+
+
+def regression_metrics(y_true, y_pred):
+    from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+
+    return {
+        'mae': float(mean_absolute_error(y_true, y_pred)),
+        'rmse': float(np.sqrt(mean_squared_error(y_true, y_pred))),
+        'r2': float(r2_score(y_true, y_pred)),
+    }
+
+
+class SharedArrays:
+    """
+    Copies named numpy arrays into POSIX shared memory once.
+    Workers attach to the blocks by name; the creator unlinks them on close.
+    """
+
+    class Specs(dict):
+        """name -> (shared memory block name, shape, dtype string)"""
+
+    def __init__(self, arrays):
+        self._blocks = []
+        self.specs = SharedArrays.Specs()
+        try:
+            for name, array in arrays.items():
+                array = np.asarray(array)
+                shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+                self._blocks.append(shm)
+                np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)[...] = array
+                self.specs[name] = (shm.name, array.shape, array.dtype.str)
+        except Exception:
+            self.close()
+            raise
+
+    @staticmethod
+    def _open(block):
+        """Attach to an existing block without registering it with the resource tracker"""
+        if sys.version_info >= (3, 13):
+            return shared_memory.SharedMemory(name=block, track=False)
+        # Older versions register every attached block as if this process
+        # owned it. Unregistering afterwards is not an option: pool workers
+        # share the creator's tracker, which would then lose the creator's
+        # own registration
+        register = resource_tracker.register
+        resource_tracker.register = lambda name, rtype: None
+        try:
+            return shared_memory.SharedMemory(name=block)
+        finally:
+            resource_tracker.register = register
+
+    @staticmethod
+    def attach(specs):
+        """
+        Map the blocks described by specs; returns (arrays, handles to close).
+        Only the creator unlinks the blocks or has them cleaned up on exit.
+        """
+        arrays, handles = {}, []
+        for name, (block, shape, dtype) in specs.items():
+            shm = SharedArrays._open(block)
+            handles.append(shm)
+            arrays[name] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+        return arrays, handles
+
+    def close(self):
+        for shm in self._blocks:
+            shm.close()
+            try:
+                shm.unlink()
+            except FileNotFoundError:
+                pass
+        self._blocks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class TrainingPool:
+    """
+    Bounded pools for model training: worker processes for scikit-learn
+    models and threads for TensorFlow models. Both are created on first use.
+
+    `cores` is the CPU budget for training (default: all but one core);
+    each task may use cores // max_workers threads. At most max_queue tasks
+    of each kind wait for a worker; submit() blocks up to queue_timeout
+    seconds for a free slot and then raises TrainingQueueFull, so callers
+    can shed load instead of piling up work.
+    """
+
+    def __init__(self, max_workers=None, max_threads=1, cores=None, max_queue=32, queue_timeout=10.0):
+        self.cores = cores or max(1, (os.cpu_count() or 1) - 1)
+        self.max_workers = max_workers or min(4, self.cores)
+        self.max_threads = max_threads
+        self.task_threads = max(1, self.cores // self.max_workers)
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._processes = None
+        self._threads = None
+        self._lock = threading.Lock()
+        self._slots = {
+            'process': threading.BoundedSemaphore(self.max_workers + max_queue),
+            'thread': threading.BoundedSemaphore(self.max_threads + max_queue),
+        }
+        self._in_flight = {'process': 0, 'thread': 0}
+
+        # Thread tasks (TensorFlow) run in this process; its BLAS/OpenMP
+        # pools are left alone, they serve the request threads too
+        set_task_threads(self.task_threads)
+
+        self.submitted = 0
+        self.rejected = 0
+        self.timeouts = 0
+
+    def _process_pool(self):
+        with self._lock:
+            if self._processes is None:
+                # Workers fork from a single-threaded server process that has
+                # imported the training modules once, so start-up stays cheap
+                if 'forkserver' in get_all_start_methods():
+                    context = get_context('forkserver')
+                    context.set_forkserver_preload(FORKSERVER_PRELOAD)
+                else:
+                    context = get_context('spawn')
+                self._processes = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=context,
+                    initializer=init_worker,
+                    initargs=(self.task_threads,)
+                )
+            return self._processes
+
+    def _thread_pool(self):
+        with self._lock:
+            if self._threads is None:
+                self._threads = ThreadPoolExecutor(max_workers=self.max_threads, thread_name_prefix='training')
+            return self._threads
+
+    def submit(self, model_type, fn, shared_args, local_args):
+        """
+        Run fn for a model type: in a worker process with shared_args
+        (picklable, e.g. SharedArrays specs) for scikit-learn models, or on a
+        thread with local_args otherwise. Raises TrainingQueueFull when no
+        slot frees up within queue_timeout.
+        """
+        kind = 'process' if model_type in PROCESS_MODEL_TYPES else 'thread'
+        slots = self._slots[kind]
+        if not slots.acquire(timeout=self.queue_timeout):
+            with self._lock:
+                self.rejected += 1
+            raise TrainingQueueFull('Model training is at capacity, try again in a moment')
+        try:
+            if kind == 'process':
+                try:
+                    future = self._process_pool().submit(fn, model_type, *shared_args)
+                except BrokenProcessPool:
+                    # A worker died (e.g. killed for memory); start a fresh pool
+                    with self._lock:
+                        self._processes = None
+                    future = self._process_pool().submit(fn, model_type, *shared_args)
+            else:
+                future = self._thread_pool().submit(fn, model_type, *local_args)
+        except Exception:
+            slots.release()
+            raise
+        with self._lock:
+            self.submitted += 1
+            self._in_flight[kind] += 1
+        future.add_done_callback(lambda _: self._release(kind))
+        return future
+
+    def _release(self, kind):
+        with self._lock:
+            self._in_flight[kind] -= 1
+        self._slots[kind].release()
+
+    def run(self, model_type, fn, shared_args, local_args):
+        """submit() and wait for the result"""
+        return self.submit(model_type, fn, shared_args, local_args).result()
+
+    def cancel(self, futures):
+        """
+        Cancel the futures that have not started and wait for the others, so
+        the shared memory they read can be released afterwards
+        """
+        wait([future for future in futures if not future.cancel()])
+
+    def as_completed(self, futures, timeouts=None):
+        """
+        Yield (name, result, error) for {future: name} as each one finishes.
+        timeouts maps a name to its budget in seconds (None means no limit).
+        A future still running when its budget runs out is reported with a
+        TimeoutError and cancelled if it has not started yet; one that has
+        started runs to completion in the background and its result is dropped.
+        """
+        timeouts = timeouts or {}
+        started = time.monotonic()
+        pending = dict(futures)
+        deadlines = {
+            future: started + timeouts[name]
+            for future, name in pending.items() if timeouts.get(name)
+        }
+        while pending:
+            now = time.monotonic()
+            for future in [f for f in pending if deadlines.get(f, now + 1) <= now]:
+                name = pending.pop(future)
+                future.cancel()
+                with self._lock:
+                    self.timeouts += 1
+                yield name, None, TimeoutError(f"{name} did not finish within {timeouts[name]}s")
+            if not pending:
+                return
+            next_deadline = min((deadlines[f] for f in pending if f in deadlines), default=None)
+            remaining = None if next_deadline is None else max(0.0, next_deadline - now)
+            done, _ = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = pending.pop(future)
+                try:
+                    yield name, future.result(), None
+                except Exception as e:
+                    yield name, None, e
+
+    def shutdown(self):
+        with self._lock:
+            for pool in (self._processes, self._threads):
+                if pool is not None:
+                    pool.shutdown(wait=False, cancel_futures=True)
+            self._processes = self._threads = None
+
+    def stats(self):
+        with self._lock:
+            return {
+                'cores': self.cores,
+                'max_workers': self.max_workers,
+                'max_threads': self.max_threads,
+                'threads_per_task': self.task_threads,
+                'max_queue': self.max_queue,
+                'process_tasks': self._in_flight['process'],
+                'thread_tasks': self._in_flight['thread'],
+                'submitted': self.submitted,
+                'rejected': self.rejected,
+                'timeouts': self.timeouts,
+            }
@@ -1,20 +1,30 @@
+import math
+import os
+import sys
+
+# Modules shared by both backends live in ../stock_common
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stock_common.startup import LazyModule, module_available, mark_ready, startup_report
 from flask import Flask, request, jsonify
 from flask_cors import CORS
-import yfinance as yf
 import numpy as np
-import pandas as pd
-from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import MinMaxScaler
-from sklearn.svm import SVR
-from sklearn.tree import DecisionTreeRegressor
-from sklearn.ensemble import RandomForestRegressor
-from tensorflow.keras.models import Sequential
-from tensorflow.keras.layers import LSTM, Dense, Dropout
 import requests
 from datetime import datetime, timedelta
-import time
 import concurrent.futures
 from stock_symbols import STOCK_SYMBOLS, get_all_symbols, get_symbols_by_sector, search_stocks, get_all_sectors
+from stock_common.stock_cache import OHLCVCache, MetadataCache, SingleFlight
+from rate_limiter import TokenBucket, RateLimitTimeout
+from stock_common.local_bars import LocalBarStore
+from stock_common.market_data import create_provider
+from stock_common.model_registry import ModelRegistry
+from market_snapshots import SnapshotStore
+from stock_common.lstm_store import LSTMStore
+from stock_common.tree_export import flatten_model
+
+# pandas, scikit-learn and TensorFlow load on first use, not at startup
+pd = LazyModule("pandas")
+LSTM_AVAILABLE = module_available("tensorflow")
 
 app = Flask(__name__)
 CORS(app)
@@ -24,53 +34,244 @@ MONGODB_URI = "mongodb://localhost:27017/stockDB"
 
 # Rate limiting settings for Yahoo Finance
 MAX_CONCURRENT_REQUESTS = 5
-REQUEST_DELAY = 0.5  # seconds between requests
+REQUEST_DELAY = 0.5  # average seconds between upstream requests
+UPSTREAM_BURST = MAX_CONCURRENT_REQUESTS
+UPSTREAM_ACQUIRE_TIMEOUT = 30  # seconds a request may queue for a token
+# Set to a file path to share one bucket between all worker processes on the host
+RATE_LIMIT_STORE = os.getenv("RATE_LIMIT_STORE")
+
+# Every upstream call draws from this process-wide (or host-wide) bucket
+upstream_limiter = TokenBucket(
+    rate=1 / REQUEST_DELAY,
+    burst=UPSTREAM_BURST,
+    store_path=RATE_LIMIT_STORE,
+    name="yahoo"
+)
+
+# Market data backend: "yahoo" (live, rate limited) or "replay" (recorded or
+# synthetic files on disk with optional latency, for reproducible load tests)
+MARKET_DATA_PROVIDER = os.getenv("MARKET_DATA_PROVIDER", "yahoo")
+market_data = create_provider(
+    MARKET_DATA_PROVIDER,
+    throttle=lambda: upstream_limiter.acquire(timeout=UPSTREAM_ACQUIRE_TIMEOUT),
+    replay_dir=os.getenv("MARKET_DATA_REPLAY_DIR", ""),
+    replay_latency=float(os.getenv("MARKET_DATA_REPLAY_LATENCY_MS", "0")) / 1000,
+    replay_jitter=float(os.getenv("MARKET_DATA_REPLAY_JITTER_MS", "0")) / 1000,
+    replay_synthetic=os.getenv("MARKET_DATA_REPLAY_SYNTHETIC", "true").lower() in ("1", "true", "yes")
+)
+
+# In-process history cache shared by all endpoints
+OHLCV_CACHE_MAX_ENTRIES = 512
+OHLCV_CACHE_MAX_BYTES = 64 * 1024 * 1024
+ohlcv_cache = OHLCVCache(max_entries=OHLCV_CACHE_MAX_ENTRIES, max_bytes=OHLCV_CACHE_MAX_BYTES)
+
+# Concurrent identical upstream fetches wait on one in-flight call and share its result
+history_flight = SingleFlight()
+
+# Company info barely changes within a day, so it is loaded lazily and kept for 24h
+METADATA_TTL = 24 * 3600
+metadata_cache = MetadataCache(ttl=METADATA_TTL)
+
+# Optional directory of memory-mapped per-symbol bar files (see stock_common/local_bars.py)
+LOCAL_BAR_STORE_DIR = os.getenv("LOCAL_BAR_STORE_DIR", "")
+# Serve daily bars only from the local bar store, never from Yahoo Finance
+MARKET_DATA_OFFLINE = os.getenv("MARKET_DATA_OFFLINE", "false").lower() in ("1", "true", "yes")
+bar_store = LocalBarStore(LOCAL_BAR_STORE_DIR) if LOCAL_BAR_STORE_DIR else None
 
-def fetch_stock_data_safe(symbol, period="1y"):
-    """Safely fetch stock data with error handling"""
+# Hyperparameters per model type (part of the model registry key)
+MODEL_HYPERPARAMS = {
+    "SVM": {"kernel": "rbf", "C": 1e3, "gamma": 0.1},
+    "DecisionTree": {"random_state": 42},
+    "RandomForest": {"n_estimators": 100, "random_state": 42},
+    "LSTM": {"units": 50, "dropout": 0.2, "dense": 25, "epochs": 25, "batch_size": 32},
+}
+
+# Fitted models are reused until a newer bar arrives for the symbol
+MODEL_REGISTRY_MAX_MODELS = 64
+MODEL_REGISTRY_MAX_BYTES = 512 * 1024 * 1024
+model_registry = ModelRegistry(max_entries=MODEL_REGISTRY_MAX_MODELS, max_bytes=MODEL_REGISTRY_MAX_BYTES)
+
+def read_local_history(symbol, period, interval="1d"):
+    """
+    History from the local bar store, or None.
+    Online, a bar file is only used while it is up to date; offline it is the only source.
+    """
+    if bar_store is None or interval != "1d":
+        return None
+    bars = bar_store.read(symbol)
+    if bars is None or bars.size == 0:
+        return None
+    if MARKET_DATA_OFFLINE or bar_store.is_fresh(bars):
+        return bars.tail(period).to_frame()
+    return None
+
+def fetch_history(symbol, period="1y", interval="1d"):
+    """
+    Return price history for a symbol, served from the OHLCV cache when fresh.
+    Concurrent misses for the same key are coalesced into one fetch.
+    """
+    hist = ohlcv_cache.get(symbol, period, interval)
+    if hist is not None:
+        return hist
+    
+    def load():
+        hist = read_local_history(symbol, period, interval)
+        if hist is None and MARKET_DATA_OFFLINE:
+            hist = pd.DataFrame()
+        elif hist is None:
+            hist = market_data.history(symbol, period=period, interval=interval)
+        ohlcv_cache.put(symbol, period, hist, interval=interval)
+        return hist
+    
+    return history_flight.do((symbol.upper(), period, interval), load)
+
+def fetch_histories(symbols, period="1y", interval="1d"):
+    """
+    Return {symbol: history} for many symbols.
+    Cached frames are reused; all cache misses are requested together in one
+    batch call to the market data provider (a single yf.download for Yahoo,
+    which takes one token from the upstream limiter).
+    """
+    histories = {}
+    missing = []
+    for symbol in symbols:
+        hist = ohlcv_cache.get(symbol, period, interval)
+        if hist is None:
+            hist = read_local_history(symbol, period, interval)
+            if hist is not None:
+                ohlcv_cache.put(symbol, period, hist, interval=interval)
+        if hist is None:
+            missing.append(symbol)
+        else:
+            histories[symbol] = hist
+    
+    if not missing or MARKET_DATA_OFFLINE:
+        return histories
+    
+    # Identical bulk requests (e.g. many callers of market_overview) share one download
+    key = ("bulk", tuple(missing), period, interval)
+    histories.update(history_flight.do(key, lambda: download_histories(missing, period, interval)))
+    return histories
+
+def download_histories(symbols, period="1y", interval="1d"):
+    """Fetch many symbols in one provider batch call and cache each frame"""
+    histories = market_data.batch_history(symbols, period=period, interval=interval)
+    for symbol, hist in histories.items():
+        ohlcv_cache.put(symbol, period, hist, interval=interval)
+    return histories
+
+def load_company_info(symbol):
+    """Fetch company info from the market data provider (a separate, slow upstream call)"""
+    if MARKET_DATA_OFFLINE:
+        return {}
+    return market_data.metadata(symbol)
+
+def fetch_info_safe(symbol):
+    """Return company info from the daily metadata cache, or None if unavailable"""
+    return metadata_cache.get_or_load(symbol, load_company_info) or None
+
+def build_stock_payload(symbol, hist, info=None):
+    """Build the stock data response from a history frame and optional company info"""
+    if info:
+        company_name = info.get('longName', info.get('shortName', symbol))
+        sector = info.get('sector', 'Unknown')
+        market_cap = info.get('marketCap', 0)
+        pe_ratio = info.get('trailingPE', None)
+        dividend_yield = info.get('dividendYield', None)
+    else:
+        # Fallback to our database
+        stock_info = STOCK_SYMBOLS.get(symbol.upper(), {})
+        company_name = stock_info.get('name', symbol)
+        sector = stock_info.get('sector', 'Unknown')
+        market_cap = None
+        pe_ratio = None
+        dividend_yield = None
+    
+    return {
+        "symbol": symbol.upper(),
+        "company_name": company_name,
+        "sector": sector,
+        "market_cap": market_cap,
+        "pe_ratio": pe_ratio,
+        "dividend_yield": dividend_yield,
+        "data": hist.reset_index().to_dict('records'),
+        "current_price": float(hist['Close'].iloc[-1]),
+        "open_price": float(hist['Open'].iloc[-1]),
+        "high_price": float(hist['High'].iloc[-1]),
+        "low_price": float(hist['Low'].iloc[-1]),
+        "volume": int(hist['Volume'].iloc[-1]),
+        "price_change": float(hist['Close'].iloc[-1] - hist['Close'].iloc[-2]) if len(hist) > 1 else 0,
+        "price_change_percent": float(((hist['Close'].iloc[-1] - hist['Close'].iloc[-2]) / hist['Close'].iloc[-2]) * 100) if len(hist) > 1 else 0
+    }
+
+def fetch_stock_data_safe(symbol, period="1y", interval="1d", include_info=True):
+    """
+    Safely fetch stock data with error handling.
+    Company info is only looked up when include_info is set.
+    """
     try:
-        stock = yf.Ticker(symbol)
-        hist = stock.history(period=period)
+        hist = fetch_history(symbol, period, interval)
         
         if hist.empty:
             return None, f"No data found for {symbol}"
         
-        # Get additional info
-        try:
-            info = stock.info
-            company_name = info.get('longName', info.get('shortName', symbol))
-            sector = info.get('sector', 'Unknown')
-            market_cap = info.get('marketCap', 0)
-            pe_ratio = info.get('trailingPE', None)
-            dividend_yield = info.get('dividendYield', None)
-        except:
-            # Fallback to our database
-            stock_info = STOCK_SYMBOLS.get(symbol.upper(), {})
-            company_name = stock_info.get('name', symbol)
-            sector = stock_info.get('sector', 'Unknown')
-            market_cap = None
-            pe_ratio = None
-            dividend_yield = None
-        
-        return {
-            "symbol": symbol.upper(),
-            "company_name": company_name,
-            "sector": sector,
-            "market_cap": market_cap,
-            "pe_ratio": pe_ratio,
-            "dividend_yield": dividend_yield,
-            "data": hist.reset_index().to_dict('records'),
-            "current_price": float(hist['Close'].iloc[-1]),
-            "open_price": float(hist['Open'].iloc[-1]),
-            "high_price": float(hist['High'].iloc[-1]),
-            "low_price": float(hist['Low'].iloc[-1]),
-            "volume": int(hist['Volume'].iloc[-1]),
-            "price_change": float(hist['Close'].iloc[-1] - hist['Close'].iloc[-2]) if len(hist) > 1 else 0,
-            "price_change_percent": float(((hist['Close'].iloc[-1] - hist['Close'].iloc[-2]) / hist['Close'].iloc[-2]) * 100) if len(hist) > 1 else 0
-        }, None
+        info = fetch_info_safe(symbol) if include_info else None
+        return build_stock_payload(symbol, hist, info), None
+    except RateLimitTimeout:
+        raise
     except Exception as e:
         return None, str(e)
 
+def fetch_multiple_stocks_safe(symbols, period="1y", interval="1d", include_info=False):
+    """
+    Fetch stock data for many symbols with one bulk history download.
+    Company info is a separate upstream call per symbol, so it is only
+    fetched when include_info is set; otherwise names and sectors come from
+    STOCK_SYMBOLS.
+    
+    Returns (results, errors) dicts keyed by symbol.
+    """
+    results = {}
+    errors = {}
+    
+    try:
+        histories = fetch_histories(symbols, period, interval)
+    except RateLimitTimeout:
+        raise
+    except Exception as e:
+        return results, {symbol: str(e) for symbol in symbols}
+    
+    infos = {}
+    if include_info:
+        available = [s for s in symbols if s in histories and not histories[s].empty]
+        
+        def fetch_info_single(sym):
+            return sym, fetch_info_safe(sym)
+        
+        with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_CONCURRENT_REQUESTS) as executor:
+            for sym, info in executor.map(fetch_info_single, available):
+                infos[sym] = info
+    
+    for symbol in symbols:
+        hist = histories.get(symbol)
+        if hist is None or hist.empty:
+            errors[symbol] = f"No data found for {symbol}"
+            continue
+        try:
+            results[symbol] = build_stock_payload(symbol, hist, infos.get(symbol))
+        except Exception as e:
+            errors[symbol] = str(e)
+    
+    return results, errors
+
+
+@app.errorhandler(RateLimitTimeout)
+def upstream_rate_limited(e):
+    """Requests that would queue too long for an upstream token are shed with a 429"""
+    response = jsonify({"error": str(e)})
+    response.headers["Retry-After"] = str(max(1, math.ceil(e.retry_after)))
+    return response, 429
+
 
 @app.route('/api/symbols', methods=['GET'])
 def get_symbols():
@@ -140,23 +341,8 @@ def get_multiple_stocks():
         if len(symbols) > 50:
             symbols = symbols[:50]
         
-        results = {}
-        errors = {}
-        
-        # Use ThreadPoolExecutor for concurrent fetching
-        def fetch_single(sym):
-            time.sleep(REQUEST_DELAY)  # Rate limiting
-            return sym, fetch_stock_data_safe(sym, period)
-        
-        with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_CONCURRENT_REQUESTS) as executor:
-            futures = {executor.submit(fetch_single, sym): sym for sym in symbols}
-            
-            for future in concurrent.futures.as_completed(futures):
-                sym, (data, error) = future.result()
-                if data:
-                    results[sym] = data
-                else:
-                    errors[sym] = error
+        # One bulk history download for all symbols
+        results, errors = fetch_multiple_stocks_safe(symbols, period, include_info=True)
         
         return jsonify({
             "success_count": len(results),
@@ -165,6 +351,8 @@ def get_multiple_stocks():
             "errors": errors
         })
         
+    except RateLimitTimeout:
+        raise
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -182,12 +370,10 @@ def get_sector_stocks(sector):
         symbols = symbols[:20]
         
         results = {}
-        errors = {}
+        stocks, errors = fetch_multiple_stocks_safe(symbols, "1mo")
         
         for symbol in symbols:
-            data, error = fetch_stock_data_safe(symbol, "1mo")
-            time.sleep(REQUEST_DELAY)
-            
+            data = stocks.get(symbol)
             if data:
                 results[symbol] = {
                     "company_name": data["company_name"],
@@ -196,8 +382,6 @@ def get_sector_stocks(sector):
                     "price_change_percent": data["price_change_percent"],
                     "volume": data["volume"]
                 }
-            else:
-                errors[symbol] = error
         
         return jsonify({
             "sector": sector,
@@ -206,99 +390,126 @@ def get_sector_stocks(sector):
             "errors": errors if errors else None
         })
         
+    except RateLimitTimeout:
+        raise
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
+# Symbols behind the shared market snapshots
+MARKET_INDICES = ["^GSPC", "^DJI", "^IXIC", "^RUT", "^VIX"]
+INDEX_NAMES = {
+    "^GSPC": "S&P 500",
+    "^DJI": "Dow Jones",
+    "^IXIC": "NASDAQ",
+    "^RUT": "Russell 2000",
+    "^VIX": "VIX"
+}
+
+# Top stocks by market cap
+TOP_STOCKS = ["AAPL", "MSFT", "GOOGL", "AMZN", "NVDA", "META", "TSLA", "BRK-B", "JPM", "V"]
+
+# Popular tech stocks as trending
+TRENDING_SYMBOLS = [
+    "AAPL", "NVDA", "TSLA", "AMD", "META",
+    "GOOGL", "MSFT", "AMZN", "NFLX", "COIN",
+    "PLTR", "SOFI", "NIO", "RIVN", "GME"
+]
+
+# Seconds between background refreshes of each snapshot
+MARKET_OVERVIEW_REFRESH = int(os.getenv("MARKET_OVERVIEW_REFRESH_SECONDS", "60"))
+TRENDING_REFRESH = int(os.getenv("TRENDING_REFRESH_SECONDS", "120"))
+
+def build_market_overview():
+    """Build the overview of major market indices and top stocks"""
+    fetched, errors = fetch_multiple_stocks_safe(MARKET_INDICES + TOP_STOCKS, "1d")
+    if not fetched:
+        raise RuntimeError(f"No market data available: {errors}")
+    
+    index_data = {}
+    for idx in MARKET_INDICES:
+        data = fetched.get(idx)
+        if data:
+            index_data[INDEX_NAMES.get(idx, idx)] = {
+                "current_price": data["current_price"],
+                "price_change": data["price_change"],
+                "price_change_percent": data["price_change_percent"]
+            }
+    
+    stock_data = {}
+    for symbol in TOP_STOCKS:
+        data = fetched.get(symbol)
+        if data:
+            stock_data[symbol] = {
+                "company_name": data["company_name"],
+                "current_price": data["current_price"],
+                "price_change": data["price_change"],
+                "price_change_percent": data["price_change_percent"]
+            }
+    
+    return {
+        "timestamp": datetime.now().isoformat(),
+        "indices": index_data,
+        "top_stocks": stock_data
+    }
+
+def build_trending():
+    """Build the trending/most active stocks list"""
+    fetched, errors = fetch_multiple_stocks_safe(TRENDING_SYMBOLS, "5d")
+    if not fetched:
+        raise RuntimeError(f"No market data available: {errors}")
+    
+    trending_data = []
+    for symbol in TRENDING_SYMBOLS:
+        data = fetched.get(symbol)
+        if data:
+            trending_data.append({
+                "symbol": symbol,
+                "company_name": data["company_name"],
+                "current_price": data["current_price"],
+                "price_change": data["price_change"],
+                "price_change_percent": data["price_change_percent"],
+                "volume": data["volume"]
+            })
+    
+    # Sort by absolute price change percentage
+    trending_data.sort(key=lambda x: abs(x["price_change_percent"]), reverse=True)
+    
+    return {
+        "count": len(trending_data),
+        "trending": trending_data
+    }
+
+# Snapshots are shared by every caller and recomputed in the background,
+# so the endpoints never hit upstream on the request path once warm
+market_snapshots = SnapshotStore()
+market_snapshots.register("market_overview", build_market_overview, MARKET_OVERVIEW_REFRESH)
+market_snapshots.register("trending", build_trending, TRENDING_REFRESH)
+
+def snapshot_response(name):
+    """Serve the latest snapshot with its as-of time; builds it on first use"""
+    market_snapshots.start()
+    snapshot = market_snapshots.get(name)
+    if snapshot is None:
+        error = market_snapshots.stats()[name]["last_error"]
+        return jsonify({"error": error or "Snapshot not available yet"}), 503
+    return jsonify({
+        **snapshot["data"],
+        "as_of": snapshot["as_of"],
+        "stale": snapshot["stale"]
+    })
+
+
 @app.route('/api/market_overview', methods=['GET'])
 def get_market_overview():
     """Get overview of major market indices and top stocks"""
-    try:
-        # Major indices
-        indices = ["^GSPC", "^DJI", "^IXIC", "^RUT", "^VIX"]
-        index_names = {
-            "^GSPC": "S&P 500",
-            "^DJI": "Dow Jones",
-            "^IXIC": "NASDAQ",
-            "^RUT": "Russell 2000",
-            "^VIX": "VIX"
-        }
-        
-        # Top stocks by market cap
-        top_stocks = ["AAPL", "MSFT", "GOOGL", "AMZN", "NVDA", "META", "TSLA", "BRK-B", "JPM", "V"]
-        
-        index_data = {}
-        stock_data = {}
-        
-        # Fetch index data
-        for idx in indices:
-            data, error = fetch_stock_data_safe(idx, "1d")
-            if data:
-                index_data[index_names.get(idx, idx)] = {
-                    "current_price": data["current_price"],
-                    "price_change": data["price_change"],
-                    "price_change_percent": data["price_change_percent"]
-                }
-            time.sleep(REQUEST_DELAY)
-        
-        # Fetch top stocks data
-        for symbol in top_stocks:
-            data, error = fetch_stock_data_safe(symbol, "1d")
-            if data:
-                stock_data[symbol] = {
-                    "company_name": data["company_name"],
-                    "current_price": data["current_price"],
-                    "price_change": data["price_change"],
-                    "price_change_percent": data["price_change_percent"]
-                }
-            time.sleep(REQUEST_DELAY)
-        
-        return jsonify({
-            "timestamp": datetime.now().isoformat(),
-            "indices": index_data,
-            "top_stocks": stock_data
-        })
-        
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
+    return snapshot_response("market_overview")
 
 
 @app.route('/api/trending', methods=['GET'])
 def get_trending():
     """Get trending/most active stocks"""
-    try:
-        # Popular tech stocks as trending
-        trending_symbols = [
-            "AAPL", "NVDA", "TSLA", "AMD", "META", 
-            "GOOGL", "MSFT", "AMZN", "NFLX", "COIN",
-            "PLTR", "SOFI", "NIO", "RIVN", "GME"
-        ]
-        
-        trending_data = []
-        
-        for symbol in trending_symbols:
-            data, error = fetch_stock_data_safe(symbol, "5d")
-            if data:
-                trending_data.append({
-                    "symbol": symbol,
-                    "company_name": data["company_name"],
-                    "current_price": data["current_price"],
-                    "price_change": data["price_change"],
-                    "price_change_percent": data["price_change_percent"],
-                    "volume": data["volume"]
-                })
-            time.sleep(REQUEST_DELAY)
-        
-        # Sort by absolute price change percentage
-        trending_data.sort(key=lambda x: abs(x["price_change_percent"]), reverse=True)
-        
-        return jsonify({
-            "count": len(trending_data),
-            "trending": trending_data
-        })
-        
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
+    return snapshot_response("trending")
 
 
 @app.route('/api/search/<query>', methods=['GET'])
@@ -308,11 +519,18 @@ def search_stock(query):
     
     # Enrich with live price data for top 10 results
     enriched_results = {}
+    rate_limited = False
     for i, (symbol, info) in enumerate(results.items()):
         if i >= 10:
             break
         
-        data, error = fetch_stock_data_safe(symbol, "1d")
+        data = None
+        if not rate_limited:
+            try:
+                data, error = fetch_stock_data_safe(symbol, "1d", include_info=False)
+            except RateLimitTimeout:
+                # Prices are extras here; the remaining results go out without them
+                rate_limited = True
         if data:
             enriched_results[symbol] = {
                 **info,
@@ -321,7 +539,6 @@ def search_stock(query):
             }
         else:
             enriched_results[symbol] = info
-        time.sleep(REQUEST_DELAY)
     
     return jsonify({
         "query": query,
@@ -330,6 +547,79 @@ def search_stock(query):
     })
 
 
+def create_lstm_model(look_back):
+    from tensorflow.keras.models import Sequential
+    from tensorflow.keras.layers import LSTM, Dense, Dropout
+    
+    params = MODEL_HYPERPARAMS["LSTM"]
+    model = Sequential()
+    model.add(LSTM(params["units"], return_sequences=True, input_shape=(look_back, 1)))
+    model.add(Dropout(params["dropout"]))
+    model.add(LSTM(params["units"], return_sequences=False))
+    model.add(Dropout(params["dropout"]))
+    model.add(Dense(params["dense"]))
+    model.add(Dense(1))
+    model.compile(optimizer='adam', loss='mean_squared_error')
+    return model
+
+
+# LSTM weights are kept per symbol on disk and fine-tuned on new bars
+# instead of being retrained from scratch (epochs is the upper bound of a
+# full retrain with early stopping)
+LSTM_MODEL_DIR = os.getenv("LSTM_MODEL_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "models", "lstm"))
+lstm_store = LSTMStore(
+    LSTM_MODEL_DIR,
+    build_model=create_lstm_model,
+    params=MODEL_HYPERPARAMS["LSTM"],
+    epochs=MODEL_HYPERPARAMS["LSTM"]["epochs"],
+    batch_size=MODEL_HYPERPARAMS["LSTM"]["batch_size"],
+    finetune_epochs=int(os.getenv("LSTM_FINETUNE_EPOCHS", "5")),
+    train_budget=float(os.getenv("LSTM_TRAIN_BUDGET_SECONDS", "60")),
+    finetune_budget=float(os.getenv("LSTM_FINETUNE_BUDGET_SECONDS", "10")),
+    drift_factor=float(os.getenv("LSTM_DRIFT_FACTOR", "3"))
+)
+
+
+def fit_price_model(model_type, hist, symbol):
+    """Train a next-close model on a history frame; returns the model registry fields"""
+    if model_type == 'LSTM':
+        # Predicts the next scaled close from the latest one
+        fitted = lstm_store.fit(symbol, hist['Close'].to_numpy(dtype=np.float64), look_back=1)
+        fitted["metrics"]["confidence"] *= 100
+        return fitted
+    
+    # Prepare data
+    df = hist[['Close']].copy()
+    df['Prediction'] = df['Close'].shift(-1)
+    df = df.dropna()
+    
+    X = np.array(df.drop(['Prediction'], axis=1))
+    y = np.array(df['Prediction'])
+    
+    from sklearn.svm import SVR
+    from sklearn.tree import DecisionTreeRegressor
+    from sklearn.ensemble import RandomForestRegressor
+    
+    # Chronological split: the model is scored on the most recent 20% of
+    # days, never on days that fall between its training days
+    split = int(0.8 * len(X))
+    X_train, X_test, y_train, y_test = X[:split], X[split:], y[:split], y[split:]
+    
+    params = MODEL_HYPERPARAMS[model_type]
+    if model_type == 'SVM':
+        model = SVR(**params)
+    elif model_type == 'DecisionTree':
+        model = DecisionTreeRegressor(**params)
+    else:
+        model = RandomForestRegressor(**params)
+    model.fit(X_train, y_train)
+    
+    # Calculate confidence (simplified)
+    confidence = float(model.score(X_test, y_test) * 100)
+    # Trees are kept as flat node arrays: smaller and faster to predict with
+    return {"model": flatten_model(model), "scaler": None, "look_back": 1, "metrics": {"confidence": confidence}}
+
+
 @app.route('/api/predict', methods=['POST'])
 def predict():
     """Run ML predictions"""
@@ -341,64 +631,32 @@ def predict():
         
         if not symbol:
             return jsonify({"error": "Symbol is required"}), 400
+        if model_type not in MODEL_HYPERPARAMS:
+            return jsonify({"error": "Invalid model type"}), 400
+        if model_type == 'LSTM' and not LSTM_AVAILABLE:
+            return jsonify({"error": "LSTM requires TensorFlow, which is not installed"}), 400
         
         # Fetch historical data
-        stock = yf.Ticker(symbol)
-        hist = stock.history(period="1y")
+        hist = fetch_history(symbol, "1y")
         
         if hist.empty:
             return jsonify({"error": "No data found"}), 404
         
-        # Prepare data
-        df = hist[['Close']].copy()
-        df['Prediction'] = df['Close'].shift(-1)
-        df = df.dropna()
-        
-        X = np.array(df.drop(['Prediction'], axis=1))
-        y = np.array(df['Prediction'])
-        
-        # Split data
-        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-        
-        # Train model based on type
-        if model_type == 'SVM':
-            model = SVR(kernel='rbf', C=1e3, gamma=0.1)
-        elif model_type == 'DecisionTree':
-            model = DecisionTreeRegressor(random_state=42)
-        elif model_type == 'RandomForest':
-            model = RandomForestRegressor(n_estimators=100, random_state=42)
-        elif model_type == 'LSTM':
-            # LSTM implementation
-            scaler = MinMaxScaler(feature_range=(0, 1))
-            scaled_data = scaler.fit_transform(X_train)
-            
-            model = Sequential()
-            model.add(LSTM(50, return_sequences=True, input_shape=(X_train.shape[1], 1)))
-            model.add(Dropout(0.2))
-            model.add(LSTM(50, return_sequences=False))
-            model.add(Dropout(0.2))
-            model.add(Dense(25))
-            model.add(Dense(1))
-            
-            model.compile(optimizer='adam', loss='mean_squared_error')
-            X_train_reshaped = scaled_data.reshape((scaled_data.shape[0], scaled_data.shape[1], 1))
-            model.fit(X_train_reshaped, y_train, batch_size=1, epochs=25, verbose=0)
-            
-            # Predict
-            X_test_scaled = scaler.transform(X_test)
-            X_test_reshaped = X_test_scaled.reshape((X_test_scaled.shape[0], X_test_scaled.shape[1], 1))
-            prediction = model.predict(X_test_reshaped)
-            predicted_price = float(prediction[0][0])
+        # Reuse the model fitted on the same bars, or train and register it
+        last_bar_date = hist.index[-1].strftime('%Y-%m-%d')
+        key = model_registry.make_key(symbol, model_type, MODEL_HYPERPARAMS[model_type], last_bar_date)
+        fitted = model_registry.get_or_fit(key, lambda: fit_price_model(model_type, hist, symbol))
+        
+        # Predict the next close from the latest one
+        last_close = hist[['Close']].to_numpy()[-1:]
+        if model_type == 'LSTM':
+            last_scaled = fitted.scaler.transform(last_close).reshape((1, 1, 1))
+            predicted_scaled = fitted.model.predict(last_scaled, verbose=0)
+            predicted_price = float(fitted.scaler.inverse_transform(predicted_scaled)[0][0])
         else:
-            return jsonify({"error": "Invalid model type"}), 400
-        
-        if model_type != 'LSTM':
-            model.fit(X_train, y_train)
-            prediction = model.predict(X_test)
-            predicted_price = float(prediction[0])
+            predicted_price = float(fitted.model.predict(last_close)[0])
         
-        # Calculate confidence (simplified)
-        confidence = float(model.score(X_test, y_test) * 100) if model_type != 'LSTM' else 85.0
+        confidence = fitted.metrics["confidence"]
         
         current_price = float(hist['Close'].iloc[-1])
         price_change = predicted_price - current_price
@@ -415,6 +673,8 @@ def predict():
             "recommendation": "BUY" if price_change_percent > 2 else "SELL" if price_change_percent < -2 else "HOLD"
         })
         
+    except RateLimitTimeout:
+        raise
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -434,9 +694,10 @@ def compare_stocks():
             symbols = symbols[:5]
         
         comparison = {}
+        fetched, errors = fetch_multiple_stocks_safe(symbols, period)
         
         for symbol in symbols:
-            stock_data, error = fetch_stock_data_safe(symbol, period)
+            stock_data = fetched.get(symbol)
             if stock_data:
                 # Calculate performance metrics
                 prices = [d['Close'] for d in stock_data['data']]
@@ -452,13 +713,14 @@ def compare_stocks():
                     "low": round(min(prices), 2),
                     "volatility": round(np.std(prices), 2)
                 }
-            time.sleep(REQUEST_DELAY)
         
         return jsonify({
             "period": period,
             "stocks": comparison
         })
         
+    except RateLimitTimeout:
+        raise
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -468,10 +730,22 @@ def health():
     return jsonify({
         "status": "healthy",
         "total_symbols": len(STOCK_SYMBOLS),
+        "ohlcv_cache": ohlcv_cache.stats(),
+        "market_data_provider": market_data.name,
+        "upstream_rate_limit": upstream_limiter.stats(),
+        "metadata_cache": metadata_cache.stats(),
+        "history_single_flight": history_flight.stats(),
+        "model_registry": model_registry.stats(),
+        "lstm_store": lstm_store.stats(),
+        "market_snapshots": market_snapshots.stats(),
+        "startup": startup_report(),
         "timestamp": datetime.now().isoformat()
     })
 
 
+print(f"App loaded in {mark_ready():.2f}s")
+
+
 if __name__ == '__main__':
     print(f"Stock ML Backend Starting...")
     print(f"Total stocks in database: {len(STOCK_SYMBOLS)}")
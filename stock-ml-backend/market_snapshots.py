@@ -0,0 +1,149 @@
+# Background-refreshed, shared in-memory snapshots for global market endpoints
+
+import threading
+import time
+from datetime import datetime
+
+
+class SnapshotStore:
+    """
+    Holds the latest result of each registered snapshot builder and
+    recomputes them on a schedule in one background thread.
+
+    Readers always get the latest successful snapshot in constant time.
+    If a refresh fails, the previous snapshot keeps being served
+    (stale-while-revalidate) and is flagged stale once it is older than
+    `stale_after` refresh intervals.
+    """
+
+    def __init__(self, stale_after=3):
+        self.stale_after = stale_after
+        self._builders = {}   # name -> (builder, interval)
+        self._snapshots = {}  # name -> {"data", "as_of", "built_at"}
+        self._state = {}      # name -> {"next_run", "last_error", "failures", "refreshes", "duration"}
+        self._build_locks = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+
+    def register(self, name, builder, interval):
+        """Register a zero-argument builder that returns a JSON-serializable dict"""
+        self._builders[name] = (builder, interval)
+        self._build_locks[name] = threading.Lock()
+        self._state[name] = {
+            "next_run": 0.0,
+            "last_error": None,
+            "failures": 0,
+            "refreshes": 0,
+            "duration": None,
+        }
+
+    def start(self):
+        """Start the background refresher (idempotent)"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="market-snapshots", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def refresh(self, name):
+        """Rebuild one snapshot now; on failure the previous snapshot is kept"""
+        with self._build_locks[name]:
+            return self._build(name)
+
+    def _attempts(self, name):
+        state = self._state[name]
+        return state["refreshes"] + state["failures"]
+
+    def _build(self, name):
+        # Called with the snapshot's build lock held
+        builder, interval = self._builders[name]
+        started = time.monotonic()
+        try:
+            data = builder()
+            with self._lock:
+                self._snapshots[name] = {
+                    "data": data,
+                    "as_of": datetime.now().isoformat(),
+                    "built_at": time.monotonic(),
+                }
+                state = self._state[name]
+                state["last_error"] = None
+                state["refreshes"] += 1
+                state["duration"] = round(time.monotonic() - started, 3)
+            return True
+        except Exception as e:
+            with self._lock:
+                state = self._state[name]
+                state["last_error"] = str(e)
+                state["failures"] += 1
+            print(f"Snapshot refresh failed for {name}: {e}")
+            return False
+        finally:
+            with self._lock:
+                self._state[name]["next_run"] = time.monotonic() + interval
+
+    def get(self, name):
+        """
+        Latest snapshot as {"data", "as_of", "stale"}, or None if it has
+        never been built successfully. The first call for a snapshot that
+        has never been built builds it in the calling thread; concurrent
+        first calls (and the background refresher) wait for that one build
+        and share its outcome instead of building again.
+        """
+        with self._lock:
+            snapshot = self._snapshots.get(name)
+            attempts = self._attempts(name)
+        if snapshot is None:
+            with self._build_locks[name]:
+                with self._lock:
+                    snapshot = self._snapshots.get(name)
+                    built_meanwhile = self._attempts(name) != attempts
+                if snapshot is None and not built_meanwhile:
+                    self._build(name)
+                    with self._lock:
+                        snapshot = self._snapshots.get(name)
+            if snapshot is None:
+                return None
+
+        _, interval = self._builders[name]
+        age = time.monotonic() - snapshot["built_at"]
+        return {
+            "data": snapshot["data"],
+            "as_of": snapshot["as_of"],
+            "stale": age > interval * self.stale_after,
+        }
+
+    def _refresh_if_due(self, name):
+        with self._build_locks[name]:
+            # A reader may have built it while this thread waited for the lock
+            with self._lock:
+                due = self._state[name]["next_run"] <= time.monotonic()
+            if due:
+                self._build(name)
+
+    def _run(self):
+        while not self._stop.is_set():
+            now = time.monotonic()
+            with self._lock:
+                due = [name for name, state in self._state.items() if state["next_run"] <= now]
+            for name in due:
+                self._refresh_if_due(name)
+            self._stop.wait(1.0)
+
+    def stats(self):
+        with self._lock:
+            return {
+                name: {
+                    "as_of": self._snapshots[name]["as_of"] if name in self._snapshots else None,
+                    "refreshes": state["refreshes"],
+                    "failures": state["failures"],
+                    "last_error": state["last_error"],
+                    "last_duration_seconds": state["duration"],
+                }
+                for name, state in self._state.items()
+            }
@@ -0,0 +1,155 @@
+# Process-wide token-bucket rate limiter for upstream (Yahoo Finance) calls
+
+import os
+import sqlite3
+import threading
+import time
+
+
+class RateLimitTimeout(Exception):
+    """
+    Raised when a token cannot be granted before the caller's deadline.
+    retry_after is the wait, in seconds, the grant would have needed.
+    """
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """
+    Token bucket with `rate` tokens refilled per second and room for `burst`
+    tokens. Callers reserve tokens up front: the bucket may go negative, and
+    each caller sleeps until its reservation is covered. This keeps waiters in
+    FIFO order and lets a caller whose deadline cannot be met fail immediately
+    instead of sleeping first.
+
+    With `store_path` set, the bucket state lives in a local SQLite file so
+    every worker process on the host draws from the same bucket.
+    """
+
+    def __init__(self, rate, burst, store_path=None, name="default"):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        if burst < 1:
+            raise ValueError("burst must be at least 1")
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.name = name
+        self.store_path = store_path
+
+        self._lock = threading.Lock()
+        self._tokens = self.burst
+        self._updated = time.time()
+
+        self.acquired = 0
+        self.timeouts = 0
+        self.waiting = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+        if store_path:
+            self._init_store()
+
+    # ---- state backends ----
+
+    def _init_store(self):
+        directory = os.path.dirname(os.path.abspath(self.store_path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS buckets ("
+                "name TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+            )
+            conn.execute(
+                "INSERT OR IGNORE INTO buckets (name, tokens, updated) VALUES (?, ?, ?)",
+                (self.name, self.burst, time.time())
+            )
+
+    def _connect(self):
+        return sqlite3.connect(self.store_path, timeout=10, isolation_level=None)
+
+    def _reserve_local(self, tokens, timeout):
+        with self._lock:
+            now = time.time()
+            available = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            wait = max(0.0, (tokens - available) / self.rate)
+            if timeout is not None and wait > timeout:
+                return wait, False
+            self._tokens = available - tokens
+            self._updated = now
+            return wait, True
+
+    def _reserve_shared(self, tokens, timeout):
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT tokens, updated FROM buckets WHERE name = ?", (self.name,)
+            ).fetchone()
+            now = time.time()
+            current, updated = row if row else (self.burst, now)
+            available = min(self.burst, current + (now - updated) * self.rate)
+            wait = max(0.0, (tokens - available) / self.rate)
+            if timeout is not None and wait > timeout:
+                conn.execute("ROLLBACK")
+                return wait, False
+            conn.execute(
+                "INSERT OR REPLACE INTO buckets (name, tokens, updated) VALUES (?, ?, ?)",
+                (self.name, available - tokens, now)
+            )
+            conn.execute("COMMIT")
+            return wait, True
+        finally:
+            conn.close()
+
+    # ---- public API ----
+
+    def acquire(self, tokens=1, timeout=None):
+        """
+        Block until `tokens` are granted and return the seconds spent waiting.
+        Raises RateLimitTimeout if the grant would take longer than `timeout`.
+        """
+        if self.store_path:
+            wait, granted = self._reserve_shared(tokens, timeout)
+        else:
+            wait, granted = self._reserve_local(tokens, timeout)
+
+        if not granted:
+            with self._lock:
+                self.timeouts += 1
+            raise RateLimitTimeout(
+                f"Upstream rate limit '{self.name}': no token available within {timeout}s",
+                retry_after=wait
+            )
+
+        if wait > 0:
+            with self._lock:
+                self.waiting += 1
+            try:
+                time.sleep(wait)
+            finally:
+                with self._lock:
+                    self.waiting -= 1
+
+        with self._lock:
+            self.acquired += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+        return wait
+
+    def stats(self):
+        with self._lock:
+            return {
+                "name": self.name,
+                "rate_per_second": self.rate,
+                "burst": self.burst,
+                "shared": bool(self.store_path),
+                "acquired": self.acquired,
+                "timeouts": self.timeouts,
+                "waiting": self.waiting,
+                "total_wait_seconds": round(self.total_wait, 3),
+                "avg_wait_seconds": round(self.total_wait / self.acquired, 4) if self.acquired else 0.0,
+                "max_wait_seconds": round(self.max_wait, 3),
+            }
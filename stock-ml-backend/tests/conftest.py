@@ -0,0 +1,27 @@
+# ============================================
+# TEST FIXTURES
+# Import paths and the Flask app
+# ============================================
+
+import os
+import sys
+
+import pytest
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPO_ROOT = os.path.dirname(APP_DIR)
+for path in (REPO_ROOT, APP_DIR):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+
+@pytest.fixture(scope='session')
+def app_module():
+    """stock-ml-backend/app.py, imported once"""
+    import app
+    return app
+
+
+@pytest.fixture
+def client(app_module):
+    return app_module.app.test_client()
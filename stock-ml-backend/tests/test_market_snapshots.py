@@ -0,0 +1,117 @@
+import threading
+import time
+
+import pytest
+
+from market_snapshots import SnapshotStore
+
+
+class Builder:
+    """Counts its calls; each build takes `delay` seconds and may fail"""
+
+    def __init__(self, delay=0.0, fail=False):
+        self.delay = delay
+        self.fail = fail
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        with self._lock:
+            self.calls += 1
+            call = self.calls
+        time.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError('upstream down')
+        return {'build': call}
+
+
+def make_store(builder, interval=60, **kwargs):
+    store = SnapshotStore(**kwargs)
+    store.register('overview', builder, interval)
+    return store
+
+
+def read_concurrently(store, readers=8):
+    results = [None] * readers
+    start = threading.Barrier(readers)
+
+    def read(i):
+        start.wait()
+        results[i] = store.get('overview')
+
+    threads = [threading.Thread(target=read, args=(i,)) for i in range(readers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    return results
+
+
+def test_concurrent_first_reads_share_one_build():
+    builder = Builder(delay=0.2)
+    store = make_store(builder)
+
+    results = read_concurrently(store)
+
+    assert builder.calls == 1
+    assert all(result['data'] == {'build': 1} and not result['stale'] for result in results)
+
+
+def test_concurrent_first_reads_share_one_failure():
+    builder = Builder(delay=0.2, fail=True)
+    store = make_store(builder)
+
+    results = read_concurrently(store)
+
+    assert builder.calls == 1
+    assert results == [None] * len(results)
+    assert store.stats()['overview']['last_error'] == 'upstream down'
+    # A later read tries again
+    builder.fail = False
+    assert store.get('overview')['data'] == {'build': 2}
+
+
+def test_the_refresher_does_not_rebuild_a_snapshot_a_reader_is_building():
+    builder = Builder(delay=0.2)
+    store = make_store(builder)
+    try:
+        store.start()
+        results = read_concurrently(store, readers=4)
+    finally:
+        store.stop()
+
+    assert builder.calls == 1
+    assert all(result['data'] == {'build': 1} for result in results)
+
+
+def test_a_failed_refresh_keeps_serving_the_previous_snapshot():
+    builder = Builder()
+    store = make_store(builder, interval=0.01, stale_after=3)
+    first = store.get('overview')
+
+    builder.fail = True
+    assert store.refresh('overview') is False
+    snapshot = store.get('overview')
+
+    assert snapshot['data'] == first['data'] and snapshot['as_of'] == first['as_of']
+    stats = store.stats()['overview']
+    assert (stats['refreshes'], stats['failures']) == (1, 1)
+    time.sleep(0.05)
+    assert store.get('overview')['stale']
+
+
+def test_reads_after_the_first_build_do_not_build():
+    builder = Builder()
+    store = make_store(builder)
+    store.get('overview')
+
+    for _ in range(5):
+        assert store.get('overview')['data'] == {'build': 1}
+    assert builder.calls == 1
+
+
+def test_unknown_snapshots_raise():
+    store = make_store(Builder())
+
+    with pytest.raises(KeyError):
+        store.get('trending')
@@ -0,0 +1,134 @@
+import pytest
+
+import rate_limiter
+from rate_limiter import RateLimitTimeout, TokenBucket
+
+
+class Clock:
+    """Replaces rate_limiter.time: sleeping moves the clock forward"""
+
+    def __init__(self):
+        self.now = 1_000_000.0
+        self.sleeps = []
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(rate_limiter, 'time', clock)
+    return clock
+
+
+def test_the_burst_is_granted_without_waiting(clock):
+    bucket = TokenBucket(rate=2, burst=3)
+
+    assert [bucket.acquire() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert clock.sleeps == []
+
+
+def test_tokens_refill_at_the_rate(clock):
+    bucket = TokenBucket(rate=2, burst=3)
+    for _ in range(3):
+        bucket.acquire()
+
+    clock.now += 1.0
+    assert [bucket.acquire() for _ in range(2)] == [0.0, 0.0]
+    # The bucket is empty again, so the next caller waits half a second
+    assert bucket.acquire() == pytest.approx(0.5)
+    assert clock.sleeps == [pytest.approx(0.5)]
+
+
+def test_refill_stops_at_the_burst(clock):
+    bucket = TokenBucket(rate=2, burst=3)
+    bucket.acquire()
+
+    clock.now += 3600
+    waits = [bucket.acquire() for _ in range(4)]
+
+    assert waits[:3] == [0.0, 0.0, 0.0] and waits[3] == pytest.approx(0.5)
+
+
+def test_waiters_queue_behind_earlier_reservations(clock, monkeypatch):
+    bucket = TokenBucket(rate=2, burst=1)
+    # Reserve without sleeping, as concurrent callers would
+    monkeypatch.setattr(clock, 'sleep', lambda seconds: None)
+
+    waits = [bucket.acquire() for _ in range(4)]
+
+    assert waits == [0.0, pytest.approx(0.5), pytest.approx(1.0), pytest.approx(1.5)]
+
+
+def test_a_grant_past_the_deadline_fails_at_once(clock):
+    bucket = TokenBucket(rate=2, burst=1)
+    bucket.acquire()
+
+    with pytest.raises(RateLimitTimeout) as raised:
+        bucket.acquire(timeout=0.1)
+
+    assert raised.value.retry_after == pytest.approx(0.5)
+    assert clock.sleeps == []
+    # A failed caller reserves nothing
+    assert bucket.acquire(timeout=0.5) == pytest.approx(0.5)
+    stats = bucket.stats()
+    assert (stats['acquired'], stats['timeouts']) == (2, 1)
+
+
+def test_processes_sharing_a_store_draw_from_one_bucket(clock, tmp_path):
+    path = str(tmp_path / 'bucket.db')
+    first = TokenBucket(rate=2, burst=2, store_path=path, name='yahoo')
+    second = TokenBucket(rate=2, burst=2, store_path=path, name='yahoo')
+
+    first.acquire()
+    second.acquire()
+
+    with pytest.raises(RateLimitTimeout):
+        first.acquire(timeout=0)
+    clock.now += 0.5
+    assert second.acquire(timeout=0) == 0.0
+
+
+@pytest.mark.parametrize('rate,burst', [(0, 1), (1, 0)])
+def test_invalid_settings_are_rejected(rate, burst):
+    with pytest.raises(ValueError):
+        TokenBucket(rate=rate, burst=burst)
+
+
+@pytest.fixture
+def exhausted(app_module, clock, monkeypatch):
+    """An upstream bucket whose next token is an hour away"""
+    bucket = TokenBucket(rate=1 / 3600, burst=1, name='yahoo')
+    bucket.acquire()
+    monkeypatch.setattr(app_module, 'upstream_limiter', bucket)
+    monkeypatch.setattr(app_module, 'MARKET_DATA_OFFLINE', False)
+    monkeypatch.setattr(app_module, 'bar_store', None)
+    app_module.ohlcv_cache.invalidate()
+    return bucket
+
+
+def test_requests_that_cannot_get_a_token_answer_429(client, exhausted):
+    response = client.get('/api/get_stock_data/AAPL')
+
+    assert response.status_code == 429
+    assert response.headers['Retry-After'] == '3600'
+    assert 'rate limit' in response.get_json()['error']
+
+    response = client.post('/api/get_multiple_stocks', json={'symbols': ['AAPL', 'MSFT']})
+    assert response.status_code == 429
+    assert exhausted.stats()['timeouts'] == 2
+
+
+def test_search_answers_without_prices_when_rate_limited(client, exhausted):
+    response = client.get('/api/search/apple')
+
+    assert response.status_code == 200
+    results = response.get_json()['results']
+    assert results and all('current_price' not in result for result in results.values())
+    # The first rate-limited lookup stops the others
+    assert exhausted.stats()['timeouts'] == 1
@@ -0,0 +1,7 @@
+# ============================================
+# SHARED BACKEND MODULES
+# Used by both backend/ and stock-ml-backend/
+# ============================================
+#
+# Each app puts the repository root on sys.path before its first import
+# from this package, so both always run the same copy of these modules.
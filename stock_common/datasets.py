@@ -0,0 +1,100 @@
+# ============================================
+# SUPERVISED DATASETS FROM PRICE SERIES
+# Sliding-window (X, y) pairs built as strided views
+# ============================================
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+def make_windows(values, look_back, horizon=1, target=0):
+    """
+    Turn a series into supervised learning pairs without copying it.
+
+    Sample i uses the look_back rows before position t = look_back + i as
+    input and the `horizon` values of the target series from t onwards as
+    output - the same pairs as
+
+        for t in range(look_back, len(values) - horizon + 1):
+            X.append(values[t - look_back:t])
+            y.append(target_series[t:t + horizon])
+
+    values   (n,) series or (n, n_features) matrix
+    target   column of `values` to predict, or a separate (n,) array
+    Returns read-only views onto `values`:
+        X  (samples, look_back) for a 1-D series,
+           (samples, look_back, n_features) for a matrix
+        y  (samples,) when horizon == 1, otherwise (samples, horizon)
+    """
+    values = np.asarray(values)
+    if values.ndim not in (1, 2):
+        raise ValueError("values must be a 1-D series or a 2-D (rows, features) matrix")
+    if look_back < 1 or horizon < 1:
+        raise ValueError("look_back and horizon must be at least 1")
+
+    if isinstance(target, (int, np.integer)):
+        target_series = values if values.ndim == 1 else values[:, target]
+    else:
+        target_series = np.asarray(target)
+        if target_series.shape != values.shape[:1]:
+            raise ValueError("target must have one value per row of values")
+
+    n_samples = len(values) - look_back - horizon + 1
+    if n_samples < 1:
+        empty_x = (0, look_back) + values.shape[1:]
+        empty_y = (0,) if horizon == 1 else (0, horizon)
+        return np.empty(empty_x, dtype=values.dtype), np.empty(empty_y, dtype=target_series.dtype)
+
+    # For a matrix the window axis comes last: (samples, features, look_back)
+    X = sliding_window_view(values[:n_samples + look_back - 1], look_back, axis=0)
+    if values.ndim == 2:
+        X = X.swapaxes(1, 2)
+
+    y = sliding_window_view(target_series[look_back:], horizon)
+    return X, (y[:, 0] if horizon == 1 else y)
+
+
+def last_window(values, look_back):
+    """The most recent look_back rows as a single-sample batch for prediction"""
+    values = np.asarray(values)
+    return values[-look_back:][np.newaxis, ...]
+
+
+def stack_series(series_list, dtype=np.float64):
+    """
+    Left-aligned (n_series, max_length) matrix of several series, padded
+    with NaN, plus each series' length - so per-series work such as scaling
+    can run as one vectorized pass over all of them.
+    """
+    lengths = np.array([len(series) for series in series_list], dtype=np.int64)
+    matrix = np.full((len(series_list), int(lengths.max(initial=0))), np.nan, dtype=dtype)
+    for row, series in enumerate(series_list):
+        matrix[row, :len(series)] = series
+    return matrix, lengths
+
+
+def resume_index(values, anchor, bars=None, rtol=1e-4):
+    """
+    Position just past the occurrence of `anchor` (the final values an
+    incremental model was trained on) in values, or None when the values no
+    longer contain it (history revised, or too old). values[result:] are the
+    values the model has not seen yet.
+
+    bars is how many values the model was trained on. A history only loses
+    values at its start between updates, so an anchor ending past that
+    position, or matching in more than one place, is a coincidental match
+    and is treated like a missing one. rtol matches the bar store's
+    tolerance for re-fetched closes.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    anchor = np.asarray(anchor, dtype=np.float64)
+    if len(anchor) == 0 or len(values) < len(anchor):
+        return None
+    windows = sliding_window_view(values, len(anchor))
+    matches = np.flatnonzero(np.isclose(windows, anchor, rtol=rtol, atol=0).all(axis=1))
+    if len(matches) != 1:
+        return None
+    position = int(matches[0]) + len(anchor)
+    if bars is not None and position > bars:
+        return None
+    return position
@@ -0,0 +1,190 @@
+# ============================================
+# LOCAL MEMORY-MAPPED BAR STORE
+# One columnar file per symbol, read through numpy.memmap
+# ============================================
+#
+# File layout (little endian):
+#   header  64 bytes   magic b'OHLCVBR1', int64 bar count, zero padding
+#   day     int64[n]   days since 1970-01-01
+#   open    float32[n]
+#   high    float32[n]
+#   low     float32[n]
+#   close   float32[n]
+#   volume  int64[n]
+#
+# Readers get numpy views straight onto the mapped file, so serving or
+# training on a symbol never loads more of its history than it touches.
+
+import os
+import re
+import threading
+from collections import namedtuple
+from datetime import date, timedelta
+
+import numpy as np
+
+MAGIC = b'OHLCVBR1'
+HEADER_SIZE = 64
+
+COLUMNS = [
+    ('day', np.dtype('<i8')),
+    ('open', np.dtype('<f4')),
+    ('high', np.dtype('<f4')),
+    ('low', np.dtype('<f4')),
+    ('close', np.dtype('<f4')),
+    ('volume', np.dtype('<i8')),
+]
+
+# Calendar days per yfinance period; '1d'/'5d' are counted in bars instead
+PERIOD_DAYS = {
+    '1mo': 31,
+    '3mo': 92,
+    '6mo': 183,
+    '1y': 366,
+    '2y': 731,
+    '5y': 1827,
+    '10y': 3653,
+}
+PERIOD_BARS = {'1d': 1, '5d': 5}
+
+EPOCH = date(1970, 1, 1)
+
+
+class Bars(namedtuple('Bars', [name for name, _ in COLUMNS])):
+    """Column views of one symbol's bars (read-only when memory-mapped)"""
+
+    __slots__ = ()
+
+    @property
+    def size(self):
+        return len(self.day)
+
+    def dates(self):
+        """Bar dates as datetime64[D], a zero-copy view of the day column"""
+        return self.day.view('datetime64[D]')
+
+    def tail(self, period, today=None):
+        """Zero-copy slice of the bars covered by a yfinance period"""
+        if period in PERIOD_BARS:
+            start = max(0, len(self.day) - PERIOD_BARS[period])
+        elif period == 'max':
+            start = 0
+        else:
+            today = today or date.today()
+            if period == 'ytd':
+                first = date(today.year, 1, 1)
+            else:
+                first = today - timedelta(days=PERIOD_DAYS[period])
+            start = int(np.searchsorted(self.day, (first - EPOCH).days, side='left'))
+        return Bars(*(column[start:] for column in self))
+
+    def to_frame(self):
+        """Copy the bars into a DataFrame shaped like yf.Ticker().history() output"""
+        import pandas as pd
+
+        return pd.DataFrame(
+            {
+                'Open': self.open.astype(np.float64),
+                'High': self.high.astype(np.float64),
+                'Low': self.low.astype(np.float64),
+                'Close': self.close.astype(np.float64),
+                'Volume': np.asarray(self.volume),
+            },
+            index=pd.DatetimeIndex(self.dates().astype('datetime64[ns]'), name='Date')
+        )
+
+
+class LocalBarStore:
+    """Directory of per-symbol columnar bar files"""
+
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self._maps = {}  # path -> (mtime_ns, Bars)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _filename(symbol):
+        return re.sub(r'[^A-Z0-9.^=_-]', '_', symbol.upper().strip()) + '.bars'
+
+    def path(self, symbol):
+        return os.path.join(self.root, self._filename(symbol))
+
+    def has(self, symbol):
+        return os.path.exists(self.path(symbol))
+
+    def symbols(self):
+        return sorted(name[:-len('.bars')] for name in os.listdir(self.root) if name.endswith('.bars'))
+
+    def read(self, symbol):
+        """Memory-map a symbol's bars, or return None if it is not stored"""
+        path = self.path(symbol)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+        with self._lock:
+            cached = self._maps.get(path)
+            if cached and cached[0] == mtime:
+                return cached[1]
+
+        raw = np.memmap(path, dtype=np.uint8, mode='r')
+        if raw[:len(MAGIC)].tobytes() != MAGIC:
+            raise ValueError(f"{path} is not a bar store file")
+        n_bars = int(raw[8:16].view('<i8')[0])
+
+        columns = []
+        offset = HEADER_SIZE
+        for _, dtype in COLUMNS:
+            nbytes = n_bars * dtype.itemsize
+            columns.append(raw[offset:offset + nbytes].view(dtype))
+            offset += nbytes
+        bars = Bars(*columns)
+
+        with self._lock:
+            self._maps[path] = (mtime, bars)
+        return bars
+
+    def write(self, symbol, frame):
+        """
+        Write a history frame (DatetimeIndex + Open/High/Low/Close/Volume)
+        as the symbol's bar file. The file is replaced atomically, so readers
+        holding the previous mapping keep a consistent view.
+        """
+        index = frame.index
+        if getattr(index, 'tz', None) is not None:
+            index = index.tz_localize(None)
+        day = index.values.astype('datetime64[D]').astype('<i8')
+        arrays = [
+            day,
+            frame['Open'].to_numpy(dtype='<f4'),
+            frame['High'].to_numpy(dtype='<f4'),
+            frame['Low'].to_numpy(dtype='<f4'),
+            frame['Close'].to_numpy(dtype='<f4'),
+            frame['Volume'].to_numpy(dtype='<i8'),
+        ]
+
+        header = bytearray(HEADER_SIZE)
+        header[:len(MAGIC)] = MAGIC
+        header[8:16] = np.int64(len(day)).astype('<i8').tobytes()
+
+        path = self.path(symbol)
+        tmp_path = f"{path}.tmp{os.getpid()}"
+        with open(tmp_path, 'wb') as f:
+            f.write(header)
+            for array in arrays:
+                f.write(np.ascontiguousarray(array).tobytes())
+        os.replace(tmp_path, path)
+        return len(day)
+
+    @staticmethod
+    def is_fresh(bars, today=None):
+        """True if the last stored bar is no older than the previous business day"""
+        if bars.size == 0:
+            return False
+        today = today or date.today()
+        previous = today - timedelta(days=1)
+        while previous.weekday() >= 5:
+            previous -= timedelta(days=1)
+        return int(bars.day[-1]) >= (previous - EPOCH).days
@@ -0,0 +1,283 @@
+# ============================================
+# PERSISTED LSTM MODELS
+# Per-symbol weights on local disk, warm-started as new bars arrive
+# ============================================
+#
+# Layout under the store directory, one pair of files per symbol:
+#   <SYMBOL>.keras   model and optimizer state
+#   <SYMBOL>.json    training metadata (schema, scaler range, anchor bars, losses)
+#
+# TensorFlow and scikit-learn are imported only when a model is trained or loaded.
+
+import json
+import os
+import re
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from .datasets import resume_index
+
+# Bump when the window/scaling scheme changes so stored models are retrained
+STORE_FORMAT = 1
+
+# Closes kept in the metadata to find the last trained bar in new history
+ANCHOR_BARS = 5
+
+# Leading share of the windows used for training; the rest is the test set
+TRAIN_FRACTION = 0.8
+
+
+def scaled_windows(scaled, look_back):
+    """(X, y) next-value windows of a scaled series, X shaped for an LSTM"""
+    n_samples = len(scaled) - look_back
+    if n_samples < 1:
+        return np.empty((0, look_back, 1)), np.empty(0)
+    X = sliding_window_view(scaled[:-1], look_back)
+    return X[..., np.newaxis], scaled[look_back:]
+
+
+def time_budget_callback(seconds):
+    """Keras callback that stops training once `seconds` have elapsed"""
+    from tensorflow.keras.callbacks import Callback
+
+    class TimeBudget(Callback):
+        def on_train_begin(self, logs=None):
+            self.deadline = time.monotonic() + seconds
+            self.exhausted = False
+
+        def on_train_batch_end(self, batch, logs=None):
+            if time.monotonic() >= self.deadline:
+                self.exhausted = True
+                self.model.stop_training = True
+
+    return TimeBudget()
+
+
+class LSTMStore:
+    """
+    Keeps one trained LSTM per symbol on disk and brings it up to date
+    instead of training from scratch on every request.
+
+    fit() decides between three paths:
+      reused      no bars since the stored model was trained
+      finetuned   a few new bars: the stored weights are fine-tuned on only
+                  the windows that end in a new bar, with early stopping
+                  and a time budget
+      retrained   no usable stored model, or drift: architecture/look_back
+                  changed, the stored bars were revised, too many new bars,
+                  prices left the scaler range, or the stored model's error
+                  on the new windows is far above its validation error
+    """
+
+    def __init__(self, root, build_model, params, epochs=15, batch_size=32,
+                 finetune_epochs=5, train_budget=60.0, finetune_budget=10.0,
+                 patience=3, drift_factor=3.0, max_new_bars=60, range_tolerance=0.1):
+        self.root = root
+        self.build_model = build_model
+        self.params = params
+        self.epochs = epochs
+        self.batch_size = batch_size
+        self.finetune_epochs = finetune_epochs
+        self.train_budget = train_budget
+        self.finetune_budget = finetune_budget
+        self.patience = patience
+        self.drift_factor = drift_factor
+        self.max_new_bars = max_new_bars
+        self.range_tolerance = range_tolerance
+
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+        self.counts = {'reused': 0, 'finetuned': 0, 'retrained': 0}
+
+    # ---- paths and metadata ----
+
+    def _paths(self, symbol):
+        name = re.sub(r'[^A-Z0-9._-]', '_', symbol.upper().strip())
+        base = os.path.join(self.root, name)
+        return base + '.keras', base + '.json'
+
+    def _lock(self, symbol):
+        with self._locks_guard:
+            return self._locks.setdefault(symbol.upper().strip(), threading.Lock())
+
+    def schema(self, look_back):
+        """What a stored model must match to be warm-started"""
+        arch = {k: v for k, v in self.params.items() if k not in ('epochs', 'batch_size')}
+        return {'format': STORE_FORMAT, 'look_back': int(look_back), 'features': ['Close'], **arch}
+
+    def metadata(self, symbol):
+        _, meta_path = self._paths(symbol)
+        try:
+            with open(meta_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _load(self, symbol):
+        from tensorflow.keras.models import load_model
+
+        model_path, _ = self._paths(symbol)
+        meta = self.metadata(symbol)
+        if meta is None or not os.path.exists(model_path):
+            return None, None
+        try:
+            return load_model(model_path), meta
+        except Exception as e:
+            print(f"⚠️ Could not load stored LSTM for {symbol}: {str(e)}")
+            return None, None
+
+    def _save(self, symbol, model, meta):
+        os.makedirs(self.root, exist_ok=True)
+        model_path, meta_path = self._paths(symbol)
+        # Write beside the target and rename so readers never see a partial file
+        tmp_model = f"{model_path[:-len('.keras')]}.{os.getpid()}.{threading.get_ident()}.tmp.keras"
+        tmp_meta = f"{meta_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        model.save(tmp_model)
+        with open(tmp_meta, 'w') as f:
+            json.dump(meta, f, indent=2)
+        os.replace(tmp_model, model_path)
+        os.replace(tmp_meta, meta_path)
+
+    # ---- training ----
+
+    @staticmethod
+    def _scaler(data_min, data_max):
+        from sklearn.preprocessing import MinMaxScaler
+
+        return MinMaxScaler(feature_range=(0, 1)).fit(np.array([[data_min], [data_max]]))
+
+    @staticmethod
+    def _mse(model, X, y):
+        if not len(X):
+            return 0.0
+        return float(np.mean((model.predict(X, verbose=0).flatten() - y) ** 2))
+
+    def _confidence(self, model, scaled, look_back):
+        X, y = scaled_windows(scaled, look_back)
+        split = int(TRAIN_FRACTION * len(X))
+        mse = self._mse(model, X[split:], y[split:])
+        return max(0.0, min(1.0, 1 - mse)), mse  # Lower MSE = higher confidence
+
+    def _retrain(self, closes, look_back):
+        from sklearn.preprocessing import MinMaxScaler
+        from tensorflow.keras.callbacks import EarlyStopping
+
+        scaler = MinMaxScaler(feature_range=(0, 1))
+        scaled = scaler.fit_transform(closes.reshape(-1, 1))[:, 0]
+        X, y = scaled_windows(scaled, look_back)
+        split = int(TRAIN_FRACTION * len(X))
+
+        model = self.build_model(look_back)
+        budget = time_budget_callback(self.train_budget)
+        callbacks = [budget]
+        # Early stopping watches the most recent tenth of the training windows
+        validation_split = 0.1 if split >= 20 else 0.0
+        if validation_split:
+            callbacks.append(EarlyStopping(monitor='val_loss', patience=self.patience, restore_best_weights=True))
+        model.fit(X[:split], y[:split], epochs=self.epochs, batch_size=self.batch_size,
+                  validation_split=validation_split, callbacks=callbacks, verbose=0)
+
+        confidence, test_loss = self._confidence(model, scaled, look_back)
+        meta = {
+            'schema': self.schema(look_back),
+            'data_min': float(scaler.data_min_[0]),
+            'data_max': float(scaler.data_max_[0]),
+            'anchor': [float(c) for c in closes[-ANCHOR_BARS:]],
+            'bars': int(len(closes)),
+            'val_loss': test_loss,
+            'trained_at': datetime.now().isoformat(),
+            'finetuned_at': None,
+            'finetunes': 0,
+            'budget_exhausted': budget.exhausted,
+        }
+        return model, scaler, confidence, meta
+
+    def _finetune(self, model, meta, scaled, new_start, look_back):
+        from tensorflow.keras.callbacks import EarlyStopping
+
+        # Windows whose target is a new bar; their inputs may reach back into old bars
+        X, y = scaled_windows(scaled, look_back)
+        first = max(0, new_start - look_back)
+        X_new, y_new = X[first:], y[first:]
+
+        budget = time_budget_callback(self.finetune_budget)
+        model.fit(X_new, y_new, epochs=self.finetune_epochs, batch_size=min(self.batch_size, len(X_new)),
+                  verbose=0, callbacks=[
+                      EarlyStopping(monitor='loss', patience=1, restore_best_weights=True), budget])
+        meta['finetuned_at'] = datetime.now().isoformat()
+        meta['finetunes'] = meta.get('finetunes', 0) + 1
+        meta['budget_exhausted'] = budget.exhausted
+        return model
+
+    def _drift(self, model, meta, scaled, new_start, look_back):
+        """Reason the stored model should not be fine-tuned, or None"""
+        new_values = scaled[new_start:]
+        if new_values.min() < -self.range_tolerance or new_values.max() > 1 + self.range_tolerance:
+            return 'prices moved outside the trained range'
+
+        X, y = scaled_windows(scaled, look_back)
+        first = max(0, new_start - look_back)
+        new_loss = self._mse(model, X[first:], y[first:])
+        threshold = self.drift_factor * max(meta.get('val_loss') or 0.0, 1e-4)
+        if new_loss > threshold:
+            return f'error on new bars {new_loss:.5f} exceeds {threshold:.5f}'
+        return None
+
+    def fit(self, symbol, closes, look_back):
+        """
+        Bring the stored model for symbol up to date with closes and return
+        the model registry fields. metrics carries 'confidence' in [0, 1],
+        the path taken ('mode') and, for a retrain, its 'reason'.
+        """
+        closes = np.asarray(closes, dtype=np.float64)
+        with self._lock(symbol):
+            model, meta = self._load(symbol)
+            mode, reason = 'retrained', None
+
+            if meta is None:
+                reason = 'no stored model'
+            elif meta.get('schema') != self.schema(look_back):
+                reason = 'model schema changed'
+            else:
+                new_start = resume_index(closes, meta['anchor'], meta.get('bars'))
+                if new_start is None:
+                    reason = 'stored bars are no longer in the history'
+                elif len(closes) - new_start > self.max_new_bars:
+                    reason = f'{len(closes) - new_start} new bars'
+                else:
+                    scaler = self._scaler(meta['data_min'], meta['data_max'])
+                    scaled = scaler.transform(closes.reshape(-1, 1))[:, 0]
+                    if new_start == len(closes):
+                        mode = 'reused'
+                    else:
+                        reason = self._drift(model, meta, scaled, new_start, look_back)
+                        if reason is None:
+                            mode = 'finetuned'
+                            model = self._finetune(model, meta, scaled, new_start, look_back)
+                            meta['anchor'] = [float(c) for c in closes[-ANCHOR_BARS:]]
+                            meta['bars'] = int(len(closes))
+                            self._save(symbol, model, meta)
+
+            if mode == 'retrained':
+                print(f"🧠 Training LSTM for {symbol} from scratch ({reason})")
+                model, scaler, confidence, meta = self._retrain(closes, look_back)
+                self._save(symbol, model, meta)
+            else:
+                confidence, _ = self._confidence(model, scaled, look_back)
+
+            with self._locks_guard:
+                self.counts[mode] += 1
+
+        metrics = {'confidence': confidence, 'mode': mode}
+        if reason and mode == 'retrained':
+            metrics['reason'] = reason
+        return {'model': model, 'scaler': scaler, 'look_back': look_back,
+                'model_type': 'LSTM', 'metrics': metrics}
+
+    def stats(self):
+        with self._locks_guard:
+            return {'root': self.root, **self.counts}
@@ -0,0 +1,295 @@
+# ============================================
+# MARKET DATA PROVIDERS
+# One interface for history, quotes, metadata and batch history
+# ============================================
+#
+# MARKET_DATA_PROVIDER selects the backend:
+#   yahoo   live Yahoo Finance through yfinance (default)
+#   replay  recorded or synthetic OHLCV files read from disk, with an
+#           optional artificial latency, for load tests and benchmarks
+#           that must run reproducibly and without network access
+
+import json
+import os
+import random
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from datetime import date, timedelta
+
+import numpy as np
+
+from .startup import LazyModule
+
+# Imported on first use to keep application start-up fast
+pd = LazyModule('pandas')
+
+# Calendar days per yfinance period; '1d'/'5d' are counted in bars instead
+PERIOD_DAYS = {
+    '1mo': 31,
+    '3mo': 92,
+    '6mo': 183,
+    '1y': 366,
+    '2y': 731,
+    '5y': 1827,
+    '10y': 3653,
+}
+PERIOD_BARS = {'1d': 1, '5d': 5}
+
+HISTORY_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+
+class MarketDataProvider:
+    """
+    Base class for market data backends. History frames are shaped like
+    yf.Ticker().history() output: a DatetimeIndex named 'Date' and
+    Open/High/Low/Close/Volume columns. Missing symbols give an empty frame.
+    """
+
+    name = 'base'
+
+    def history(self, symbol, period='1y', interval='1d', start=None):
+        """Bars for one symbol over a period, or from `start` (YYYY-MM-DD) onwards"""
+        raise NotImplementedError
+
+    def batch_history(self, symbols, period='1y', interval='1d'):
+        """{symbol: frame} for many symbols; symbols without data are left out"""
+        histories = {}
+        for symbol in symbols:
+            hist = self.history(symbol, period, interval)
+            if not hist.empty:
+                histories[symbol] = hist
+        return histories
+
+    def metadata(self, symbol):
+        """Company metadata in the shape of yf.Ticker().info (may be empty)"""
+        raise NotImplementedError
+
+    def quote(self, symbol):
+        """Latest price, previous close and change, or None without data"""
+        hist = self.history(symbol, period='5d')
+        if hist.empty:
+            return None
+        price = float(hist['Close'].iloc[-1])
+        previous = float(hist['Close'].iloc[-2]) if len(hist) > 1 else price
+        return {
+            'symbol': symbol,
+            'price': price,
+            'previous_close': previous,
+            'change': price - previous,
+            'change_percent': (price - previous) / previous * 100 if previous else 0.0,
+            'volume': int(hist['Volume'].iloc[-1]),
+            'as_of': hist.index[-1].isoformat(),
+        }
+
+
+class YahooProvider(MarketDataProvider):
+    """
+    Yahoo Finance through yfinance. `throttle`, if given, is called before
+    every upstream request (e.g. a rate limiter's acquire).
+    """
+
+    name = 'yahoo'
+
+    def __init__(self, throttle=None, max_threads=5):
+        self._yf = LazyModule('yfinance')
+        self.throttle = throttle
+        self.max_threads = max_threads
+
+    def _before_request(self):
+        if self.throttle is not None:
+            self.throttle()
+
+    def history(self, symbol, period='1y', interval='1d', start=None):
+        self._before_request()
+        if start is not None:
+            return self._yf.Ticker(symbol).history(start=start, interval=interval)
+        return self._yf.Ticker(symbol).history(period=period, interval=interval)
+
+    def batch_history(self, symbols, period='1y', interval='1d'):
+        """One yf.download call for all symbols, split per symbol"""
+        self._before_request()
+        data = self._yf.download(
+            symbols,
+            period=period,
+            interval=interval,
+            group_by='ticker',
+            auto_adjust=True,
+            threads=min(self.max_threads, len(symbols)),
+            progress=False
+        )
+
+        histories = {}
+        if data is None or data.empty:
+            return histories
+        for symbol in symbols:
+            if isinstance(data.columns, pd.MultiIndex):
+                if symbol not in data.columns.get_level_values(0):
+                    continue
+                hist = data[symbol].dropna(how='all')
+            else:
+                # Single-ticker downloads come back without the ticker level
+                hist = data.dropna(how='all')
+            if not hist.empty:
+                histories[symbol] = hist
+        return histories
+
+    def metadata(self, symbol):
+        self._before_request()
+        return self._yf.Ticker(symbol).info
+
+
+class ReplayProvider(MarketDataProvider):
+    """
+    Serves daily bars from `<root>/<SYMBOL>.csv` files (Date index plus
+    Open/High/Low/Close/Volume) and metadata from optional
+    `<SYMBOL>.json` files. Periods are cut back from the last recorded bar,
+    so a recording replays identically whenever it is run.
+
+    With `synthetic` set, symbols without a recording get a deterministic
+    random walk (seeded by the symbol) ending on `anchor` (default today).
+    Every call sleeps `latency` seconds, plus up to `jitter`, to mimic an
+    upstream round trip. Loaded frames are kept for the `max_frames` most
+    recently used symbols.
+    """
+
+    name = 'replay'
+
+    def __init__(self, root=None, latency=0.0, jitter=0.0, synthetic=True,
+                 synthetic_bars=2520, anchor=None, max_frames=256):
+        self.root = root
+        self.latency = latency
+        self.jitter = jitter
+        self.synthetic = synthetic
+        self.synthetic_bars = synthetic_bars
+        self.anchor = anchor
+        self.max_frames = max_frames
+        self._frames = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _filename(symbol):
+        return ''.join(c if c.isalnum() or c in '.^=_-' else '_' for c in symbol.upper().strip())
+
+    def _sleep(self):
+        delay = self.latency + (random.uniform(0, self.jitter) if self.jitter else 0.0)
+        if delay > 0:
+            time.sleep(delay)
+
+    def _load(self, symbol):
+        symbol = symbol.upper().strip()
+        with self._lock:
+            frame = self._frames.get(symbol)
+            if frame is not None:
+                self._frames.move_to_end(symbol)
+                return frame
+
+        path = os.path.join(self.root, self._filename(symbol) + '.csv') if self.root else None
+        if path and os.path.exists(path):
+            frame = pd.read_csv(path, index_col=0, parse_dates=True)
+            frame.index.name = 'Date'
+            frame = frame[HISTORY_COLUMNS].sort_index()
+        elif self.synthetic:
+            frame = self._synthetic(symbol)
+        else:
+            frame = pd.DataFrame(columns=HISTORY_COLUMNS)
+
+        with self._lock:
+            self._frames[symbol] = frame
+            while len(self._frames) > self.max_frames:
+                self._frames.popitem(last=False)
+        return frame
+
+    def _synthetic(self, symbol):
+        rng = np.random.default_rng(zlib.crc32(symbol.encode()))
+        anchor = pd.Timestamp(self.anchor or date.today())
+        index = pd.bdate_range(end=anchor, periods=self.synthetic_bars, name='Date')
+        returns = rng.normal(0.0003, 0.015, len(index))
+        close = rng.uniform(20, 500) * np.exp(np.cumsum(returns))
+        open_ = close * (1 + rng.normal(0, 0.004, len(index)))
+        spread = np.abs(rng.normal(0, 0.008, len(index))) * close
+        return pd.DataFrame({
+            'Open': open_,
+            'High': np.maximum(open_, close) + spread,
+            'Low': np.minimum(open_, close) - spread,
+            'Close': close,
+            'Volume': rng.integers(100_000, 50_000_000, len(index)),
+        }, index=index)
+
+    @staticmethod
+    def _slice(frame, period, start=None):
+        if frame.empty:
+            return frame
+        if start is not None:
+            return frame[frame.index >= pd.Timestamp(start)]
+        if period in PERIOD_BARS:
+            return frame.iloc[-PERIOD_BARS[period]:]
+        if period == 'max':
+            return frame
+        last = frame.index[-1]
+        if period == 'ytd':
+            first = pd.Timestamp(last.year, 1, 1)
+        else:
+            first = last - timedelta(days=PERIOD_DAYS[period])
+        return frame[frame.index >= first]
+
+    def history(self, symbol, period='1y', interval='1d', start=None):
+        self._sleep()
+        if interval != '1d':
+            return pd.DataFrame(columns=HISTORY_COLUMNS)
+        return self._slice(self._load(symbol), period, start).copy()
+
+    def batch_history(self, symbols, period='1y', interval='1d'):
+        # One round trip for the whole batch, like yf.download
+        self._sleep()
+        histories = {}
+        if interval != '1d':
+            return histories
+        for symbol in symbols:
+            hist = self._slice(self._load(symbol), period)
+            if not hist.empty:
+                histories[symbol] = hist.copy()
+        return histories
+
+    def metadata(self, symbol):
+        self._sleep()
+        path = os.path.join(self.root, self._filename(symbol) + '.json') if self.root else None
+        if path and os.path.exists(path):
+            with open(path) as f:
+                return json.load(f)
+        if self._load(symbol).empty:
+            return {}
+        return {'shortName': symbol.upper(), 'sector': 'Unknown'}
+
+    def record(self, symbol, frame, info=None):
+        """Save a history frame (and optional metadata) as a replayable recording"""
+        os.makedirs(self.root, exist_ok=True)
+        base = os.path.join(self.root, self._filename(symbol))
+        frame = frame[HISTORY_COLUMNS].copy()
+        if getattr(frame.index, 'tz', None) is not None:
+            frame.index = frame.index.tz_localize(None)
+        frame.index.name = 'Date'
+        frame.to_csv(base + '.csv')
+        if info:
+            with open(base + '.json', 'w') as f:
+                json.dump(info, f, default=str)
+        with self._lock:
+            self._frames.pop(symbol.upper().strip(), None)
+        return len(frame)
+
+
+def create_provider(name='yahoo', throttle=None, replay_dir=None, replay_latency=0.0,
+                    replay_jitter=0.0, replay_synthetic=True):
+    """Build the provider named by MARKET_DATA_PROVIDER ('yahoo' or 'replay')"""
+    name = (name or 'yahoo').lower()
+    if name == 'yahoo':
+        return YahooProvider(throttle=throttle)
+    if name == 'replay':
+        return ReplayProvider(
+            root=replay_dir or None,
+            latency=replay_latency,
+            jitter=replay_jitter,
+            synthetic=replay_synthetic,
+        )
+    raise ValueError(f"Unknown market data provider '{name}' (expected 'yahoo' or 'replay')")
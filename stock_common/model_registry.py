@@ -0,0 +1,158 @@
+# ============================================
+# FITTED MODEL REGISTRY
+# Reuses trained models until new market data arrives
+# ============================================
+
+import json
+import pickle
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from .stock_cache import SingleFlight
+
+# A fitted model with everything needed to predict from new input
+FittedModel = namedtuple('FittedModel', ['model', 'scaler', 'look_back', 'model_type', 'metrics', 'fitted_at', 'nbytes'])
+
+
+def model_nbytes(model, scaler=None):
+    """Approximate memory footprint of a fitted model (and its scaler) in bytes"""
+    total = 0
+    for obj in (model, scaler):
+        if obj is None:
+            continue
+        if hasattr(obj, 'count_params'):
+            # Keras: float32 weights (optimizer slots are not counted)
+            total += int(obj.count_params()) * 4
+            continue
+        if isinstance(getattr(obj, 'nbytes', None), int):
+            # Array-backed models (tree_export.FlatForest)
+            total += obj.nbytes
+            continue
+        try:
+            total += len(pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL))
+        except Exception:
+            pass
+    return total
+
+
+class ModelRegistry:
+    """
+    Thread-safe LRU registry of fitted models keyed by
+    (symbol, model type, hyperparameters, last bar date).
+
+    A model trained on the bars up to a given date is valid until a newer
+    bar arrives, so repeat predictions skip training entirely. Entries are
+    evicted least recently used first when either the model count or the
+    memory budget is exceeded; storing a model for a newer bar date drops the
+    older models of the same symbol/type/hyperparameters right away.
+    Concurrent requests for the same missing key train it only once.
+    """
+
+    def __init__(self, max_entries=64, max_bytes=512 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> FittedModel
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._flight = SingleFlight()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(symbol, model_type, params, last_bar_date):
+        """Registry key; params is a dict of hyperparameters (JSON-serializable)"""
+        return (
+            symbol.upper().strip(),
+            model_type,
+            json.dumps(params or {}, sort_keys=True, default=str),
+            str(last_bar_date)[:10],
+        )
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, model, scaler=None, look_back=None, model_type=None, metrics=None):
+        """Store a fitted model and return its FittedModel entry"""
+        entry = FittedModel(
+            model=model,
+            scaler=scaler,
+            look_back=look_back,
+            model_type=model_type or key[1],
+            metrics=metrics or {},
+            fitted_at=time.time(),
+            nbytes=model_nbytes(model, scaler),
+        )
+        if entry.nbytes > self.max_bytes:
+            return entry
+
+        with self._lock:
+            # Models of the same series fitted on older bars are superseded
+            for old in [k for k in self._entries if k[:3] == key[:3] and k != key]:
+                self._remove(old)
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            self._bytes += entry.nbytes
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+        return entry
+
+    def get_or_fit(self, key, fit):
+        """
+        Return the registered model for key, or call fit() and register its
+        result. fit() returns a dict with 'model' and optionally 'scaler',
+        'look_back', 'model_type' and 'metrics'.
+        """
+        entry = self.get(key)
+        if entry is not None:
+            return entry
+
+        def train():
+            # Another caller may have finished training since the lookup above
+            with self._lock:
+                entry = self._entries.get(key)
+            if entry is not None:
+                return entry
+            return self.put(key, **fit())
+
+        return self._flight.do(key, train)
+
+    def invalidate(self, symbol=None):
+        """Drop all models, or only the models for one symbol"""
+        with self._lock:
+            if symbol is None:
+                self._entries.clear()
+                self._bytes = 0
+                return
+            symbol = symbol.upper().strip()
+            for key in [k for k in self._entries if k[0] == symbol]:
+                self._remove(key)
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.nbytes
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            }
@@ -0,0 +1,125 @@
+# ============================================
+# DEFERRED LOADING & STARTUP TIMING
+# Heavy libraries and setup steps run on first use, and each one is timed
+# ============================================
+#
+# Import this module first: the startup clock starts when it loads.
+
+import importlib
+import importlib.util
+import sys
+import threading
+import time
+from collections.abc import Mapping
+
+STARTED = time.perf_counter()
+
+_timings = {}  # name -> {'kind', 'phase', 'seconds'}
+_ready_seconds = None
+_lock = threading.Lock()
+
+
+def _record(name, kind, seconds):
+    with _lock:
+        phase = 'startup' if _ready_seconds is None else 'first use'
+        _timings[name] = {'kind': kind, 'phase': phase, 'seconds': round(seconds, 4)}
+
+
+def module_available(name):
+    """Whether a module can be imported, without importing it"""
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+def timed_import(name):
+    """importlib.import_module that records how long a first import took"""
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    started = time.perf_counter()
+    module = importlib.import_module(name)
+    _record(name, 'import', time.perf_counter() - started)
+    return module
+
+
+class LazyModule:
+    """
+    Stand-in for a module that is imported on first attribute access,
+    e.g. `pd = LazyModule('pandas')` then `pd.DataFrame(...)` as usual.
+    """
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        module = self._module
+        if module is None:
+            module = self._module = timed_import(self._name)
+        return getattr(module, attr)
+
+    def __repr__(self):
+        state = 'loaded' if self._module is not None else 'not loaded'
+        return f"<lazy module '{self._name}' ({state})>"
+
+
+class Deferred:
+    """Runs a setup function once, on first get(), and keeps its result"""
+
+    def __init__(self, name, setup):
+        self.name = name
+        self._setup = setup
+        self._result = None
+        self._done = False
+        self._lock = threading.Lock()
+
+    @property
+    def done(self):
+        return self._done
+
+    def get(self):
+        if self._done:
+            return self._result
+        with self._lock:
+            if not self._done:
+                started = time.perf_counter()
+                self._result = self._setup()
+                self._done = True
+                _record(self.name, 'setup', time.perf_counter() - started)
+        return self._result
+
+
+class DeferredDict(Mapping):
+    """Read-only mapping built by a Deferred on first access"""
+
+    def __init__(self, deferred):
+        self._deferred = deferred
+
+    def __getitem__(self, key):
+        return self._deferred.get()[key]
+
+    def __iter__(self):
+        return iter(self._deferred.get())
+
+    def __len__(self):
+        return len(self._deferred.get())
+
+
+def mark_ready():
+    """Record that the application finished loading; later loads count as first use"""
+    global _ready_seconds
+    with _lock:
+        if _ready_seconds is None:
+            _ready_seconds = round(time.perf_counter() - STARTED, 4)
+    return _ready_seconds
+
+
+def startup_report():
+    """Seconds until ready, plus every deferred import and setup step with its duration"""
+    with _lock:
+        return {
+            'ready_seconds': _ready_seconds,
+            'loaded': {name: dict(t) for name, t in _timings.items()},
+        }
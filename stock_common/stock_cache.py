@@ -0,0 +1,242 @@
+# ============================================
+# IN-PROCESS MARKET DATA CACHES
+# Bounded LRU caches for Yahoo Finance history frames and company metadata
+# ============================================
+
+import threading
+import time
+from collections import OrderedDict
+
+# Time-to-live (seconds) per requested period. Short periods contain the
+# live bar and go stale quickly; long periods barely move within an hour.
+DEFAULT_PERIOD_TTLS = {
+    '1d': 60,
+    '5d': 120,
+    '1mo': 900,
+    '3mo': 1800,
+    '6mo': 1800,
+    'ytd': 3600,
+    '1y': 3600,
+    '2y': 3600 * 6,
+    '5y': 3600 * 6,
+    '10y': 3600 * 6,
+    'max': 3600 * 6,
+}
+
+
+def frame_nbytes(frame):
+    """Approximate memory footprint of a DataFrame in bytes"""
+    try:
+        return int(frame.memory_usage(index=True, deep=True).sum())
+    except Exception:
+        return 0
+
+
+class OHLCVCache:
+    """
+    Thread-safe LRU cache keyed by (resolved symbol, period, interval).
+    Entries expire after a period-dependent TTL and are evicted when either
+    the entry count or the total size budget is exceeded.
+    """
+
+    def __init__(self, max_entries=512, max_bytes=64 * 1024 * 1024, ttls=None, default_ttl=300):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttls = dict(DEFAULT_PERIOD_TTLS)
+        if ttls:
+            self.ttls.update(ttls)
+        self.default_ttl = default_ttl
+
+        self._entries = OrderedDict()  # key -> (frame, nbytes, expires_at)
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @staticmethod
+    def make_key(symbol, period, interval='1d'):
+        return (symbol.upper().strip(), period, interval)
+
+    def ttl_for(self, period):
+        return self.ttls.get(period, self.default_ttl)
+
+    def get(self, symbol, period, interval='1d'):
+        """Return the cached frame or None. Callers must not mutate it."""
+        key = self.make_key(symbol, period, interval)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            frame, nbytes, expires_at = entry
+            if expires_at <= time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return frame
+
+    def put(self, symbol, period, frame, interval='1d', ttl=None):
+        """Store a frame, evicting least recently used entries if needed"""
+        if frame is None or frame.empty:
+            return
+        key = self.make_key(symbol, period, interval)
+        nbytes = frame_nbytes(frame)
+        if nbytes > self.max_bytes:
+            return
+        expires_at = time.monotonic() + (ttl if ttl is not None else self.ttl_for(period))
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (frame, nbytes, expires_at)
+            self._bytes += nbytes
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def invalidate(self, symbol=None):
+        """Drop all entries, or only the entries for one symbol"""
+        with self._lock:
+            if symbol is None:
+                self._entries.clear()
+                self._bytes = 0
+                return
+            symbol = symbol.upper().strip()
+            for key in [k for k in self._entries if k[0] == symbol]:
+                self._remove(key)
+
+    def _remove(self, key):
+        _, nbytes, _ = self._entries.pop(key)
+        self._bytes -= nbytes
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+class MetadataCache:
+    """
+    Thread-safe cache for company metadata (name, sector, market cap, PE).
+    Entries are filled lazily by the caller-supplied loader and kept for a
+    day, since these fields barely change intraday.
+    """
+
+    def __init__(self, ttl=24 * 3600, max_entries=4096):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # symbol -> (info, expires_at)
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.load_errors = 0
+
+    def get_or_load(self, symbol, loader):
+        """Return cached metadata for a symbol, calling loader(symbol) on a miss"""
+        symbol = symbol.upper().strip()
+        with self._lock:
+            entry = self._entries.get(symbol)
+            if entry is not None and entry[1] > time.monotonic():
+                self._entries.move_to_end(symbol)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        try:
+            info = loader(symbol) or {}
+        except Exception:
+            with self._lock:
+                self.load_errors += 1
+            return {}
+
+        with self._lock:
+            self._entries[symbol] = (info, time.monotonic() + self.ttl)
+            self._entries.move_to_end(symbol)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return info
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'load_errors': self.load_errors,
+            }
+
+
+class _Flight:
+    __slots__ = ('event', 'result', 'error')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key: the first caller runs the
+    function, callers arriving while it is in flight wait for it and share
+    its result (or its exception).
+    """
+
+    def __init__(self):
+        self._flights = {}
+        self._lock = threading.Lock()
+
+        self.executed = 0
+        self.coalesced = 0
+
+    def do(self, key, fn):
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                self.executed += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = fn()
+            return flight.result
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.event.set()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'in_flight': len(self._flights),
+                'executed': self.executed,
+                'coalesced': self.coalesced,
+            }
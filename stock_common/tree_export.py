@@ -0,0 +1,247 @@
+# ============================================
+# FLAT TREE ENSEMBLES
+# Fitted decision trees / random forests as contiguous NumPy node arrays
+# ============================================
+#
+# Every tree of the ensemble is concatenated into one set of node arrays.
+# Leaves point to themselves with an infinite threshold, so a whole batch
+# walks all trees in max_depth vectorized steps with no leaf checks.
+#
+# File layout (little endian), read through numpy.memmap:
+#   header     64 bytes   magic b'FLATTRE1', int64 node count, tree count,
+#                         feature count, max depth, output count, zero padding
+#   threshold  float64[nodes]
+#   value      float64[nodes, outputs]
+#   feature    int32[nodes]
+#   left       int32[nodes]
+#   right      int32[nodes]
+#   roots      int32[trees]
+#
+# TreeModelStore keeps one such file per model registry key, plus a JSON
+# sidecar with the scaler range and metrics, so other processes and later
+# runs map a trained forest instead of fitting it again.
+
+import hashlib
+import json
+import os
+import re
+import threading
+
+import numpy as np
+
+MAGIC = b'FLATTRE1'
+HEADER_SIZE = 64
+
+NODE_COLUMNS = [
+    ('threshold', np.dtype('<f8')),
+    ('value', np.dtype('<f8')),
+    ('feature', np.dtype('<i4')),
+    ('left', np.dtype('<i4')),
+    ('right', np.dtype('<i4')),
+]
+
+
+class FlatForest:
+    """
+    Inference-only copy of a fitted DecisionTreeRegressor or
+    RandomForestRegressor, single- or multi-output. predict() returns the
+    scikit-learn model's output up to the rounding of the average over trees.
+    """
+
+    def __init__(self, threshold, value, feature, left, right, roots, n_features, max_depth):
+        self.threshold = threshold
+        self.value = value.reshape(len(threshold), -1)  # (nodes, outputs)
+        self.feature = feature
+        self.left = left
+        self.right = right
+        self.roots = roots
+        self.n_features = int(n_features)
+        self.max_depth = int(max_depth)
+
+    @classmethod
+    def from_sklearn(cls, model):
+        """Flatten a fitted tree regressor or forest of them"""
+        trees = [est.tree_ for est in getattr(model, 'estimators_', [model])]
+        columns = {name: [] for name, _ in NODE_COLUMNS}
+        roots = []
+        offset = 0
+        for tree in trees:
+            n = tree.node_count
+            index = np.arange(offset, offset + n, dtype=np.int32)
+            is_leaf = tree.children_left < 0
+            columns['threshold'].append(np.where(is_leaf, np.inf, tree.threshold))
+            columns['value'].append(tree.value[:, :, 0])
+            columns['feature'].append(np.where(is_leaf, 0, tree.feature))
+            columns['left'].append(np.where(is_leaf, index, tree.children_left + offset))
+            columns['right'].append(np.where(is_leaf, index, tree.children_right + offset))
+            roots.append(offset)
+            offset += n
+
+        arrays = {
+            name: np.ascontiguousarray(np.concatenate(columns[name]), dtype=dtype)
+            for name, dtype in NODE_COLUMNS
+        }
+        return cls(
+            roots=np.array(roots, dtype='<i4'),
+            n_features=model.n_features_in_,
+            max_depth=max(tree.max_depth for tree in trees),
+            **arrays
+        )
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    @property
+    def n_outputs(self):
+        return self.value.shape[1]
+
+    @property
+    def nbytes(self):
+        return sum(getattr(self, name).nbytes for name, _ in NODE_COLUMNS) + self.roots.nbytes
+
+    def predict(self, X):
+        """
+        Mean leaf value over all trees for each row of X (n_samples, n_features):
+        shaped (n_samples,) for one output, else (n_samples, n_outputs)
+        """
+        # scikit-learn compares float32 inputs against float64 thresholds
+        X = np.asarray(X, dtype=np.float32).astype(np.float64)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f"X must have shape (n_samples, {self.n_features})")
+        values = X.ravel()
+        row_start = (np.arange(len(X)) * self.n_features)[:, np.newaxis]
+        feature, threshold, left, right = self.feature, self.threshold, self.left, self.right
+        node = np.broadcast_to(self.roots, (len(X), self.n_trees))
+        for _ in range(self.max_depth):
+            go_left = values.take(row_start + feature.take(node)) <= threshold.take(node)
+            node = np.where(go_left, left.take(node), right.take(node))
+        leaves = self.value.take(node, axis=0)  # (n_samples, n_trees, n_outputs)
+        prediction = leaves.mean(axis=1)
+        return prediction[:, 0] if self.n_outputs == 1 else prediction
+
+    def save(self, path):
+        """Write the node arrays to one file (atomically replaced)"""
+        header = np.zeros(HEADER_SIZE, dtype=np.uint8)
+        header[:8] = np.frombuffer(MAGIC, dtype=np.uint8)
+        header[8:48] = np.array(
+            [len(self.threshold), self.n_trees, self.n_features, self.max_depth, self.n_outputs], dtype='<i8'
+        ).view(np.uint8)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, 'wb') as f:
+            f.write(header.tobytes())
+            for name, dtype in NODE_COLUMNS:
+                f.write(np.ascontiguousarray(getattr(self, name), dtype=dtype).tobytes())
+            f.write(np.ascontiguousarray(self.roots, dtype='<i4').tobytes())
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """
+        Read a saved forest. With mmap the arrays are read-only views onto
+        the file, so processes that load the same model share its pages.
+        """
+        if mmap:
+            # Plain ndarray over the mapping; memmap subclass views index slower
+            raw = np.frombuffer(np.memmap(path, dtype=np.uint8, mode='r'), dtype=np.uint8)
+        else:
+            raw = np.fromfile(path, dtype=np.uint8)
+        if len(raw) < HEADER_SIZE or bytes(raw[:8]) != MAGIC:
+            raise ValueError(f"{path} is not a flattened tree model")
+        n_nodes, n_trees, n_features, max_depth, n_outputs = (int(v) for v in raw[8:48].view('<i8'))
+
+        arrays = {}
+        offset = HEADER_SIZE
+        for name, dtype in NODE_COLUMNS:
+            # Files written before multi-output support have 0 outputs in the header
+            size = n_nodes * dtype.itemsize * (max(n_outputs, 1) if name == 'value' else 1)
+            arrays[name] = raw[offset:offset + size].view(dtype)
+            offset += size
+        roots = raw[offset:offset + n_trees * 4].view('<i4')
+        return cls(roots=roots, n_features=n_features, max_depth=max_depth, **arrays)
+
+
+def is_tree_model(model):
+    """Whether model is a fitted scikit-learn tree regressor or forest that can be flattened"""
+    estimators = getattr(model, 'estimators_', None)
+    first = estimators[0] if estimators is not None and len(estimators) else model
+    return hasattr(first, 'tree_')
+
+
+def flatten_model(model):
+    """FlatForest for tree models; any other model is returned unchanged"""
+    return FlatForest.from_sklearn(model) if is_tree_model(model) else model
+
+
+class TreeModelStore:
+    """
+    Flattened tree models on local disk, keyed like the model registry.
+
+    save() writes <SYMBOL>_<digest>.flat and .json and returns the fields
+    with the model replaced by its memory-mapped copy; storing a model for
+    a newer bar date removes the files of the same symbol/type/parameters.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self._lock = threading.Lock()
+        self.counts = {'loaded': 0, 'saved': 0}
+
+    def _base(self, key, with_date=True):
+        symbol = re.sub(r'[^A-Z0-9._-]', '_', key[0])
+        series = hashlib.sha1(json.dumps(list(key[1:3])).encode()).hexdigest()[:16]
+        return os.path.join(self.root, f"{symbol}_{series}" + (f"_{key[3]}" if with_date else ''))
+
+    def load(self, key):
+        """Registry fields of the model saved for key, or None"""
+        from sklearn.preprocessing import MinMaxScaler
+
+        base = self._base(key)
+        try:
+            with open(base + '.json') as f:
+                meta = json.load(f)
+            model = FlatForest.load(base + '.flat', mmap=True)
+        except (OSError, ValueError):
+            return None
+        scaler = MinMaxScaler(feature_range=(0, 1)).fit(np.array([[meta['data_min']], [meta['data_max']]]))
+        with self._lock:
+            self.counts['loaded'] += 1
+        return {'model': model, 'scaler': scaler, 'look_back': meta['look_back'],
+                'model_type': meta['model_type'], 'metrics': meta['metrics']}
+
+    def save(self, key, fit):
+        """Persist a fit whose model is a FlatForest; returns it memory-mapped"""
+        os.makedirs(self.root, exist_ok=True)
+        base = self._base(key)
+        scaler = fit['scaler']
+        meta = {
+            'key': list(key),
+            'data_min': float(scaler.data_min_[0]),
+            'data_max': float(scaler.data_max_[0]),
+            'look_back': fit['look_back'],
+            'model_type': fit['model_type'],
+            'metrics': fit['metrics'],
+        }
+        fit['model'].save(base + '.flat')
+        tmp = f"{base}.json.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp, base + '.json')
+
+        # Superseded bar dates; readers that still map them keep their pages
+        prefix = os.path.basename(self._base(key, with_date=False)) + '_'
+        for name in os.listdir(self.root):
+            if (name.startswith(prefix) and not name.startswith(os.path.basename(base) + '.')
+                    and not name.endswith('.tmp')):
+                try:
+                    os.remove(os.path.join(self.root, name))
+                except OSError:
+                    pass
+
+        with self._lock:
+            self.counts['saved'] += 1
+        return {**fit, 'model': FlatForest.load(base + '.flat', mmap=True)}
+
+    def stats(self):
+        with self._lock:
+            return {'root': self.root, **self.counts}